@@ -0,0 +1,101 @@
+"""
+admission.py
+
+Overload protection for bet placement: a token bucket per player, and a
+global admission controller that sheds bets while the event loop is lagging
+or too many bets are already being processed. Rejections are structured
+errors with a `code` and a `retry_after` hint, counted in /metrics.
+"""
+import time
+from typing import Any, Dict, Optional
+
+from backend import metrics
+
+
+def rejection(code: str, message: str, retry_after: float | None = None) -> Dict[str, Any]:
+    """The error acknowledgement for a rejected bet."""
+    response = {"status": "error", "code": code, "message": message}
+    if retry_after is not None:
+        response["retry_after"] = round(retry_after, 3)
+    return response
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Token bucket per key: `rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, _Bucket] = {}
+
+    def acquire(self, key: str, now: float | None = None) -> float:
+        """Takes a token for `key`. Returns 0.0 on success, otherwise the
+        seconds until a token will be available."""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        return (1.0 - bucket.tokens) / self.rate
+
+    def forget(self, key: str):
+        """Drops a key's bucket, e.g. when its client disconnects."""
+        self._buckets.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """
+    Admits a bet if the player is within their rate limit and the server is
+    not overloaded: event-loop lag (as last measured by the lag monitor) at
+    most `max_loop_lag` seconds, and fewer than `max_in_flight` bets being
+    processed. Admitted bets must be bracketed by `begin()` / `end()`.
+
+    The in-flight count only grows while bet handlers are suspended, i.e.
+    with the shared state backend, where each bet waits on the state server.
+    With the in-memory backend a bet is handled without yielding to the
+    loop, so at most one is ever in flight: a backlog of bet events then
+    shows up as loop lag, and `max_loop_lag` is the limit that sheds it.
+    """
+    def __init__(self, rate: float, burst: float, max_loop_lag: float, max_in_flight: int):
+        self.limiter = RateLimiter(rate, burst)
+        self.max_loop_lag = max_loop_lag
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    def admit(self, player_id: str) -> Optional[Dict[str, Any]]:
+        """None if the bet may proceed, otherwise the rejection to send back."""
+        # Shed load first, so an overloaded server does not spend tokens
+        if self.in_flight >= self.max_in_flight or metrics.LOOP_LAG.value > self.max_loop_lag:
+            metrics.BETS_SHED.inc()
+            return rejection("overloaded", "Server is busy, please retry.", retry_after=max(self.max_loop_lag, 0.1))
+        retry_after = self.limiter.acquire(player_id)
+        if retry_after:
+            metrics.BETS_RATE_LIMITED.inc()
+            return rejection("rate_limited", "Too many bets, slow down.", retry_after=retry_after)
+        return None
+
+    def begin(self):
+        self.in_flight += 1
+        metrics.BETS_IN_FLIGHT.set(self.in_flight)
+
+    def end(self):
+        self.in_flight -= 1
+        metrics.BETS_IN_FLIGHT.set(self.in_flight)
+
+    def forget(self, player_id: str):
+        self.limiter.forget(player_id)
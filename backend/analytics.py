@@ -0,0 +1,171 @@
+"""
+analytics.py
+
+Rolling aggregates over settled rounds for ops and balancing questions:
+realized house edge per special event, the per-second stake heatmap and the
+winning-second distribution, and stake and payouts by power-up.
+
+Each round is reduced once, on the settlement thread, to a compact
+contribution (`round_contribution`) built from the bet book's running
+totals and the winning bets. The contribution is then folded into all-time
+totals and into totals over the last `window` rounds; the round that leaves
+the window is subtracted again. Reports are cached until the next round, so
+queries never rescan history.
+"""
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from backend.sdk_integration import BetBook, GameRoundResult
+
+DEFAULT_WINDOW = 1000
+SCOPES = ("all", "rolling")
+_NONE = "none"
+
+
+def round_contribution(book: BetBook, result: GameRoundResult) -> Dict[str, Any]:
+    """A settled round's share of every aggregate. JSON-serializable, so it
+    can be logged with the settlement."""
+    bets_by_second = book.bets_by_second()
+    power_ups = {
+        power_up or _NONE: [stake, bets, 0.0, 0] for power_up, (stake, bets) in book.stake_by_power_up().items()
+    }
+    # Winner entries are in the order of the winning second's bets
+    for bet, winner in zip(book.bets_at(result.unlock_second), result.winners):
+        totals = power_ups[bet.power_up or _NONE]
+        totals[2] += winner["payout"]
+        totals[3] += 1
+    return {
+        "event": result.special_event_triggered or _NONE,
+        "unlock_second": result.unlock_second,
+        "staked": book.total_pot,
+        "paid": sum(result.payouts.values()),
+        "bets": len(book),
+        "seconds": [[second, stake, bets_by_second[second]] for second, stake in book.stake_by_second().items()],
+        "power_ups": [[power_up, *totals] for power_up, totals in power_ups.items()],
+    }
+
+
+def _edge(staked: float, paid: float) -> Optional[float]:
+    return (staked - paid) / staked if staked else None
+
+
+class _Totals:
+    """Sums of round contributions. Entries are dropped when they fall back to zero rounds or bets."""
+    def __init__(self):
+        self.rounds = 0
+        self.bets = 0
+        self.staked = 0.0
+        self.paid = 0.0
+        self.seconds: Dict[int, List[float]] = {}  # second -> [staked, bets]
+        self.winning_seconds: Dict[int, int] = {}
+        self.events: Dict[str, List[float]] = {}  # event -> [rounds, staked, paid]
+        self.power_ups: Dict[str, List[float]] = {}  # power_up -> [staked, bets, paid, winning bets]
+
+    def add(self, contribution: Dict[str, Any], sign: int = 1):
+        self.rounds += sign
+        self.bets += sign * contribution["bets"]
+        self.staked += sign * contribution["staked"]
+        self.paid += sign * contribution["paid"]
+        for second, stake, bets in contribution["seconds"]:
+            totals = self.seconds.setdefault(second, [0.0, 0])
+            totals[0] += sign * stake
+            totals[1] += sign * bets
+            if not totals[1]:
+                del self.seconds[second]
+        unlock_second = contribution["unlock_second"]
+        self.winning_seconds[unlock_second] = self.winning_seconds.get(unlock_second, 0) + sign
+        if not self.winning_seconds[unlock_second]:
+            del self.winning_seconds[unlock_second]
+        totals = self.events.setdefault(contribution["event"], [0, 0.0, 0.0])
+        totals[0] += sign
+        totals[1] += sign * contribution["staked"]
+        totals[2] += sign * contribution["paid"]
+        if not totals[0]:
+            del self.events[contribution["event"]]
+        for power_up, stake, bets, paid, winning_bets in contribution["power_ups"]:
+            totals = self.power_ups.setdefault(power_up, [0.0, 0, 0.0, 0])
+            totals[0] += sign * stake
+            totals[1] += sign * bets
+            totals[2] += sign * paid
+            totals[3] += sign * winning_bets
+            if not totals[1]:
+                del self.power_ups[power_up]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds, "bets": self.bets, "staked": self.staked, "paid": self.paid,
+            "house_edge": _edge(self.staked, self.paid),
+            "edge_by_event": {
+                event: {"rounds": rounds, "staked": staked, "paid": paid, "house_edge": _edge(staked, paid)}
+                for event, (rounds, staked, paid) in self.events.items()
+            },
+            "power_ups": {
+                power_up: {
+                    "staked": staked, "bets": bets, "paid": paid, "winning_bets": winning_bets,
+                    "return_to_player": paid / staked if staked else None,
+                }
+                for power_up, (staked, bets, paid, winning_bets) in self.power_ups.items()
+            },
+            "stake_heatmap": {
+                second: {"staked": staked, "bets": bets} for second, (staked, bets) in sorted(self.seconds.items())
+            },
+            "winning_seconds": dict(sorted(self.winning_seconds.items())),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds, "bets": self.bets, "staked": self.staked, "paid": self.paid,
+            "seconds": [[second, *totals] for second, totals in self.seconds.items()],
+            "winning_seconds": list(self.winning_seconds.items()),
+            "events": {event: list(totals) for event, totals in self.events.items()},
+            "power_ups": {power_up: list(totals) for power_up, totals in self.power_ups.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Totals":
+        totals = cls()
+        totals.rounds, totals.bets, totals.staked, totals.paid = (
+            data["rounds"], data["bets"], data["staked"], data["paid"]
+        )
+        totals.seconds = {second: [staked, bets] for second, staked, bets in data["seconds"]}
+        totals.winning_seconds = {second: count for second, count in data["winning_seconds"]}
+        totals.events, totals.power_ups = data["events"], data["power_ups"]
+        return totals
+
+
+class RoundAnalytics:
+    """All-time and rolling (last `window` rounds) aggregates with cached reports."""
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._all_time = _Totals()
+        self._rolling = _Totals()
+        self._recent: deque = deque()
+        self._reports: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, contribution: Dict[str, Any]):
+        self._all_time.add(contribution)
+        self._rolling.add(contribution)
+        self._recent.append(contribution)
+        if len(self._recent) > self.window:
+            self._rolling.add(self._recent.popleft(), sign=-1)
+        self._reports.clear()
+
+    def report(self, scope: str = "all") -> Dict[str, Any]:
+        """Every aggregate for `scope` ("all" or "rolling"). Cached; do not mutate."""
+        report = self._reports.get(scope)
+        if report is None:
+            totals = self._all_time if scope == "all" else self._rolling
+            report = self._reports[scope] = dict(totals.report(), scope=scope, window=self.window)
+        return report
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"window": self.window, "all_time": self._all_time.to_dict(), "recent": list(self._recent)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RoundAnalytics":
+        analytics = cls(data["window"])
+        analytics._all_time = _Totals.from_dict(data["all_time"])
+        for contribution in data["recent"]:
+            analytics._rolling.add(contribution)
+            analytics._recent.append(contribution)
+        return analytics
@@ -5,11 +5,29 @@ Main FastAPI application using Socket.IO, with full game logic,
 player stats endpoints, and robust real-time event handling.
 """
 import asyncio
+import json
+import math
+import os
+import time
+import uuid
+from typing import Optional
 import socketio
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from backend.game_logic import GAME_STATE, start_new_round, GameRoundManager, state_lock
+from backend.admission import AdmissionController, RateLimiter, rejection
+from backend.analytics import SCOPES as ANALYTICS_SCOPES
+from backend.broadcast import BetBroadcaster, LEGACY_NEW_BET_ROOM
+from backend.chat import DEFAULT_CHANNEL, ChatHub, chat_room, valid_channel
+from backend.game_logic import (
+    AUDIT_LOG, EVENT_CONFIG, HISTORY_SIZE, STATE, open_round, prepare_round, get_player_stats_snapshot,
+    checkpoint_state, checkpoint_state_periodically, recover_state,
+)
+from backend.locks import lock_stats
+from backend.scheduler import sleep_until
+from backend.sdk_integration import MAX_BET_SECOND, POWER_UPS
+from backend import metrics
 
 # --- Server Setup ---
 sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*")
@@ -21,81 +39,333 @@ app.add_middleware(
 )
 app.mount('/socket.io', socketio.ASGIApp(sio))
 
+# Broadcast target: this server's clients, or every worker's with a shared backend.
+# Broadcasts are timed and their fan-out size recorded in /metrics.
+fanout = metrics.MeteredEmitter(STATE.fanout(sio))
+WORKER_ID = f"worker_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+LEADER_LEASE_SECONDS = 3.0
+
+# Bets are coalesced and broadcast once per tick instead of once per bet.
+bet_broadcaster = BetBroadcaster(
+    fanout,
+    interval=float(os.environ.get("BET_BROADCAST_INTERVAL_MS", 75)) / 1000,
+    legacy_events=os.environ.get("LEGACY_NEW_BET_EVENTS", "1") == "1",
+)
+
+# Per-player token buckets plus load shedding on event-loop lag and, with the
+# shared state backend, on bets in flight (in-memory bets never overlap)
+admission = AdmissionController(
+    rate=float(os.environ.get("BET_RATE_PER_SECOND", 10)),
+    burst=float(os.environ.get("BET_RATE_BURST", 20)),
+    max_loop_lag=float(os.environ.get("ADMISSION_MAX_LOOP_LAG_MS", 250)) / 1000,
+    max_in_flight=int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 1000)),
+)
+
+# Chat is batched per channel and tick, and skips clients with a send backlog
+chat = ChatHub(
+    sio,
+    interval=float(os.environ.get("CHAT_BROADCAST_INTERVAL_MS", 200)) / 1000,
+    max_batch=int(os.environ.get("CHAT_MAX_BATCH", 100)),
+    max_backlog=int(os.environ.get("CHAT_MAX_CLIENT_BACKLOG", 32)),
+    publish=STATE.publish if STATE.shared else None,
+)
+chat_limiter = RateLimiter(
+    rate=float(os.environ.get("CHAT_RATE_PER_SECOND", 1)),
+    burst=float(os.environ.get("CHAT_RATE_BURST", 5)),
+)
+CHAT_MAX_LENGTH = int(os.environ.get("CHAT_MAX_LENGTH", 280))
+
 # --- Background Game Loop ---
 async def game_loop():
-    """The main game loop that orchestrates rounds."""
+    """The main game loop that orchestrates rounds. Betting closes at the round's
+    monotonic deadline, and the next round is prepared while this one settles."""
+    next_round = await prepare_round(fanout)
     while True:
-        current_round = await start_new_round(sio)
-        await sio.emit("game_update", current_round.get_state())
-        
-        await asyncio.sleep(current_round.config.get("bettingWindow", {}).get("end", 5))
-        
-        result = await current_round.end_round()
-        
-        await sio.emit("round_result", result._asdict())
-        await sio.emit("leaderboard_update", get_leaderboard_data())
+        preparing = None
+        try:
+            current_round = await open_round(next_round)
+            async with chat.hold():
+                await fanout.emit("game_update", current_round.get_state())
+
+            await sleep_until(current_round.bet_deadline, metrics.BETTING_CLOSE_LATENESS)
+            # No bet is accepted past the deadline: deliver the last buffered ones before settling
+            await bet_broadcaster.flush()
+
+            preparing = asyncio.create_task(prepare_round(fanout))
+            result = await current_round.end_round()
+
+            # Chat waits while the result goes out
+            async with chat.hold():
+                await fanout.emit("round_result", result._asdict())
+                await fanout.emit("leaderboard_update", await get_leaderboard_data())
+            next_round = await preparing
+        finally:
+            # Settlement failed or the loop was cancelled (lost lease, shutdown):
+            # don't leave the next round's preparation running on its own
+            if preparing is not None and not preparing.done():
+                preparing.cancel()
+                await asyncio.gather(preparing, return_exceptions=True)
+
+async def leadership_loop():
+    """Runs the game loop only while this worker holds the scheduler lease.
+    With the in-memory backend the lease is always granted."""
+    game_task = None
+    while True:
+        try:
+            is_leader = await STATE.try_acquire_leadership(WORKER_ID, LEADER_LEASE_SECONDS)
+        except Exception as e:
+            print(f"Error renewing leadership: {e}")
+            is_leader = False
+        if game_task is not None and game_task.done():
+            # The game loop died (e.g. a failed settlement): restart it while the lease is held
+            if not game_task.cancelled():
+                print(f"Round scheduler stopped with an error: {game_task.exception()!r}")
+            game_task = None
+        if is_leader and game_task is None:
+            print(f"{WORKER_ID} is running the round scheduler.")
+            game_task = asyncio.create_task(game_loop())
+        elif not is_leader and game_task is not None:
+            print(f"{WORKER_ID} lost the round scheduler lease.")
+            game_task.cancel()
+            game_task = None
+        await asyncio.sleep(LEADER_LEASE_SECONDS / 3)
 
 @app.on_event("startup")
 async def startup_event():
     """Starts the game loop when the server boots."""
-    asyncio.create_task(game_loop())
+    # Parse the event config off the loop; the watcher then reloads it on change
+    await asyncio.to_thread(EVENT_CONFIG.reload_if_changed)
+    asyncio.create_task(EVENT_CONFIG.watch())
+    asyncio.create_task(metrics.monitor_event_loop_lag())
+    # Restore the persisted state before any round can open
+    await recover_state()
+    asyncio.create_task(checkpoint_state_periodically())
+    bet_broadcaster.start()
+    chat.start()
+    if STATE.shared:
+        asyncio.create_task(STATE.relay(sio, handlers={"chat_batch": chat.deliver}))
+    asyncio.create_task(leadership_loop())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await bet_broadcaster.stop()
+    await chat.stop()
+    await checkpoint_state()
+    # Drain and fsync any queued audit records before exiting
+    await asyncio.to_thread(AUDIT_LOG.close)
 
 # --- Socket.IO Events ---
 @sio.event
 async def connect(sid, environ):
     print(f"Client connected: {sid}")
-    async with state_lock:
-        if GAME_STATE["current_round"]:
-            await sio.emit("game_update", GAME_STATE["current_round"].get_state(), to=sid)
-        await sio.emit("leaderboard_update", get_leaderboard_data(), to=sid)
-        await sio.emit("player_stats_update", GAME_STATE["player_stats"].get(sid, {}), to=sid)
+    metrics.CONNECTED_CLIENTS.inc()
+    await sio.enter_room(sid, chat_room(DEFAULT_CHANNEL))
+    # Snapshot first, then emit: no lock is held while writing to the socket
+    round_state = await STATE.get_round_state()
+    leaderboard = await get_leaderboard_data()
+    player_stats = await get_player_stats_snapshot(sid) or {}
+    if round_state:
+        await sio.emit("game_update", round_state, to=sid)
+    await sio.emit("leaderboard_update", leaderboard, to=sid)
+    await sio.emit("player_stats_update", player_stats, to=sid)
+
+@sio.event
+async def disconnect(sid):
+    metrics.CONNECTED_CLIENTS.dec()
+    admission.forget(sid)
+    chat_limiter.forget(sid)
+    chat.forget(sid)
 
 @sio.event
 async def place_bet(sid, data):
-    """Handles a player placing a bet."""
+    """Handles a player placing a bet, subject to rate limiting and admission control."""
+    started = time.perf_counter()
+    response = admission.admit(sid)
+    if response is None:
+        admission.begin()
+        try:
+            response = await _place_bet(sid, data)
+        finally:
+            admission.end()
+        if response["status"] == "success":
+            metrics.BETS_ACCEPTED.inc()
+        else:
+            metrics.BETS_REJECTED.inc()
+    metrics.BET_LATENCY.observe(time.perf_counter() - started)
+    return response
+
+def _valid_amount(amount) -> bool:
+    """A stake must be a finite, positive number (JSON also allows NaN and Infinity)."""
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        return False
+    try:
+        return math.isfinite(amount) and amount > 0
+    except OverflowError:  # An integer too large for a float
+        return False
+
+async def _place_bet(sid, data):
     player_id = sid
-    second = data.get("second")
-    amount = data.get("amount")
-    power_up = data.get("power_up") # e.g., 'multiplier_boost'
+    second = data.get("second") if isinstance(data, dict) else None
+    amount = data.get("amount") if isinstance(data, dict) else None
+    power_up = data.get("power_up") if isinstance(data, dict) else None # e.g., 'multiplier_boost'
 
-    if not all([player_id, isinstance(second, int), isinstance(amount, (int, float))]):
-        return {"status": "error", "message": "Invalid bet information."}
+    if not all([player_id, isinstance(second, int), _valid_amount(amount)]) or isinstance(second, bool):
+        return rejection("invalid_bet", "Invalid bet information.")
+    if not 1 <= second <= MAX_BET_SECOND:
+        return rejection("invalid_bet", f"Bets must target a second from 1 to {MAX_BET_SECOND}.")
+    if power_up is not None and power_up not in POWER_UPS:
+        return rejection("invalid_bet", "Unknown power-up.")
     
-    current_round: GameRoundManager = GAME_STATE.get("current_round")
-    if not await current_round.place_bet(player_id, second, amount, power_up):
-        return {"status": "error", "message": "Betting window is closed."}
+    # Any worker accepts bets for the open round, wherever its scheduler runs
+    round_id = await STATE.add_bet(player_id, second, amount, power_up)
+    if round_id is None:
+        return rejection("betting_closed", "Betting window is closed.")
     
-    await sio.emit("new_bet", {"second": second, "amount": amount})
+    bet_broadcaster.add(round_id, second, amount)
     # Acknowledge success and provide updated stats
     return {
         "status": "success",
         "message": "Bet placed!",
-        "stats": GAME_STATE["player_stats"].get(player_id)
+        "stats": await get_player_stats_snapshot(player_id)
     }
 
+@sio.event
+async def subscribe_new_bet(sid, data=None):
+    """Compatibility path for clients that still consume individual `new_bet` events."""
+    await sio.enter_room(sid, LEGACY_NEW_BET_ROOM)
+    return {"status": "success"}
+
+@sio.event
+async def join_chat(sid, data):
+    """Subscribes the client to a chat channel."""
+    channel = data.get("channel") if isinstance(data, dict) else None
+    if not valid_channel(channel):
+        return rejection("invalid_channel", "Invalid chat channel.")
+    await sio.enter_room(sid, chat_room(channel))
+    return {"status": "success"}
+
+@sio.event
+async def leave_chat(sid, data):
+    """Unsubscribes the client from a chat channel."""
+    channel = data.get("channel") if isinstance(data, dict) else None
+    if not valid_channel(channel):
+        return rejection("invalid_channel", "Invalid chat channel.")
+    await sio.leave_room(sid, chat_room(channel))
+    return {"status": "success"}
+
 @sio.event
 async def send_chat_message(sid, data):
-    """Broadcasts a chat message to all clients."""
-    await sio.emit("chat_message", {"sender": data.get("sender", sid[:6]), "text": data.get("text", "")})
+    """Queues a chat message for the channel's next batch."""
+    text = data.get("text") if isinstance(data, dict) else None
+    channel = data.get("channel", DEFAULT_CHANNEL) if isinstance(data, dict) else None
+    if not isinstance(text, str) or not text.strip() or not valid_channel(channel):
+        return rejection("invalid_message", "Invalid chat message.")
+    if chat_room(channel) not in sio.rooms(sid):
+        return rejection("not_in_channel", "Join the channel before posting to it.")
+    retry_after = chat_limiter.acquire(sid)
+    if retry_after:
+        metrics.CHAT_DROPPED.inc()
+        return rejection("rate_limited", "Too many messages, slow down.", retry_after=retry_after)
+    sender = data.get("sender")
+    sender = sender[:32] if isinstance(sender, str) and sender else sid[:6]
+    chat.post(channel, sender, text[:CHAT_MAX_LENGTH])
+    metrics.CHAT_MESSAGES.inc()
+    return {"status": "success"}
 
 # --- REST API Endpoints ---
-def get_leaderboard_data():
-    return dict(sorted(GAME_STATE["leaderboard"].items(), key=lambda item: item[1], reverse=True)[:10])
+async def get_leaderboard_data():
+    return await STATE.leaderboard_top()
 
 @app.get("/leaderboard")
 async def get_leaderboard():
-    async with state_lock:
-        return get_leaderboard_data()
+    return await get_leaderboard_data()
+
+@app.get("/leaderboard/{player_id}")
+async def get_leaderboard_rank(player_id: str):
+    ranking = await STATE.leaderboard_rank(player_id)
+    if ranking is None:
+        raise HTTPException(status_code=404, detail="Player not on the leaderboard.")
+    rank, winnings = ranking
+    return {"player_id": player_id, "rank": rank, "winnings": winnings}
 
 @app.get("/game/history")
-async def get_game_history():
-    async with state_lock:
-        return {"history": GAME_STATE["round_history"]}
+async def get_game_history(request: Request, cursor: Optional[int] = None, limit: int = HISTORY_SIZE):
+    """Round summaries, newest first. Pass `next_cursor` as `cursor` for older
+    rounds. Responses carry an ETag; a matching If-None-Match gets a bodiless 304.
+    Pages are cached by `RoundHistory` until the next round is pushed."""
+    limit = max(1, min(limit, HISTORY_SIZE))
+    version = await STATE.history_version()
+    etag = f'W/"{version}-{cursor}-{limit}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    page = await STATE.round_history(cursor, limit)
+    etag = f'W/"{page["version"]}-{cursor}-{limit}"'
+    return Response(json.dumps(page), media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/game/history/{round_id}")
+async def get_round_detail(round_id: str):
+    """A settled round's full record, bets included, loaded from the audit log.
+    Only rounds still in the history ring are served, so a request can never
+    make the server search the whole audit history."""
+    summary = await STATE.round_summary(round_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Round not found.")
+    record = await asyncio.to_thread(AUDIT_LOG.read_round, round_id, summary.get("finished_at"))
+    if record is None:
+        raise HTTPException(status_code=404, detail="Round not found.")
+    return record
 
 @app.get("/player/{player_id}/stats")
 async def get_player_stats(player_id: str):
-    async with state_lock:
-        stats = GAME_STATE["player_stats"].get(player_id)
-        if not stats:
-            raise HTTPException(status_code=404, detail="Player not found.")
-        return stats
\ No newline at end of file
+    stats = await get_player_stats_snapshot(player_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Player not found.")
+    return stats
+
+async def get_analytics_report(scope: str):
+    if scope not in ANALYTICS_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(ANALYTICS_SCOPES)}.")
+    return await STATE.analytics_report(scope)
+
+@app.get("/analytics")
+async def get_analytics(scope: str = "all"):
+    """Every aggregate over settled rounds: all time, or the last ANALYTICS_WINDOW rounds."""
+    return await get_analytics_report(scope)
+
+@app.get("/analytics/edge")
+async def get_analytics_edge(scope: str = "all"):
+    """Realized house edge overall and per special event."""
+    report = await get_analytics_report(scope)
+    return {"rounds": report["rounds"], "house_edge": report["house_edge"], "edge_by_event": report["edge_by_event"]}
+
+@app.get("/analytics/heatmap")
+async def get_analytics_heatmap(scope: str = "all"):
+    """Stake and bet count per second, and how often each second won."""
+    report = await get_analytics_report(scope)
+    return {"stake_heatmap": report["stake_heatmap"], "winning_seconds": report["winning_seconds"]}
+
+@app.get("/analytics/power-ups")
+async def get_analytics_power_ups(scope: str = "all"):
+    """Stake, payouts and return to player by power-up ("none" for plain bets)."""
+    report = await get_analytics_report(scope)
+    return report["power_ups"]
+
+@app.get("/analytics/players/{player_id}")
+async def get_player_roi(player_id: str):
+    """A player's return on investment, from their running totals."""
+    stats = await get_player_stats_snapshot(player_id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Player not found.")
+    total_bet, total_won = stats["total_bet"], stats["total_won"]
+    return dict(stats, player_id=player_id, net=total_won - total_bet,
+                roi=(total_won - total_bet) / total_bet if total_bet else None)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Hot-path latency histograms and counters in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/metrics/locks")
+async def get_lock_metrics():
+    """Contention counters for the game state locks."""
+    return lock_stats()
\ No newline at end of file
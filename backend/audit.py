@@ -0,0 +1,309 @@
+"""
+audit.py
+
+Buffered, batched writer for the provably fair audit log. Round records are
+queued from the game loop and serialized and written by a background thread,
+so settlement never waits on JSON encoding or disk I/O.
+
+Durability guarantees:
+  - A record is only durable once its batch has been written and, depending
+    on `fsync_policy`, synced:
+      "always"   - every batch is fsync'd before the next one is taken.
+      "interval" - fsync at most once per `fsync_interval` seconds (default);
+                   a power loss can lose up to that much of the log.
+      "never"    - writes are flushed to the OS, which decides when to sync.
+  - Records still queued when the process is killed are lost. `close()`
+    (called on application shutdown) drains the queue, writes and fsyncs
+    everything before returning, whatever the policy.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from backend.audit_store import ColumnarAuditReader, ColumnarAuditWriter
+from backend.metrics import AUDIT_RECORDS, AUDIT_RECORDS_DROPPED, AUDIT_WRITE_ERRORS, AUDIT_WRITE_SECONDS
+
+FSYNC_POLICIES = ("always", "interval", "never")
+FORMATS = ("jsonl", "columnar")
+_STOP = object()
+
+
+def encode_round_record(record: Dict[str, Any], chunk_size: Optional[int] = None) -> str:
+    """Serializes a round snapshot (see `GameRoundManager.audit_record`) to one JSON line.
+
+    With `chunk_size`, the bets are encoded `chunk_size` at a time and the
+    thread releases the GIL between chunks, so encoding a huge round on the
+    writer thread does not hold the GIL against the event loop for the whole
+    of one `json.dumps` call. The output is identical either way."""
+    bets = record["bets"]
+    if not chunk_size or len(bets) <= chunk_size:
+        return json.dumps(dict(record, bets=[bet._asdict() for bet in bets])) + "\n"
+    encoded_bets = []
+    for start in range(0, len(bets), chunk_size):
+        # Each chunk is encoded as a list and its brackets dropped
+        encoded_bets.append(json.dumps([bet._asdict() for bet in bets[start:start + chunk_size]])[1:-1])
+        time.sleep(0)
+    fields = [
+        f"{json.dumps(key)}: " + ("[" + ", ".join(encoded_bets) + "]" if key == "bets" else json.dumps(value))
+        for key, value in record.items()
+    ]
+    return "{" + ", ".join(fields) + "}\n"
+
+
+def _rotated_numbers(path: str) -> List[int]:
+    directory, base = os.path.split(os.path.abspath(path))
+    return [
+        int(name[len(base) + 1:]) for name in os.listdir(directory)
+        if name.startswith(base + ".") and name[len(base) + 1:].isdigit()
+    ]
+
+
+def segment_paths(path: str) -> List[str]:
+    """Data files of the log at `path`: the active segment, then rotated ones, newest first."""
+    return [path] + [f"{path}.{number}" for number in sorted(_rotated_numbers(path), reverse=True)]
+
+
+def _find_json_round(path: str, round_id: str) -> Optional[Dict[str, Any]]:
+    # Records are written with "round_id" first, so a prefix test skips other lines unparsed
+    prefix = b'{"round_id": ' + json.dumps(round_id).encode()
+    with open(path, "rb") as f:
+        for line in f:
+            if line.startswith(prefix) and line[len(prefix):len(prefix) + 1] in (b",", b"}"):
+                return json.loads(line)
+    return None
+
+
+class JsonLinesSegment:
+    """An append-only JSON-lines segment; the original audit log format."""
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "ab")
+
+    def write(self, lines: Iterable[bytes]):
+        """Appends lines encoded by `encode_round_record`."""
+        self._file.write(b"".join(lines))
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def size(self) -> int:
+        return self._file.tell()
+
+    def sizes(self) -> Dict[str, int]:
+        return {self.path: self._file.tell()}
+
+    def paths(self) -> List[str]:
+        return [self.path]
+
+    def close(self):
+        self._file.close()
+
+
+class AuditLogWriter:
+    """
+    Appends round records to segment files from a worker thread, either as
+    JSON lines or in the columnar format from `backend.audit_store`.
+
+    The active segment is always `path`. Once it grows past `max_bytes` it is
+    renamed to `path.<n>` (n increasing, oldest first; a columnar index moves
+    with it to `path.<n>.idx`) and a new segment is started, so auditors can
+    archive or ship closed segments independently.
+
+    JSON lines are encoded `chunk_size` bets at a time (see
+    `encode_round_record`). The columnar encoder needs no chunking: it loops
+    over bets in Python, where the GIL is switched as usual, and zlib
+    releases the GIL while compressing.
+
+    Records are encoded one by one: a record that cannot be encoded is
+    reported, counted in `time_vault_audit_records_dropped_total` and
+    skipped, without losing the rest of its batch. A failed write is undone
+    by truncating the segment back to its previous size, and the encoded
+    records are kept and written again with the next batch or on close.
+    """
+    def __init__(self, path: str = "provably_fair_audit.log", fsync_policy: str = "interval",
+                 fsync_interval: float = 1.0, batch_size: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 format: str = "jsonl", chunk_size: Optional[int] = 20_000):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync_policy}', expected one of {FSYNC_POLICIES}")
+        if format not in FORMATS:
+            raise ValueError(f"Unknown audit log format '{format}', expected one of {FORMATS}")
+        self.path = path
+        self.format = format
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._file = None
+        self._dirty = False
+        self._last_fsync = 0.0
+        self._unwritten: List[Any] = []  # Encoded records whose write failed
+
+    def submit(self, record: Dict[str, Any]):
+        """Queues a round record. Never blocks; safe to call while holding game locks."""
+        if self._thread is None:
+            self._start()
+        self._queue.put_nowait(record)
+
+    def flush(self):
+        """Blocks until every record submitted so far has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Drains the queue, fsyncs and stops the worker. Call on shutdown."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def read_round(self, round_id: str, finished_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Loads one round's full record (bets included) from the log, searching
+        the newest segment first. With the round's `finished_at`, columnar
+        segments are looked up by timestamp instead of loading their id index.
+        Waits for queued records to be written, so call it off the event loop."""
+        self.flush()
+        for path in self.segment_paths():
+            if not os.path.exists(path):
+                continue
+            if self.format == "columnar":
+                reader = ColumnarAuditReader(path)
+                try:
+                    record = reader.get_round(round_id, finished_at)
+                finally:
+                    reader.close()
+            else:
+                record = _find_json_round(path, round_id)
+            if record is not None:
+                return record
+        return None
+
+    def segment_paths(self) -> List[str]:
+        return segment_paths(self.path)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+                self._thread.start()
+
+    # --- Worker thread ---
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                # With unsynced or unwritten data pending, wake up to sync or retry
+                first = self._queue.get(timeout=self.fsync_interval if self._dirty or self._unwritten else None)
+            except queue.Empty:
+                self._guarded_write([], force_sync=True)
+                continue
+            batch: List[Dict[str, Any]] = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = any(record is _STOP for record in batch)
+            try:
+                self._guarded_write([record for record in batch if record is not _STOP], force_sync=stopping)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        if self._unwritten:
+            print(f"Audit log: {len(self._unwritten)} records could not be written and are lost")
+            AUDIT_RECORDS_DROPPED.inc(len(self._unwritten))
+            self._unwritten = []
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _guarded_write(self, records: List[Dict[str, Any]], force_sync: bool):
+        try:
+            self._write_batch(records, force_sync)
+        except Exception as e:
+            print(f"Error writing to audit log: {e}")
+
+    def _open_segment(self):
+        if self.format == "columnar":
+            return ColumnarAuditWriter(self.path)
+        return JsonLinesSegment(self.path)
+
+    def _encode(self, record: Dict[str, Any]):
+        if self.format == "columnar":
+            return ColumnarAuditWriter.encode(record)
+        return encode_round_record(record, self.chunk_size).encode()
+
+    def _write_batch(self, records: List[Dict[str, Any]], force_sync: bool = False):
+        started = time.perf_counter()
+        for record in records:
+            try:
+                self._unwritten.append(self._encode(record))
+            except Exception as e:
+                print(f"Dropping audit record for {record.get('round_id')}: {e}")
+                AUDIT_RECORDS_DROPPED.inc()
+        if self._unwritten:
+            try:
+                self._append(self._unwritten)
+            except OSError as e:
+                print(f"Error writing to audit log, {len(self._unwritten)} records will be retried: {e}")
+                AUDIT_WRITE_ERRORS.inc()
+                return
+            AUDIT_WRITE_SECONDS.observe(time.perf_counter() - started)
+            AUDIT_RECORDS.inc(len(self._unwritten))
+            self._unwritten = []
+            self._dirty = self.fsync_policy != "never"
+        if self._file is None:
+            return
+        if force_sync or self.fsync_policy == "always" or (
+                self.fsync_policy == "interval" and time.monotonic() - self._last_fsync >= self.fsync_interval):
+            self._sync()
+        if self._file.size() >= self.max_bytes:
+            self._rotate()
+
+    def _append(self, encoded: List[Any]):
+        if self._file is None:
+            self._file = self._open_segment()
+        sizes = self._file.sizes()
+        try:
+            self._file.write(encoded)
+            self._file.flush()
+        except OSError:
+            # Drop whatever part of the batch reached the files, so a retry cannot duplicate it
+            segment, self._file = self._file, None
+            try:
+                segment.close()
+            except OSError:
+                pass
+            for path, size in sizes.items():
+                try:
+                    os.truncate(path, size)
+                except OSError as e:
+                    print(f"Could not truncate {path} after a failed audit write: {e}")
+            raise
+
+    def _sync(self):
+        if self._file is not None:
+            self._file.fsync()
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+
+    def _rotate(self):
+        self._sync()
+        paths = self._file.paths()
+        self._file.close()
+        self._file = None
+        number = max(_rotated_numbers(self.path), default=0) + 1
+        for path in paths:
+            os.replace(path, path.replace(self.path, f"{self.path}.{number}", 1))
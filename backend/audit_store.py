@@ -0,0 +1,272 @@
+"""
+audit_store.py
+
+Compact columnar storage for the provably fair audit log, with an indexed,
+memory-mapped reader. Auditors can fetch a single round by id, stream a time
+range, or find every round a player bet in without parsing the whole log.
+
+A store is a pair of files:
+
+  <path>      Data file: an 8-byte magic header followed by one block per
+              round. Each block holds zlib-compressed sections: round
+              metadata (JSON), the player-id dictionary, and the bet columns
+              (player index, second, amount, power-up code) as packed arrays.
+  <path>.idx  Sidecar index: one fixed-size record per round (round_id,
+              finished_at timestamp, block offset/length, bet count), in
+              append order, so lookups never touch the data file.
+
+Run `python -m backend.audit_store convert provably_fair_audit.log out.tva`
+to convert an existing JSON-lines audit log.
+"""
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+MAGIC = b"TVAUDIT1"
+INDEX_SUFFIX = ".idx"
+ROUND_ID_BYTES = 32
+# round_id, finished_at, offset, length, bet_count
+INDEX_RECORD = struct.Struct(f"<{ROUND_ID_BYTES}sdQII")
+# compressed lengths of: meta, players, player_idx, seconds, amounts, power_ups
+BLOCK_HEADER = struct.Struct("<6I")
+_SECTIONS = ("meta", "players", "player_idx", "seconds", "amounts", "power_ups")
+# Bet columns and their array typecodes; power-up code 0 means none
+_COLUMNS = (("player_idx", "I"), ("seconds", "q"), ("amounts", "d"), ("power_ups", "H"))
+MAX_POWER_UPS = 0xFFFF
+
+
+def _bet_fields(bet) -> tuple:
+    if isinstance(bet, dict):
+        return bet["player_id"], bet["second"], bet["amount"], bet.get("power_up")
+    return bet.player_id, bet.second, bet.amount, bet.power_up
+
+
+def encode_block(record: Dict[str, Any]) -> bytes:
+    """Encodes one round record (audit log format) as a columnar block.
+    Raises ValueError for values the columns cannot hold."""
+    players: Dict[str, int] = {}
+    power_ups: Dict[str, int] = {}
+    player_idx, seconds, amounts, codes = (array.array(typecode) for _, typecode in _COLUMNS)
+    for bet in record["bets"]:
+        player_id, second, amount, power_up = _bet_fields(bet)
+        player_idx.append(players.setdefault(player_id, len(players)))
+        try:
+            seconds.append(second)
+        except OverflowError:
+            raise ValueError(f"Bet second {second} does not fit the audit store") from None
+        amounts.append(amount)
+        code = power_ups.setdefault(power_up, len(power_ups) + 1) if power_up else 0
+        if code > MAX_POWER_UPS:
+            raise ValueError(f"A round can use at most {MAX_POWER_UPS} distinct power-ups")
+        codes.append(code)
+
+    meta = {key: value for key, value in record.items() if key != "bets"}
+    meta["power_ups"] = list(power_ups)
+    sections = [
+        json.dumps(meta).encode(),
+        "\0".join(players).encode(),
+        player_idx.tobytes(), seconds.tobytes(), amounts.tobytes(), codes.tobytes(),
+    ]
+    compressed = [zlib.compress(section) for section in sections]
+    return BLOCK_HEADER.pack(*(len(section) for section in compressed)) + b"".join(compressed)
+
+
+class ColumnarAuditWriter:
+    """Appends round records to a columnar store (data file plus sidecar index)."""
+    def __init__(self, path: str):
+        self.path = path
+        self._data = open(path, "ab")
+        if self._data.tell() == 0:
+            self._data.write(MAGIC)
+        self._index = open(path + INDEX_SUFFIX, "ab")
+
+    @staticmethod
+    def encode(record: Dict[str, Any]) -> tuple:
+        """A record's block and index fields, ready for `write`."""
+        return (encode_block(record), record["round_id"].encode()[:ROUND_ID_BYTES],
+                record.get("finished_at") or 0.0, len(record["bets"]))
+
+    def append(self, record: Dict[str, Any]):
+        self.write([self.encode(record)])
+
+    def write(self, encoded: Iterable[tuple]):
+        """Appends records encoded by `encode`."""
+        for block, round_id, finished_at, bet_count in encoded:
+            offset = self._data.tell()
+            self._data.write(block)
+            self._index.write(INDEX_RECORD.pack(round_id, finished_at, offset, len(block), bet_count))
+
+    def flush(self):
+        # The data file is flushed first so the index never points past it
+        self._data.flush()
+        self._index.flush()
+
+    def fsync(self):
+        self.flush()
+        os.fsync(self._data.fileno())
+        os.fsync(self._index.fileno())
+
+    def size(self) -> int:
+        return self._data.tell()
+
+    def sizes(self) -> Dict[str, int]:
+        return {self.path: self._data.tell(), self.path + INDEX_SUFFIX: self._index.tell()}
+
+    def paths(self) -> List[str]:
+        return [self.path, self.path + INDEX_SUFFIX]
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+
+class ColumnarAuditReader:
+    """
+    Memory-mapped reader for a columnar store. Opening only maps the files;
+    blocks are located through the index and decompressed on demand.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._data_file = open(path, "rb")
+        self._index_file = open(path + INDEX_SUFFIX, "rb")
+        self._data = self._map(self._data_file)
+        self._index = self._map(self._index_file)
+        if self._data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a columnar audit store")
+        # Ignore a torn trailing index record from an interrupted write
+        self._count = len(self._index) // INDEX_RECORD.size
+        self._by_id: Optional[Dict[str, int]] = None
+
+    @staticmethod
+    def _map(f):
+        size = os.fstat(f.fileno()).st_size
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> tuple:
+        round_id, finished_at, offset, length, bet_count = INDEX_RECORD.unpack_from(
+            self._index, position * INDEX_RECORD.size
+        )
+        return round_id.rstrip(b"\0").decode(), finished_at, offset, length, bet_count
+
+    def _sections(self, offset: int, wanted: Iterable[str]) -> Dict[str, bytes]:
+        lengths = BLOCK_HEADER.unpack_from(self._data, offset)
+        start = offset + BLOCK_HEADER.size
+        bounds = {}
+        for name, length in zip(_SECTIONS, lengths):
+            bounds[name] = (start, start + length)
+            start += length
+        return {name: zlib.decompress(self._data[slice(*bounds[name])]) for name in wanted}
+
+    def _decode(self, offset: int) -> Dict[str, Any]:
+        sections = self._sections(offset, _SECTIONS)
+        meta = json.loads(sections["meta"])
+        power_ups = [None] + meta.pop("power_ups")
+        players = sections["players"].decode().split("\0")
+        columns = {}
+        for name, typecode in _COLUMNS:
+            columns[name] = array.array(typecode)
+            columns[name].frombytes(sections[name])
+        meta["bets"] = [
+            {"player_id": players[p], "second": s, "amount": a, "power_up": power_ups[c]}
+            for p, s, a, c in zip(columns["player_idx"], columns["seconds"], columns["amounts"], columns["power_ups"])
+        ]
+        return meta
+
+    def get_round(self, round_id: str, finished_at: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Fetches one round by id, or None if it is not in the store. Given the
+        round's `finished_at`, the index is bisected by timestamp (as in
+        `iter_range`) rather than loaded into an id map."""
+        if finished_at is not None:
+            timestamps = _IndexTimestamps(self)
+            for position in range(bisect.bisect_left(timestamps, finished_at), self._count):
+                entry = self._entry(position)
+                if entry[1] != finished_at:
+                    return None
+                if entry[0] == round_id:
+                    return self._decode(entry[2])
+            return None
+        if self._by_id is None:
+            self._by_id = {self._entry(i)[0]: i for i in range(self._count)}
+        position = self._by_id.get(round_id)
+        if position is None:
+            return None
+        return self._decode(self._entry(position)[2])
+
+    def iter_metadata(self) -> Iterator[Dict[str, Any]]:
+        """Streams every round without its bets, oldest first. Only the metadata
+        section is decompressed, so this is the fast path for whole-log checks."""
+        for position in range(self._count):
+            meta = json.loads(self._sections(self._entry(position)[2], ("meta",))["meta"])
+            meta.pop("power_ups", None)
+            yield meta
+
+    def iter_range(self, start: float, end: float) -> Iterator[Dict[str, Any]]:
+        """Streams rounds with start <= finished_at < end, oldest first."""
+        timestamps = _IndexTimestamps(self)
+        for position in range(bisect.bisect_left(timestamps, start), bisect.bisect_left(timestamps, end)):
+            yield self._decode(self._entry(position)[2])
+
+    def iter_rounds_for_player(self, player_id: str) -> Iterator[Dict[str, Any]]:
+        """Streams every round the player bet in. Only player dictionaries are
+        decompressed for rounds they did not play."""
+        needle = player_id.encode()
+        for position in range(self._count):
+            offset = self._entry(position)[2]
+            if needle in self._sections(offset, ("players",))["players"].split(b"\0"):
+                yield self._decode(offset)
+
+    def close(self):
+        for mapped in (self._data, self._index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._data_file.close()
+        self._index_file.close()
+
+
+class _IndexTimestamps:
+    """Read-only sequence view of the index timestamps, for bisecting in place."""
+    def __init__(self, reader: ColumnarAuditReader):
+        self._reader = reader
+
+    def __len__(self) -> int:
+        return len(self._reader)
+
+    def __getitem__(self, position: int) -> float:
+        return self._reader._entry(position)[1]
+
+
+def convert_json_log(source: str, destination: str) -> int:
+    """Converts a JSON-lines audit log into a columnar store. Returns the round count.
+    Records written before timestamps were logged inherit the previous round's."""
+    writer = ColumnarAuditWriter(destination)
+    count, last_timestamp = 0, 0.0
+    try:
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                last_timestamp = record.get("finished_at") or last_timestamp
+                record["finished_at"] = last_timestamp
+                writer.append(record)
+                count += 1
+    finally:
+        writer.close()
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "convert":
+        print("Usage: python -m backend.audit_store convert <audit.log> <store.tva>")
+        sys.exit(2)
+    print(f"Converted {convert_json_log(sys.argv[2], sys.argv[3])} rounds into {sys.argv[3]}")
@@ -0,0 +1,58 @@
+"""
+benchmarks
+
+Performance benchmarks for the backend hot paths: micro-benchmarks for
+settlement, leaderboard ranking and audit logging, plus a Socket.IO load
+test against a locally started server.
+
+    python -m backend.benchmarks --suite all --output bench.json
+    python -m backend.benchmarks --compare bench.json
+
+Results are written as JSON so runs from different commits can be compared.
+"""
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+
+def measure(fn: Callable[[], Any], repeat: int = 5, setup: Callable[[], Any] | None = None) -> float:
+    """Median wall time of `fn` over `repeat` runs, in seconds. `setup` runs
+    untimed before each run and its return value is passed to `fn`."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            arg = setup()
+            started = time.perf_counter()
+            fn(arg)
+        else:
+            started = time.perf_counter()
+            fn()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def result(name: str, params: Dict[str, Any], value: float, unit: str, better: str = "lower") -> Dict[str, Any]:
+    """One benchmark measurement. `better` is "lower" or "higher"."""
+    return {"name": name, "params": params, "value": value, "unit": unit, "better": better}
+
+
+def result_key(entry: Dict[str, Any]) -> str:
+    params = ",".join(f"{key}={value}" for key, value in sorted(entry["params"].items()))
+    return f"{entry['name']}[{params}]"
+
+
+def compare(baseline: List[Dict[str, Any]], current: List[Dict[str, Any]], tolerance: float = 0.10) -> List[str]:
+    """Returns a line per benchmark that got worse than `baseline` by more than `tolerance`."""
+    previous = {result_key(entry): entry for entry in baseline}
+    regressions = []
+    for entry in current:
+        old = previous.get(result_key(entry))
+        if old is None or old["value"] == 0:
+            continue
+        change = (entry["value"] - old["value"]) / old["value"]
+        worse = change > tolerance if entry["better"] == "lower" else change < -tolerance
+        if worse:
+            regressions.append(
+                f"{result_key(entry)}: {old['value']:.6g} -> {entry['value']:.6g} {entry['unit']} ({change:+.1%})"
+            )
+    return regressions
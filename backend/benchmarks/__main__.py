@@ -0,0 +1,75 @@
+"""
+Runs the benchmark suites and writes machine-readable results.
+
+    python -m backend.benchmarks [--suite micro|socketio|all] [--quick]
+                                 [--output results.json] [--compare baseline.json]
+
+Exits with status 1 when --compare finds a regression beyond --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Keep benchmark side effects (audit segments) out of the working tree
+os.environ.setdefault("AUDIT_LOG_PATH", os.path.join(tempfile.gettempdir(), "time_vault_bench_audit.log"))
+# The ingestion benchmark replays bets from a few thousand ids as fast as possible
+os.environ.setdefault("BET_RATE_PER_SECOND", "1e9")
+os.environ.setdefault("BET_RATE_BURST", "1e9")
+
+from backend.benchmarks import compare  # noqa: E402
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time Vault backend benchmarks")
+    parser.add_argument("--suite", choices=("micro", "socketio", "all"), default="micro")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes, for smoke runs")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = []
+    if args.suite in ("micro", "all"):
+        from backend.benchmarks import micro
+        results += micro.run(quick=args.quick)
+    if args.suite in ("socketio", "all"):
+        from backend.benchmarks import socketio_load
+        results += socketio_load.run(quick=args.quick)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    for entry in results:
+        params = ", ".join(f"{key}={value}" for key, value in entry["params"].items())
+        print(f"{entry['name']:<26} {params:<36} {entry['value']:>14.6g} {entry['unit']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f)["results"], results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+micro.py
+
+In-process micro-benchmarks for settlement, bet ingestion, leaderboard
+ranking and audit logging.
+"""
+import asyncio
+import os
+import random
+import tempfile
+from typing import Any, Dict, List
+
+from backend.benchmarks import measure, result
+from backend.sdk_integration import Bet, GameRound, simulate_round
+
+
+def _random_bets(count: int, players: int = 5000) -> List[Bet]:
+    rng = random.Random(count)
+    return [
+        Bet(f"player_{rng.randrange(players)}", rng.randint(10, 180), float(rng.choice((1, 5, 10, 25, 50, 100))),
+            "multiplier_boost" if rng.random() < 0.1 else None)
+        for _ in range(count)
+    ]
+
+
+class _NullSio:
+    async def emit(self, *args, **kwargs):
+        pass
+
+
+def bench_simulate_round(sizes) -> List[Dict[str, Any]]:
+    results = []
+    for size in sizes:
+        bets = _random_bets(size)
+
+        def setup():
+            round_instance = GameRound({"quick_burst_chance": 0.0})
+            round_instance.place_bets(bets)
+            return round_instance
+        results.append(result("simulate_round", {"bets": size}, measure(simulate_round, setup=setup), "s"))
+    return results
+
+
+def bench_end_round(sizes) -> List[Dict[str, Any]]:
+    """Settlement latency of `GameRoundManager.end_round`, bets already placed."""
+    from backend.game_logic import AUDIT_LOG, GameRoundManager
+
+    async def settle(size, bets):
+        manager = GameRoundManager({"bettingWindow": {"end": 3600}, "bonus_vault_chance": 0.0}, _NullSio())
+        await manager.start_betting()
+        for bet in bets[:size]:
+            await manager.place_bet(*bet)
+        started = asyncio.get_running_loop().time()
+        await manager.end_round()
+        return asyncio.get_running_loop().time() - started
+
+    results = []
+    for size in sizes:
+        bets = _random_bets(size)
+        timings = sorted(asyncio.run(settle(size, bets)) for _ in range(3))
+        results.append(result("end_round", {"bets": size}, timings[1], "s"))
+    AUDIT_LOG.flush()
+    return results
+
+
+def bench_bet_ingestion(count: int) -> List[Dict[str, Any]]:
+    """Throughput of the `place_bet` Socket.IO handler, without the transport."""
+    from backend import app as app_module
+    from backend.game_logic import start_new_round
+
+    async def run():
+        await start_new_round(_NullSio())
+        payloads = [{"second": bet.second, "amount": bet.amount} for bet in _random_bets(count)]
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i, payload in enumerate(payloads):
+            await app_module.place_bet(f"sid_{i % 5000}", payload)
+        return count / (loop.time() - started)
+
+    return [result("place_bet_handler", {"bets": count}, asyncio.run(run()), "bets/s", better="higher")]
+
+
+def bench_leaderboard(players: int) -> List[Dict[str, Any]]:
+    from backend.leaderboard import Leaderboard
+    rng = random.Random(players)
+    updates = [(f"player_{rng.randrange(players)}", rng.random() * 100) for _ in range(players * 2)]
+    board = Leaderboard()
+
+    def apply_updates():
+        for player_id, amount in updates:
+            board.add(player_id, amount)
+
+    update_time = measure(apply_updates, repeat=1)
+    lookups = [player_id for player_id, _ in updates[:10000]]
+    rank_time = measure(lambda: [board.rank(player_id) for player_id in lookups], repeat=3)
+    top_time = measure(lambda: board.top(10), repeat=5)
+    return [
+        result("leaderboard_update", {"players": players}, len(updates) / update_time, "ops/s", better="higher"),
+        result("leaderboard_rank", {"players": players}, len(lookups) / rank_time, "ops/s", better="higher"),
+        result("leaderboard_top10", {"players": players}, top_time, "s"),
+    ]
+
+
+def bench_audit(sizes) -> List[Dict[str, Any]]:
+    from backend.audit import AuditLogWriter
+    results = []
+    for size in sizes:
+        record = {"round_id": "round_bench", "finished_at": 0.0, "config": {}, "bets": tuple(_random_bets(size)),
+                  "result": None}
+        for format in ("jsonl", "columnar"):
+            with tempfile.TemporaryDirectory() as directory:
+                writer = AuditLogWriter(os.path.join(directory, "audit.log"), fsync_policy="never", format=format)
+
+                def write():
+                    for _ in range(10):
+                        writer.submit(record)
+                    writer.flush()
+                elapsed = measure(write, repeat=3)
+                writer.close()
+                size_on_disk = os.path.getsize(os.path.join(directory, "audit.log"))
+            results.append(result("audit_write", {"bets": size, "format": format}, elapsed / 10, "s/round"))
+            results.append(result("audit_size", {"bets": size, "format": format}, size_on_disk / 30, "bytes/round"))
+    return results
+
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    sizes = (1_000, 10_000) if quick else (1_000, 10_000, 100_000)
+    results = []
+    results += bench_simulate_round(sizes)
+    results += bench_end_round(sizes)
+    results += bench_bet_ingestion(10_000 if quick else 100_000)
+    results += bench_leaderboard(10_000 if quick else 1_000_000)
+    results += bench_audit(sizes)
+    return results
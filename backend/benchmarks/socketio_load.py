@@ -0,0 +1,109 @@
+"""
+socketio_load.py
+
+Load test with synthetic Socket.IO clients against a locally started backend
+(`uvicorn backend.app:app`). Measures acknowledged bets per second and how
+broadcast fan-out scales with the number of connected clients.
+
+Requires the asyncio Socket.IO client: pip install "python-socketio[asyncio_client]"
+"""
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from backend.benchmarks import result
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalServer:
+    """Runs the backend in a uvicorn subprocess with its files in a temp dir."""
+    def __init__(self):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._tmp = tempfile.TemporaryDirectory()
+        self._process = None
+
+    def __enter__(self):
+        # Synthetic clients bet as fast as they can: keep the rate limiter out of the measurement
+        env = dict(os.environ, AUDIT_LOG_PATH=os.path.join(self._tmp.name, "audit.log"), PYTHONUNBUFFERED="1",
+                   BET_RATE_PER_SECOND="1e9", BET_RATE_BURST="1e9")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.app:app", "--port", str(self.port), "--log-level", "warning"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("Backend did not start")
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.wait(timeout=10)
+        self._tmp.cleanup()
+
+
+async def _connect(url: str, count: int):
+    import socketio
+    clients = []
+    for _ in range(count):
+        client = socketio.AsyncClient(reconnection=False)
+        await client.connect(url, transports=["websocket"], socketio_path="/socket.io")
+        clients.append(client)
+    return clients
+
+
+async def _bet_throughput(url: str, bettors: int, bets_per_client: int, listeners: int) -> Dict[str, float]:
+    senders = await _connect(url, bettors)
+    idle = await _connect(url, listeners)
+    received = {"batches": 0}
+
+    def on_batch(data):
+        received["batches"] += 1
+    for client in idle:
+        client.on("bets_batch", on_batch)
+
+    async def bet_loop(client):
+        accepted = 0
+        rng = random.Random(id(client))
+        for _ in range(bets_per_client):
+            ack = await client.call("place_bet", {"second": rng.randint(10, 180), "amount": 1.0}, timeout=10)
+            accepted += ack.get("status") == "success"
+        return accepted
+
+    started = time.perf_counter()
+    accepted = sum(await asyncio.gather(*(bet_loop(client) for client in senders)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.3)
+    for client in senders + idle:
+        await client.disconnect()
+    return {"bets_per_second": accepted / elapsed, "batches_per_listener": received["batches"] / max(listeners, 1)}
+
+
+def run(quick: bool = False) -> List[Dict[str, Any]]:
+    bettors = 10 if quick else 50
+    bets_per_client = 50 if quick else 200
+    listener_counts = (0, 10) if quick else (0, 10, 100, 500)
+    results = []
+    with LocalServer() as server:
+        for listeners in listener_counts:
+            measured = asyncio.run(_bet_throughput(server.url, bettors, bets_per_client, listeners))
+            params = {"bettors": bettors, "listeners": listeners}
+            results.append(result("socketio_bets", params, measured["bets_per_second"], "bets/s", better="higher"))
+            if listeners:
+                results.append(result("socketio_fanout_batches", params, measured["batches_per_listener"], "batches"))
+    return results
@@ -0,0 +1,83 @@
+"""
+broadcast.py
+
+Coalesces high-frequency game events before they are broadcast. Instead of
+one `new_bet` emit per bet to every client, accepted bets are collected for a
+short tick and sent as a single `bets_batch` delta carrying per-second stake
+totals.
+"""
+import asyncio
+from typing import Dict, List, Tuple
+
+LEGACY_NEW_BET_ROOM = "legacy_new_bet"
+
+
+class BetBroadcaster:
+    """
+    Collects accepted bets and emits one compact `bets_batch` per tick:
+
+        {"round_id": ..., "seq": 3, "bets": 42, "stakes": {"55": 120.0, ...}}
+
+    `stakes` holds the amount added to each second since the previous batch,
+    so clients fold batches into their per-second totals exactly as they did
+    with individual `new_bet` events. Clients that still consume `new_bet`
+    can join `LEGACY_NEW_BET_ROOM` (see `app.subscribe_new_bet`); when
+    `legacy_events` is enabled they receive the individual bets of each tick.
+    """
+    def __init__(self, sio_server, interval: float = 0.075, legacy_events: bool = True):
+        self.sio = sio_server
+        self.interval = interval
+        self.legacy_events = legacy_events
+        self._round_id = None
+        self._seq = 0
+        self._count = 0
+        self._stakes: Dict[int, float] = {}
+        self._legacy: List[Tuple[int, float]] = []
+        self._task = None
+
+    def add(self, round_id: str, second: int, amount: float):
+        """Buffers an accepted bet. Cheap and synchronous; called on the hot path."""
+        if round_id != self._round_id:
+            # A new round starts a fresh sequence. Anything still buffered from
+            # the previous round was flushed by the game loop when its betting
+            # closed, before settlement, or by the periodic tick since.
+            self._round_id = round_id
+            self._seq = 0
+            self._count = 0
+            self._stakes = {}
+            self._legacy = []
+        self._count += 1
+        self._stakes[second] = self._stakes.get(second, 0) + amount
+        if self.legacy_events:
+            self._legacy.append((second, amount))
+
+    async def flush(self):
+        """Emits everything buffered since the last tick as one batch."""
+        if not self._count:
+            return
+        stakes, legacy, count = self._stakes, self._legacy, self._count
+        self._stakes, self._legacy, self._count = {}, [], 0
+        self._seq += 1
+        await self.sio.emit("bets_batch", {
+            "round_id": self._round_id, "seq": self._seq, "bets": count, "stakes": stakes,
+        })
+        for second, amount in legacy:
+            await self.sio.emit("new_bet", {"second": second, "amount": amount}, room=LEGACY_NEW_BET_ROOM)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error broadcasting bet batch: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,131 @@
+"""
+chat.py
+
+Chat channels with per-tick batching and backpressure. Messages posted to a
+channel are buffered and sent once per tick as a single `chat_batch` to the
+channel's Socket.IO room. Chat yields to game traffic:
+
+  - Clients whose outbound queue is already backed up are skipped, so chat
+    never queues in front of game events for a slow client. The number of
+    messages they missed is sent as one `chat_gap` once they catch up.
+  - While the game loop is broadcasting round events (`hold()`), chat
+    batches wait for the next tick.
+"""
+import asyncio
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from backend import metrics
+
+DEFAULT_CHANNEL = "global"
+_CHANNEL_NAME = re.compile(r"^[a-z0-9_-]{1,32}$")
+
+
+def chat_room(channel: str) -> str:
+    return f"chat:{channel}"
+
+
+def valid_channel(channel: Any) -> bool:
+    return isinstance(channel, str) and bool(_CHANNEL_NAME.match(channel))
+
+
+class ChatHub:
+    """
+    Buffers chat messages per channel and delivers one batch per channel per
+    tick. At most `max_batch` messages are kept per channel and tick (the
+    oldest are dropped). A client counts as slow when more than `max_backlog`
+    packets are waiting in its outbound queue.
+
+    With a shared state backend, pass `publish`: batches are then published
+    and every worker's relay hands them to `deliver` for its own clients.
+    """
+    def __init__(self, sio_server, interval: float = 0.2, max_batch: int = 100, max_backlog: int = 32,
+                 publish: Optional[Callable[[str, Any, Optional[str]], Awaitable[Any]]] = None):
+        self.sio = sio_server
+        self.interval = interval
+        self.max_batch = max_batch
+        self.max_backlog = max_backlog
+        self.publish = publish
+        self._pending: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._missed: Dict[str, Dict[str, int]] = {}
+        self._holds = 0
+        self._task = None
+
+    def post(self, channel: str, sender: str, text: str):
+        """Buffers a message for the next tick. Cheap and synchronous."""
+        pending = self._pending.get(channel)
+        if pending is None:
+            pending = self._pending[channel] = deque(maxlen=self.max_batch)
+        if len(pending) == self.max_batch:
+            metrics.CHAT_DROPPED.inc()
+        pending.append({"sender": sender, "text": text, "ts": time.time()})
+
+    @asynccontextmanager
+    async def hold(self):
+        """Defers chat batches while game-critical events are being sent."""
+        self._holds += 1
+        try:
+            yield
+        finally:
+            self._holds -= 1
+
+    async def flush(self):
+        """Sends each channel's buffered messages as one batch."""
+        if self._holds or not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for channel, messages in pending.items():
+            payload = {"channel": channel, "messages": list(messages)}
+            if self.publish is not None:
+                await self.publish("chat_batch", payload, chat_room(channel))
+            else:
+                await self.deliver(payload)
+
+    async def deliver(self, payload: Dict[str, Any], room: Optional[str] = None):
+        """Emits a batch to this server's clients in the channel, skipping slow ones."""
+        channel = payload["channel"]
+        room = room or chat_room(channel)
+        slow = [sid for sid, eio_sid in self.sio.manager.get_participants("/", room)
+                if self._backlog(eio_sid) > self.max_backlog]
+        for sid in slow:
+            missed = self._missed.setdefault(sid, {})
+            missed[channel] = missed.get(channel, 0) + len(payload["messages"])
+            metrics.CHAT_DROPPED.inc(len(payload["messages"]))
+        await self.sio.emit("chat_batch", payload, room=room, skip_sid=slow or None)
+        metrics.CHAT_BATCHES.inc()
+        await self._report_gaps(set(slow))
+
+    async def _report_gaps(self, still_slow):
+        for sid in [sid for sid in self._missed if sid not in still_slow]:
+            for channel, count in self._missed.pop(sid).items():
+                await self.sio.emit("chat_gap", {"channel": channel, "missed": count}, to=sid)
+
+    def _backlog(self, eio_sid: str) -> int:
+        socket = getattr(self.sio, "eio", None) and self.sio.eio.sockets.get(eio_sid)
+        queue = getattr(socket, "queue", None)
+        return queue.qsize() if queue is not None else 0
+
+    def forget(self, sid: str):
+        """Drops a disconnected client's missed-message counts."""
+        self._missed.pop(sid, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error broadcasting chat batch: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
@@ -0,0 +1,130 @@
+"""
+events.py
+
+Cached, hot-reloadable global event configuration. The YAML file is parsed
+and validated once, turned into an interval schedule, and only re-read when
+its modification time changes. The file is polled off the event loop, so
+asking which events are active is a cheap in-memory lookup.
+"""
+import asyncio
+import bisect
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+
+class EventSchedule(NamedTuple):
+    """Sorted transition times and the events active between each pair of them."""
+    boundaries: List[float]
+    # segments[i] is active for boundaries[i-1] <= t < boundaries[i]
+    segments: List[List[Dict[str, Any]]]
+
+
+EMPTY_SCHEDULE = EventSchedule(boundaries=[], segments=[[]])
+
+
+def build_schedule(config: Dict[str, Any]) -> EventSchedule:
+    """Validates the enabled, time-boxed events and precomputes their schedule.
+    Malformed entries are skipped individually, as before."""
+    windows: List[Tuple[float, float, Dict[str, Any]]] = []
+    for event in (config or {}).get("events", []) or []:
+        try:
+            if not event.get("enabled", False):
+                continue
+            if "start_time" not in event or "end_time" not in event:
+                # Recurring or manually triggered events are not scheduled here
+                continue
+            start_time = datetime.fromisoformat(event["start_time"])
+            end_time = datetime.fromisoformat(event["end_time"])
+            if start_time.tzinfo is None or end_time.tzinfo is None:
+                raise ValueError("start_time and end_time must include a timezone")
+            windows.append((start_time.timestamp(), end_time.timestamp(), event))
+        except (ValueError, TypeError, AttributeError) as e:
+            name = event.get('name', 'N/A') if isinstance(event, dict) else 'N/A'
+            print(f"Skipping malformed event '{name}': {e}")
+
+    boundaries = sorted({t for start, end, _ in windows for t in (start, end)})
+    segments = [[]]
+    for lower in boundaries:
+        # No window opens or closes strictly between two boundaries
+        segments.append([event for start, end, event in windows if start <= lower < end])
+    return EventSchedule(boundaries=boundaries, segments=segments)
+
+
+def apply_event_effects(config: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Applies each event's `effects` to a round config, in order; later events win."""
+    for event in events:
+        effects = event.get("effects", {})
+        config.update(effects)
+    return config
+
+
+class EventConfigCache:
+    """
+    Holds the parsed event schedule for one YAML file.
+
+    `reload_if_changed` stats the file and re-parses it only when its mtime or
+    size changed; `watch` runs it periodically in a worker thread. Event
+    windows are treated as [start_time, end_time).
+    """
+    def __init__(self, path: str = "docs/EVENT_config.yaml", poll_interval: float = 5.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._schedule = EMPTY_SCHEDULE
+        self._signature = None
+        self._loaded = False
+
+    def reload_if_changed(self) -> bool:
+        """Re-reads the file if it changed since the last load. Returns True on reload."""
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        if self._loaded and signature == self._signature:
+            return False
+        self._loaded = True
+        self._signature = signature
+        if signature is None:
+            print(f"{self.path} not found, running without global events.")
+            self._schedule = EMPTY_SCHEDULE
+            return True
+        try:
+            with open(self.path, 'r') as f:
+                config = yaml.safe_load(f)
+            # Swapped in as a single reference so readers never see a partial schedule
+            self._schedule = build_schedule(config)
+        except Exception as e:
+            print(f"Error loading event config: {e}")
+            self._schedule = EMPTY_SCHEDULE
+        return True
+
+    def active_events(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Events active at `now` (epoch seconds, default: current time)."""
+        if not self._loaded:
+            self.reload_if_changed()
+        schedule = self._schedule
+        now = time.time() if now is None else now
+        return schedule.segments[bisect.bisect_right(schedule.boundaries, now)]
+
+    def next_transition(self, now: Optional[float] = None) -> Optional[float]:
+        """Epoch time at which the active event set next changes, if ever."""
+        if not self._loaded:
+            self.reload_if_changed()
+        schedule = self._schedule
+        now = time.time() if now is None else now
+        position = bisect.bisect_right(schedule.boundaries, now)
+        return schedule.boundaries[position] if position < len(schedule.boundaries) else None
+
+    async def watch(self):
+        """Polls the file for changes without blocking the event loop."""
+        while True:
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    print(f"Reloaded event config from {self.path}")
+            except Exception as e:
+                print(f"Error watching event config: {e}")
+            await asyncio.sleep(self.poll_interval)
@@ -5,66 +5,146 @@ Handles the core state machine. This version includes critical fixes for race
 conditions and adds more robust error handling for event configuration.
 """
 import asyncio
-import json
+import os
 import random
 import time
 import uuid
-import yaml
-from asyncio import Lock
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
 
-from backend.sdk_integration import Bet, GameRound, simulate_round
+from backend.analytics import RoundAnalytics, round_contribution
+from backend.audit import AuditLogWriter
+from backend.events import EventConfigCache, apply_event_effects
+from backend.history import RoundHistory
+from backend.leaderboard import Leaderboard
+from backend.locks import InstrumentedLock
+from backend.metrics import BONUS_VAULT_LATENESS, END_ROUND_SECONDS
+from backend.player_stats import PlayerStatsStore
+from backend.provably_fair import SeedPool
+from backend.scheduler import Timers, now
+from backend.sdk_integration import Bet, BetBook, GameRound, simulate_round
+from backend.state_backend import create_state_backend
 
-# In-memory storage. Use Redis in production for scalability.
+HISTORY_SIZE = 50
+
+# In-memory storage, used directly by the default in-process state backend.
+# Readers never lock: "round_history" is a ring of compact summaries whose
+# pages are cached, the leaderboard hands out a cached payload, and player
+# stats are copied when read. Every state backend call is applied atomically
+# by the backend itself, so bet placement, leaderboard and stats updates need
+# no asyncio lock.
 GAME_STATE: Dict[str, Any] = {
     "current_round": None,
-    "round_history": [],
-    "leaderboard": {},
+    "round_history": RoundHistory(HISTORY_SIZE),
+    "leaderboard": Leaderboard(),
     "active_events": [],
-    "player_stats": {},
+    "player_stats": PlayerStatsStore(),
+    # All-time aggregates plus a rolling window over the last ANALYTICS_WINDOW rounds
+    "analytics": RoundAnalytics(int(os.environ.get("ANALYTICS_WINDOW", 1000))),
 }
-state_lock = Lock()
+# The one state that changes across several awaits is the round lifecycle:
+# opening a round, a Bonus Vault payout and settlement each check the round's
+# status and then await the backend. They all hold this lock, so a Bonus Vault
+# win is never paid once settlement has started.
+round_lock = InstrumentedLock("round")
 
+# Open-round bets, player stats, leaderboard, history and broadcast fan-out,
+# either in this process (default) or shared between workers (STATE_BACKEND=shared).
+STATE = create_state_backend(GAME_STATE)
 
-def log_round_for_audit(round_manager):
-    """Appends round data to a log file for provably fair auditing."""
-    try:
-        with open("provably_fair_audit.log", "a") as f:
-            f.write(json.dumps(round_manager.to_dict()) + "\n")
-    except IOError as e:
-        print(f"Error writing to audit log: {e}")
 
+async def get_player_stats_snapshot(player_id: str) -> Dict[str, Any] | None:
+    """A copy of a player's stats, safe to hand to serializers without a lock."""
+    return await STATE.get_player_stats(player_id)
 
-def load_event_config():
-    """Loads and checks for active global events from the YAML file.
-    This version is more robust against individual malformed event entries.
+
+# Settlement is computed on the round's closed book in a worker thread, and
+# the audit record is encoded on the audit writer's thread, so neither runs
+# on the event loop. Both threads still need the GIL.
+# Work that touches every winning bet (payouts) or every bet (the audit log's
+# JSON encoding) is therefore done SETTLEMENT_CHUNK_SIZE bets at a time,
+# releasing the GIL between chunks. This runs nothing in parallel; it bounds
+# how long heartbeats and chat can be kept waiting. Work no larger than one
+# chunk is done in a single pass.
+SETTLEMENT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="settlement")
+SETTLEMENT_CHUNK_SIZE = int(os.environ.get("SETTLEMENT_CHUNK_SIZE", 20_000))
+
+AUDIT_LOG = AuditLogWriter(
+    os.environ.get("AUDIT_LOG_PATH", "provably_fair_audit.log"),
+    fsync_policy=os.environ.get("AUDIT_FSYNC_POLICY", "interval"),
+    format=os.environ.get("AUDIT_LOG_FORMAT", "jsonl"),
+    chunk_size=SETTLEMENT_CHUNK_SIZE,
+)
+
+
+def log_round_for_audit(record: Dict[str, Any]):
+    """Queues a round's `audit_record()` for the provably fair audit log.
+    Serialization and the disk write happen on the audit writer's thread.
     """
-    GAME_STATE["active_events"] = []
-    try:
-        with open("docs/EVENT_config.yaml", 'r') as f:
-            config = yaml.safe_load(f)
-
-        now = datetime.now(timezone.utc)
-        active_events = []
-        for event in config.get("events", []):
-            try:
-                if event.get("enabled", False):
-                    start_time = datetime.fromisoformat(event["start_time"])
-                    end_time = datetime.fromisoformat(event["end_time"])
-                    if start_time <= now <= end_time:
-                        active_events.append(event)
-            except (ValueError, TypeError) as e:
-                print(f"Skipping malformed event '{event.get('name', 'N/A')}': {e}")
-        
-        GAME_STATE["active_events"] = active_events
-        if active_events:
-            print(f"Active global events: {[event['name'] for event in active_events]}")
+    AUDIT_LOG.submit(record)
+
+
+# Leaderboard, player stats, round history and the open round's bets are
+# logged to a write-ahead log in STATE_DIR and checkpointed every
+# STATE_CHECKPOINT_INTERVAL seconds and on shutdown. Startup restores the last
+# checkpoint and replays the log written since. Unset disables persistence.
+STATE_DIR = os.environ.get("STATE_DIR", "")
+STATE_CHECKPOINT_INTERVAL = float(os.environ.get("STATE_CHECKPOINT_INTERVAL", 60))
+STATE_WAL_FSYNC_INTERVAL = float(os.environ.get("STATE_WAL_FSYNC_INTERVAL_MS", 50)) / 1000
+
+
+def log_voided_round(unsettled: Dict[str, Any]):
+    """Records a round that was never settled, with its bets, in the audit log."""
+    log_round_for_audit({
+        "round_id": unsettled["round_id"], "finished_at": time.time(), "voided": True, "config": {},
+        "bets": tuple(Bet(*bet) for bet in unsettled["bets"]), "result": None,
+    })
+    print(f"Round {unsettled['round_id']} was interrupted and has been voided ({len(unsettled['bets'])} bets).")
+
+
+async def recover_state():
+    """Restores the persisted state. A round that was still open cannot be
+    resumed: it is voided and its bets are recorded in the audit log."""
+    if not STATE_DIR:
+        return
+    started = time.perf_counter()
+    unsettled = await STATE.recover(STATE_DIR, STATE_WAL_FSYNC_INTERVAL)
+    if unsettled is not None:
+        log_voided_round(unsettled)
+    # Start from a fresh checkpoint, so the replayed log is not replayed again
+    await STATE.checkpoint()
+    print(f"Recovered game state from {STATE_DIR} in {time.perf_counter() - started:.2f}s")
+
+
+async def checkpoint_state():
+    if STATE_DIR:
+        await STATE.checkpoint()
+
+
+async def checkpoint_state_periodically():
+    while True:
+        await asyncio.sleep(STATE_CHECKPOINT_INTERVAL)
+        try:
+            await checkpoint_state()
+        except OSError as e:
+            print(f"Error checkpointing game state: {e}")
+
+
+# Server seeds for the provably fair outcome, from pre-generated hash chains
+SEED_POOL = SeedPool(chain_length=int(os.environ.get("SEED_CHAIN_LENGTH", 10_000)))
+
+
+EVENT_CONFIG = EventConfigCache(os.environ.get("EVENT_CONFIG_PATH", "docs/EVENT_config.yaml"))
 
-    except FileNotFoundError:
-        print("docs/EVENT_config.yaml not found, running without global events.")
-    except Exception as e:
-        print(f"Error loading event config: {e}")
+
+def load_event_config():
+    """Sets the currently active global events from the cached event schedule.
+    The YAML file itself is only re-parsed by `EVENT_CONFIG` when it changes.
+    """
+    active_events = EVENT_CONFIG.active_events()
+    if active_events is not GAME_STATE["active_events"] and active_events:
+        print(f"Active global events: {[event['name'] for event in active_events]}")
+    GAME_STATE["active_events"] = active_events
 
 
 class GameRoundManager:
@@ -73,104 +153,166 @@ class GameRoundManager:
         self.status = "pending"
         self.sio = sio_server
         self.config = self._apply_event_effects(config)
-        self.bets: List[Bet] = []
+        self.active_events = [event['name'] for event in GAME_STATE.get("active_events", [])]
         self.bet_end_time = None
+        # The same deadline on the scheduler's monotonic clock; bet_end_time is for clients
+        self.bet_deadline = None
+        self.timers = Timers()
         self.result = None
-        self.sdk_round = GameRound(self.config)
+        seed = SEED_POOL.next_seed()
+        self.sdk_round = GameRound(self.config, server_seed=seed.seed, nonce=seed.nonce, chain_anchor=seed.chain_anchor)
+        # Bets are indexed straight into the SDK round's book, so settlement
+        # does not need to copy or rescan them.
+        self.bets: BetBook = self.sdk_round.bets
         self.bonus_vault_triggered = False
+        self.finished_at = None
 
     def _apply_event_effects(self, config):
-        for event in GAME_STATE.get("active_events", []):
-            effects = event.get("effects", {})
-            config.update(effects)
-        return config
+        return apply_event_effects(config, GAME_STATE.get("active_events", []))
 
     async def start_betting(self):
+        window = self.config.get("bettingWindow", {}).get("end", 5)
         self.status = "betting"
-        self.bet_end_time = time.time() + self.config.get("bettingWindow", {}).get("end", 5)
+        self.bet_deadline = now() + window
+        self.bet_end_time = time.time() + window
+        # A round left unsettled by a scheduler that died or lost its lease is voided
+        voided = await STATE.open_round(self.round_id, self.get_state(), self.bets, self.bet_deadline)
+        if voided is not None:
+            log_voided_round(voided)
         print(f"Round {self.round_id} started. Betting is open.")
-        asyncio.create_task(self.bonus_vault_checker())
+        self.schedule_bonus_vault()
+
+    def schedule_bonus_vault(self):
+        """
+        Draws up front whether this round has a Bonus Vault win and when, and
+        schedules it as a timer at that point of the betting window.
+        `bonus_vault_chance` is the chance per round.
+        """
+        if random.random() < self.config.get("bonus_vault_chance", 0.03):
+            window = self.bet_deadline - now()
+            self.timers.at(now() + random.random() * window, BONUS_VAULT_LATENESS, self.trigger_bonus_vault)
 
-    async def bonus_vault_checker(self):
+    async def trigger_bonus_vault(self):
         """
-        Periodically checks for a Bonus Vault win.
-        FIXED: This function now uses the shared lock to prevent race conditions
-        when accessing the list of bets.
+        Pays a Bonus Vault win to a random bet of the open round.
+        The winning bet is drawn by the state backend, so bets accepted by any
+        worker are eligible; the win is announced afterwards.
         """
-        while time.time() < self.bet_end_time and not self.bonus_vault_triggered:
-            await asyncio.sleep(0.5)
-            # Spread the chance over the betting window duration
-            if random.random() < self.config.get("bonus_vault_chance", 0.03) / 10:
-                async with state_lock:
-                    if self.bets and not self.bonus_vault_triggered:
-                        self.bonus_vault_triggered = True
-                        random_bet = random.choice(self.bets)
-                        instant_win_multiplier = 10
-                        payout = random_bet.amount * instant_win_multiplier
-                        
-                        winner_id = random_bet.player_id
-                        GAME_STATE["leaderboard"][winner_id] = GAME_STATE["leaderboard"].get(winner_id, 0) + payout
-                        
-                        win_data = {"player_id": winner_id, "payout": payout}
-                        await self.sio.emit("bonus_vault_win", win_data)
-                        print(f"Bonus Vault Win! Player {winner_id} won ${payout:.2f}")
+        async with round_lock:
+            if self.status != "betting" or self.bonus_vault_triggered:
+                return
+            random_bet = await STATE.sample_bet(self.round_id)
+            if random_bet is None:
+                return
+            self.bonus_vault_triggered = True
+            instant_win_multiplier = 10
+            payout = random_bet.amount * instant_win_multiplier
+            winner_id = random_bet.player_id
+            await STATE.add_winnings([(winner_id, payout)])
+
+        win_data = {"player_id": winner_id, "payout": payout}
+        await self.sio.emit("bonus_vault_win", win_data)
+        print(f"Bonus Vault Win! Player {winner_id} won ${payout:.2f}")
 
     async def place_bet(self, player_id: str, second: int, amount: float, power_up: str | None) -> bool:
-        if self.status != "betting": return False
-        async with state_lock:
-            self.bets.append(Bet(player_id=player_id, second=second, amount=amount, power_up=power_up))
-            stats = GAME_STATE["player_stats"].setdefault(player_id, {'wins': 0, 'total_bet': 0, 'total_won': 0})
-            stats['total_bet'] += amount
-        return True
+        """Adds a bet to this round through the state backend. With the default
+        in-process backend this never suspends, so it cannot interleave with
+        settlement, which closes the round before its first await. Bets after
+        the deadline are refused even if the round has not been closed yet."""
+        if self.status != "betting" or now() >= self.bet_deadline: return False
+        return await STATE.add_bet(player_id, second, amount, power_up) == self.round_id
 
     async def end_round(self):
-        async with state_lock:
+        # Close betting before yielding to the loop, so no bet can arrive
+        # after the book has been settled.
+        if self.status in ("betting", "pending"):
+            self.status = "settling"
+        self.timers.cancel()
+        started = time.perf_counter()
+        async with round_lock:
             if self.status == "finished": return self.result
+            # Bets may have been accepted by other workers: settle the backend's book
+            self.bets = self.sdk_round.bets = await STATE.close_round(self.round_id)
+            self.finished_at = time.time()
+            # The book is closed, so nothing mutates it while the worker thread reads it
+            loop = asyncio.get_running_loop()
+            wins, audit_record, contribution = await loop.run_in_executor(SETTLEMENT_EXECUTOR, self._settle)
+
             self.status = "finished"
-            self.sdk_round.place_bets(self.bets)
-            self.result = simulate_round(self.sdk_round)
-            
-            for winner in self.result.winners:
-                player_id = winner['player_id']
-                payout = winner['payout']
-                GAME_STATE["leaderboard"][player_id] = GAME_STATE["leaderboard"].get(player_id, 0) + payout
-                stats = GAME_STATE["player_stats"].setdefault(player_id, {'wins': 0, 'total_bet': 0, 'total_won': 0})
-                stats['wins'] += 1
-                stats['total_won'] += payout
-
-            GAME_STATE["round_history"].insert(0, self.to_dict())
-            if len(GAME_STATE["round_history"]) > 50:
-                GAME_STATE["round_history"].pop()
-            
-            log_round_for_audit(self)
+            await STATE.apply_settlement(
+                self.round_id, self.get_state(), self.result.payouts, wins, self.summary(), contribution
+            )
+
+            log_round_for_audit(audit_record)
+            END_ROUND_SECONDS.observe(time.perf_counter() - started)
             print(f"Round {self.round_id} finished. Unlock second: {self.result.unlock_second}")
             return self.result
 
+    def _settle(self):
+        """Computes the result and everything derived from the full bet list.
+        Runs on the settlement thread; touches no shared state. Payouts are
+        chunked by `simulate_round`; the analytics contribution reads the
+        book's running totals and the winners only, and the bets are encoded
+        for the audit log later, in chunks, on the audit writer's thread."""
+        self.result = simulate_round(self.sdk_round, chunk_size=SETTLEMENT_CHUNK_SIZE)
+        wins: Dict[str, int] = {}
+        for winner in self.result.winners:
+            wins[winner['player_id']] = wins.get(winner['player_id'], 0) + 1
+        return wins, self.audit_record(), round_contribution(self.bets, self.result)
+
     def get_state(self):
         return {
             "round_id": self.round_id, "status": self.status,
             "bet_end_time": self.bet_end_time, "bets_placed": len(self.bets),
+            "stake_by_second": self.bets.stake_by_second(),
+            # Published while betting is open; the seed itself is revealed in the result
+            "server_seed_hash": self.sdk_round.server_seed_hash, "client_seed": self.sdk_round.client_seed,
+            "nonce": self.sdk_round.nonce,
             "result": self.result._asdict() if self.result else None,
-            "active_events": [event['name'] for event in GAME_STATE.get("active_events", [])]
+            "active_events": self.active_events
         }
         
-    def to_dict(self):
+    def audit_record(self):
+        """A snapshot of the round for the audit log, taken on the settlement thread.
+        Bets stay as tuples; `audit.encode_round_record` serializes them off the loop.
+        """
         return {
-            "round_id": self.round_id, "config": self.config,
-            "bets": [bet._asdict() for bet in self.bets],
+            "round_id": self.round_id, "finished_at": self.finished_at, "config": self.config,
+            "bets": tuple(self.bets),
             "result": self.result._asdict() if self.result else None
         }
 
-
-async def start_new_round(sio_server):
-    async with state_lock:
-        load_event_config()
-        config = {
-            "min_seconds": 10, "max_seconds": 180,
-            "quick_burst_chance": 0.05, "bonus_vault_chance": 0.03,
-            "house_edge": 0.02, "bettingWindow": {"end": 5}
+    def summary(self):
+        """The compact history entry for a settled round. Bets and winners are
+        only counted; `GET /game/history/{round_id}` loads them from the audit log."""
+        return {
+            "round_id": self.round_id, "finished_at": self.finished_at,
+            "unlock_second": self.result.unlock_second, "pot": self.bets.total_pot,
+            "bets_placed": len(self.bets), "winner_count": len(self.result.winners),
+            "special_event": self.result.special_event_triggered,
         }
-        new_round = GameRoundManager(config, sio_server)
+
+
+async def prepare_round(sio_server):
+    """Builds the next round without opening it: event effects are applied and
+    its server seed drawn (off the loop, as it may wait for a new seed chain).
+    The game loop prepares the next round while the current one settles."""
+    load_event_config()
+    config = {
+        "min_seconds": 10, "max_seconds": 180,
+        "quick_burst_chance": 0.05, "bonus_vault_chance": 0.03,
+        "house_edge": 0.02, "bettingWindow": {"end": 5}
+    }
+    return await asyncio.to_thread(GameRoundManager, config, sio_server)
+
+
+async def open_round(new_round):
+    """Makes a prepared round current and opens betting; its betting window starts now."""
+    async with round_lock:
         GAME_STATE["current_round"] = new_round
         await new_round.start_betting()
-        return new_round
\ No newline at end of file
+        return new_round
+
+
+async def start_new_round(sio_server):
+    return await open_round(await prepare_round(sio_server))
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""
+history.py
+
+Round history as a fixed-capacity ring of compact round summaries. Full bet
+detail is not kept in memory; it is loaded from the audit log on request
+(see `AuditLogWriter.read_round`), for rounds still in the ring.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_CAPACITY = 50
+
+
+class RoundHistory:
+    """
+    The last `capacity` round summaries. Each summary gets a sequence number
+    (`seq`) when pushed; pages are read newest first and paginated by passing
+    the previous page's `next_cursor`. `version` changes on every push, and
+    pages are cached until then, so repeated polling does no work.
+    """
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self._pushed = 0
+        self._pages: Dict[Tuple[Optional[int], int], Dict[str, Any]] = {}
+
+    @classmethod
+    def from_entries(cls, capacity: int, pushed: int, entries: List[Dict[str, Any]]) -> "RoundHistory":
+        """Rebuilds a history from its retained summaries (newest first, as
+        iterated) and the number of summaries ever pushed."""
+        history = cls(capacity)
+        history._pushed = pushed
+        for summary in entries:
+            history._slots[summary["seq"] % capacity] = summary
+        return history
+
+    @property
+    def version(self) -> int:
+        return self._pushed
+
+    def push(self, summary: Dict[str, Any]):
+        seq = self._pushed
+        self._slots[seq % self.capacity] = dict(summary, seq=seq)
+        self._pushed += 1
+        self._pages.clear()
+
+    def page(self, cursor: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Up to `limit` summaries older than `cursor` (all retained ones when
+        None), newest first, with the cursor for the next page and the version."""
+        limit = self.capacity if limit is None else max(1, min(limit, self.capacity))
+        oldest = max(0, self._pushed - self.capacity)
+        if cursor is not None:
+            # Clamped, so the page cache stays bounded whatever clients send
+            cursor = max(oldest, min(cursor, self._pushed))
+        key = (cursor, limit)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+        newest = self._pushed - 1 if cursor is None else cursor - 1
+        stop = max(oldest, newest - limit + 1)
+        entries = [self._slots[seq % self.capacity] for seq in range(newest, stop - 1, -1)]
+        page = {
+            "history": entries,
+            "next_cursor": stop if entries and stop > oldest else None,
+            "version": self._pushed,
+        }
+        self._pages[key] = page
+        return page
+
+    def find(self, round_id: str) -> Optional[Dict[str, Any]]:
+        """The retained summary of `round_id`, or None once it has been evicted."""
+        for summary in self:
+            if summary["round_id"] == round_id:
+                return summary
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The retained summaries and counters; see `from_entries`."""
+        return {"capacity": self.capacity, "pushed": self._pushed, "entries": self.page()["history"]}
+
+    def __len__(self) -> int:
+        return min(self._pushed, self.capacity)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Summaries newest first."""
+        return iter(self.page()["history"])
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """The `index`-th newest summary."""
+        return self.page()["history"][index]
@@ -0,0 +1,91 @@
+"""
+leaderboard.py
+
+Incrementally ranked player winnings. Scores are kept in a sorted structure
+alongside a player index, so updates, top-K reads and rank lookups are
+logarithmic instead of re-sorting every player on each broadcast.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    """
+    Maps player_id -> total winnings and keeps players ranked by winnings.
+
+    The serialized top entries (the `leaderboard_update` payload) are cached
+    and only rebuilt after an update that touches the top of the board.
+    """
+    def __init__(self, top_size: int = 10):
+        self.top_size = top_size
+        self._scores: Dict[str, float] = {}
+        # Sorted by (-score, player_id): index 0 is the leader
+        self._ranked = SortedList()
+        self._top_payload: Optional[Dict[str, float]] = None
+
+    @classmethod
+    def from_items(cls, items: Iterable[Tuple[str, float]], top_size: int = 10) -> "Leaderboard":
+        """Builds a leaderboard from (player_id, winnings) pairs in one pass."""
+        leaderboard = cls(top_size)
+        leaderboard._scores = dict(items)
+        leaderboard._ranked = SortedList((-score, player_id) for player_id, score in leaderboard._scores.items())
+        return leaderboard
+
+    def _in_top(self, key: Tuple[float, str]) -> bool:
+        if len(self._ranked) <= self.top_size:
+            return True
+        return key <= self._ranked[self.top_size - 1]
+
+    def add(self, player_id: str, amount: float):
+        """Adds winnings to a player's total."""
+        old_score = self._scores.get(player_id)
+        if old_score is not None:
+            old_key = (-old_score, player_id)
+            touches_top = self._in_top(old_key)
+            self._ranked.remove(old_key)
+            new_score = old_score + amount
+        else:
+            touches_top = False
+            new_score = amount
+        new_key = (-new_score, player_id)
+        self._scores[player_id] = new_score
+        self._ranked.add(new_key)
+        if touches_top or self._in_top(new_key):
+            self._top_payload = None
+
+    def get(self, player_id: str, default=None):
+        return self._scores.get(player_id, default)
+
+    def __getitem__(self, player_id: str) -> float:
+        return self._scores[player_id]
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def scores(self) -> Dict[str, float]:
+        """A copy of every player's winnings, unordered."""
+        return dict(self._scores)
+
+    def items(self) -> Iterator[Tuple[str, float]]:
+        """Iterates (player_id, winnings) from the highest total down."""
+        return ((player_id, -neg_score) for neg_score, player_id in self._ranked)
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        return [(player_id, -neg_score) for neg_score, player_id in self._ranked.islice(0, k)]
+
+    def rank(self, player_id: str) -> Optional[int]:
+        """Returns the player's 1-based rank, or None if they have no winnings."""
+        score = self._scores.get(player_id)
+        if score is None:
+            return None
+        return self._ranked.index((-score, player_id)) + 1
+
+    def top_payload(self) -> Dict[str, float]:
+        """The top entries as {player_id: winnings}. Cached; do not mutate."""
+        if self._top_payload is None:
+            self._top_payload = dict(self.top(self.top_size))
+        return self._top_payload
@@ -0,0 +1,81 @@
+"""
+locks.py
+
+asyncio locks that record how often they are contended and how long
+coroutines wait for and hold them, so lock contention can be observed.
+Wait and hold times are also recorded in the `time_vault_lock_wait_seconds`
+and `time_vault_lock_hold_seconds` histograms.
+"""
+import asyncio
+import time
+from typing import Dict
+
+from backend.metrics import Histogram
+
+LOCKS: Dict[str, "InstrumentedLock"] = {}
+
+
+class InstrumentedLock:
+    """A drop-in `asyncio.Lock` (use with `async with`) that keeps contention counters."""
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = asyncio.Lock()
+        self._acquired_at = 0.0
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self._wait_histogram = Histogram(
+            "time_vault_lock_wait_seconds", "Time spent waiting to acquire a state lock.", labels={"lock": name}
+        )
+        self._hold_histogram = Histogram(
+            "time_vault_lock_hold_seconds", "Time a state lock was held.", labels={"lock": name}
+        )
+        LOCKS[name] = self
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    async def acquire(self):
+        if self._lock.locked():
+            self.contended += 1
+            started = time.perf_counter()
+            await self._lock.acquire()
+            waited = time.perf_counter() - started
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self._wait_histogram.observe(waited)
+        else:
+            await self._lock.acquire()
+            self._wait_histogram.observe(0.0)
+        self.acquisitions += 1
+        self._acquired_at = time.perf_counter()
+        return True
+
+    def release(self):
+        held = time.perf_counter() - self._acquired_at
+        self.hold_seconds += held
+        self._hold_histogram.observe(held)
+        self._lock.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_ratio": self.contended / self.acquisitions if self.acquisitions else 0.0,
+            "wait_seconds": self.wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds,
+            "hold_seconds": self.hold_seconds,
+        }
+
+
+def lock_stats() -> Dict[str, Dict[str, float]]:
+    """Contention counters for every instrumented lock, by name."""
+    return {name: lock.stats() for name, lock in LOCKS.items()}
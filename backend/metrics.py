@@ -0,0 +1,217 @@
+"""
+metrics.py
+
+Low-overhead counters, gauges and histograms for the hot paths, rendered in
+the Prometheus text exposition format by the `/metrics` endpoint.
+
+Every metric is created once at import time; histograms pre-allocate their
+bucket counters, so recording a value is a bisect and a few integer/float
+additions with no per-call allocation. Metrics may share a name as long as
+their labels differ; they are rendered as one family.
+
+Metrics are recorded and rendered on the event loop without locking. One
+that is also recorded from a worker thread is created with `threadsafe=True`,
+so its updates and renders hold its own lock.
+"""
+import asyncio
+import bisect
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+_REGISTRY: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], "_Metric"] = {}
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None, threadsafe: bool = False):
+        self.name = name
+        self.help = help
+        self.labels = tuple(sorted((labels or {}).items()))
+        self._lock = threading.Lock() if threadsafe else None
+        # A metric re-created with the same name and labels replaces the old one
+        _REGISTRY[(name, self.labels)] = self
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """The metric's lines in the exposition format, without HELP and TYPE."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None, threadsafe: bool = False):
+        super().__init__(name, help, labels, threadsafe)
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        if self._lock is None:
+            self.value += amount
+        else:
+            with self._lock:
+                self.value += amount
+
+    def samples(self) -> List[str]:
+        # Reading one attribute is atomic, so rendering needs no lock
+        return [f"{self.name}{_format_labels(self.labels)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None,
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labels)
+        self.value = 0
+        self._function = function
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def samples(self) -> List[str]:
+        value = self._function() if self._function else self.value
+        return [f"{self.name}{_format_labels(self.labels)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labels: Optional[Dict[str, str]] = None, threadsafe: bool = False):
+        super().__init__(name, help, labels, threadsafe)
+        self._bounds = tuple(buckets)
+        # One slot per bound plus the +Inf overflow slot, allocated once
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        if self._lock is None:
+            self._observe(value)
+        else:
+            with self._lock:
+                self._observe(value)
+
+    def _observe(self, value: float):
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        if self._lock is None:
+            counts, total, count = self._counts, self.sum, self.count
+        else:
+            # Buckets, sum and count from the same set of observations
+            with self._lock:
+                counts, total, count = list(self._counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self._bounds + (float("inf"),), counts):
+            cumulative += bucket
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels)} {count}")
+        return lines
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text format (version 0.0.4)."""
+    families: Dict[str, List[_Metric]] = {}
+    for (name, _), metric in _REGISTRY.items():
+        families.setdefault(name, []).append(metric)
+    lines = []
+    for name, metrics in families.items():
+        lines.append(f"# HELP {name} {metrics[0].help}")
+        lines.append(f"# TYPE {name} {metrics[0].kind}")
+        for metric in metrics:
+            lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# --- Hot-path metrics ---
+
+BET_LATENCY = Histogram("time_vault_bet_seconds", "Time to handle a place_bet event.")
+BETS_ACCEPTED = Counter("time_vault_bets_total", "Bets handled, by outcome.", labels={"outcome": "accepted"})
+BETS_REJECTED = Counter("time_vault_bets_total", "Bets handled, by outcome.", labels={"outcome": "rejected"})
+BETS_RATE_LIMITED = Counter("time_vault_bets_total", "Bets handled, by outcome.", labels={"outcome": "rate_limited"})
+BETS_SHED = Counter("time_vault_bets_total", "Bets handled, by outcome.", labels={"outcome": "overloaded"})
+BETS_IN_FLIGHT = Gauge("time_vault_bets_in_flight", "Admitted bets still being processed.")
+END_ROUND_SECONDS = Histogram("time_vault_end_round_seconds", "Duration of round settlement (end_round).")
+# Recorded by the audit writer's thread
+AUDIT_WRITE_SECONDS = Histogram("time_vault_audit_write_seconds", "Time to encode and write one audit batch.",
+                                threadsafe=True)
+AUDIT_RECORDS = Counter("time_vault_audit_records_total", "Round records written to the audit log.",
+                        threadsafe=True)
+AUDIT_RECORDS_DROPPED = Counter("time_vault_audit_records_dropped_total",
+                                "Round records that could not be encoded or written to the audit log.",
+                                threadsafe=True)
+AUDIT_WRITE_ERRORS = Counter("time_vault_audit_write_errors_total", "Failed audit log writes (retried).",
+                             threadsafe=True)
+EMIT_SECONDS = Histogram("time_vault_emit_seconds", "Duration of a broadcast emit.")
+EMIT_FANOUT = Histogram("time_vault_emit_fanout_clients", "Connected clients reached per broadcast.",
+                        buckets=SIZE_BUCKETS)
+CONNECTED_CLIENTS = Gauge("time_vault_connected_clients", "Socket.IO clients connected to this worker.")
+BETTING_CLOSE_LATENESS = Histogram("time_vault_scheduler_lateness_seconds",
+                                   "How late a scheduled round timer fired.", labels={"timer": "betting_close"})
+BONUS_VAULT_LATENESS = Histogram("time_vault_scheduler_lateness_seconds",
+                                 "How late a scheduled round timer fired.", labels={"timer": "bonus_vault"})
+CHAT_MESSAGES = Counter("time_vault_chat_messages_total", "Chat messages accepted for broadcast.")
+CHAT_BATCHES = Counter("time_vault_chat_batches_total", "Chat batches emitted to a channel.")
+CHAT_DROPPED = Counter("time_vault_chat_dropped_total", "Chat messages dropped for full batches or slow clients.")
+LOOP_LAG_SECONDS = Histogram("time_vault_event_loop_lag_seconds", "How late the event loop ran a timer.")
+LOOP_LAG = Gauge("time_vault_event_loop_lag_last_seconds", "Most recent event-loop lag measurement.")
+
+
+class MeteredEmitter:
+    """Wraps an emit target (the Socket.IO server or a fan-out) and records
+    the duration and fan-out size of every broadcast."""
+    def __init__(self, target):
+        self.target = target
+
+    async def emit(self, event, data=None, to=None, **kwargs):
+        if to is not None:
+            await self.target.emit(event, data, to=to, **kwargs)
+            return
+        started = time.perf_counter()
+        await self.target.emit(event, data, **kwargs)
+        EMIT_SECONDS.observe(time.perf_counter() - started)
+        if kwargs.get("room") is None:
+            EMIT_FANOUT.observe(CONNECTED_CLIENTS.value)
+
+
+async def monitor_event_loop_lag(interval: float = 0.25):
+    """Measures how late a periodic timer fires; a busy loop fires it late."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG_SECONDS.observe(lag)
+        LOOP_LAG.set(lag)
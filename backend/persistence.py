@@ -0,0 +1,246 @@
+"""
+persistence.py
+
+Crash-safe persistence for the shared game state: a write-ahead log (WAL) of
+every state change plus periodic checkpoints (snapshots).
+
+WAL: numbered generation files (`state.wal.<n>`) of binary records
+
+    kind (1 byte), payload length (uint32), CRC-32 of the payload (uint32), payload
+
+for round opens, bets, settlements, voided rounds and bonus winnings. Records are appended
+to a buffer on the caller's thread and flushed and fsynced by a background
+thread every `fsync_interval` seconds, so a crash loses at most that window.
+A torn or corrupt record ends replay.
+
+Checkpoints: the state is copied and the WAL rotated to a new generation in
+one critical section, so the snapshot is exactly the state at the start of
+that generation. The snapshot is written atomically off the critical path,
+after which older generations are deleted (except those holding the bets of
+a round that is still open). A snapshot is
+
+    8-byte magic, generation, then the lengths of four sections (uint64 each),
+    player stats (`PlayerStatsStore` format), leaderboard (count, float64
+    winnings, NUL-joined ids), round history (JSON), analytics (JSON)
+
+Warm restart memory-maps the snapshot and replays only the WAL generations
+written since, so its cost does not grow with the length of the history.
+"""
+import array
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from backend.analytics import RoundAnalytics
+from backend.history import RoundHistory
+from backend.leaderboard import Leaderboard
+from backend.player_stats import PlayerStatsStore, write_snapshot
+
+SNAPSHOT_NAME = "state.snapshot"
+SNAPSHOT_MAGIC = b"TVSNAP02"
+_SNAPSHOT_HEADER = struct.Struct("<QQQQQ")
+_COUNT = struct.Struct("<Q")
+_WAL_NAME = re.compile(r"^state\.wal\.(\d+)$")
+_RECORD_HEADER = struct.Struct("<cII")
+_BET = struct.Struct("<qd")
+
+OPEN_ROUND = b"O"
+BET = b"B"
+SETTLEMENT = b"S"
+WINNINGS = b"W"
+VOID = b"V"
+
+
+def _json(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def _wal_path(directory: str, generation: int) -> str:
+    return os.path.join(directory, f"state.wal.{generation}")
+
+
+def wal_generations(directory: str) -> List[int]:
+    """The WAL generations present in `directory`, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(match.group(1)) for match in map(_WAL_NAME.match, os.listdir(directory)) if match)
+
+
+class WriteAheadLog:
+    """Appends state changes to the current WAL generation."""
+    def __init__(self, directory: str, generation: int, fsync_interval: float = 0.05):
+        self.directory = directory
+        self.generation = generation
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = open(_wal_path(directory, generation), "ab")
+        self._retired = []
+        self._dirty = False
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name="state-wal", daemon=True)
+        self._flusher.start()
+
+    def _append(self, kind: bytes, payload: bytes):
+        with self._lock:
+            self._file.write(_RECORD_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload)
+            self._dirty = True
+
+    def log_open_round(self, round_id: str, round_state: Dict[str, Any]):
+        self._append(OPEN_ROUND, _json({"round_id": round_id, "round_state": round_state}))
+
+    def log_bet(self, player_id: str, second: int, amount: float, power_up: Optional[str]):
+        self._append(BET, _BET.pack(second, amount) + f"{player_id}\0{power_up or ''}".encode())
+
+    def log_settlement(self, round_id: str, round_state: Dict[str, Any], payouts: Dict[str, float],
+                       wins: Dict[str, int], summary: Dict[str, Any], contribution: Dict[str, Any]):
+        self._append(SETTLEMENT, _json({"round_id": round_id, "round_state": round_state, "payouts": payouts,
+                                        "wins": wins, "summary": summary, "contribution": contribution}))
+
+    def log_winnings(self, winnings: List[Tuple[str, float]]):
+        self._append(WINNINGS, _json(winnings))
+
+    def log_void(self, round_id: str):
+        self._append(VOID, _json({"round_id": round_id}))
+
+    def _sync(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            self._file.flush()
+            self._dirty = False
+            fileno = self._file.fileno()
+        os.fsync(fileno)
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.fsync_interval):
+            try:
+                self._sync()
+            except (OSError, ValueError) as e:
+                print(f"Error syncing the state WAL: {e}")
+
+    def rotate(self) -> int:
+        """Starts the next generation. The previous one is synced and closed
+        by `sync_retired`, so callers can rotate inside a critical section."""
+        with self._lock:
+            self._file.flush()
+            self._retired.append(self._file)
+            self.generation += 1
+            self._file = open(_wal_path(self.directory, self.generation), "ab")
+            self._dirty = False
+            return self.generation
+
+    def sync_retired(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for f in retired:
+            os.fsync(f.fileno())
+            f.close()
+
+    def discard_before(self, generation: int):
+        """Deletes the generations older than `generation`."""
+        for old in wal_generations(self.directory):
+            if old < generation:
+                os.remove(_wal_path(self.directory, old))
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.sync_retired()
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+def read_wal(directory: str, generation: int) -> Iterator[Tuple[bytes, Any]]:
+    """Decoded (kind, record) pairs of one generation. Stops at a torn or corrupt record."""
+    with open(_wal_path(directory, generation), "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        kind, length, crc = _RECORD_HEADER.unpack_from(data, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            print(f"State WAL generation {generation} ends in a torn record at byte {offset}; ignoring the rest.")
+            return
+        offset = start + length
+        if kind == BET:
+            second, amount = _BET.unpack_from(payload)
+            player_id, _, power_up = payload[_BET.size:].decode().partition("\0")
+            yield kind, (player_id, second, amount, power_up or None)
+        else:
+            yield kind, json.loads(payload)
+
+
+# --- Snapshots ---
+
+class Snapshot(NamedTuple):
+    generation: int
+    player_stats: PlayerStatsStore
+    leaderboard: Leaderboard
+    round_history: RoundHistory
+    analytics: RoundAnalytics
+
+
+def encode_snapshot(generation: int, state: Dict[str, Any]) -> bytes:
+    """Encodes copies of the state: "player_stats" (`PlayerStatsStore.to_bytes`),
+    "leaderboard" (`Leaderboard.scores`), "round_history" (`RoundHistory.snapshot`)
+    and "analytics" (`RoundAnalytics.to_dict`)."""
+    stats = state["player_stats"]
+    scores = state["leaderboard"]
+    winnings = array.array("d", scores.values())
+    leaderboard = b"".join((_COUNT.pack(len(scores)), winnings.tobytes(), "\0".join(scores).encode()))
+    history = _json(state["round_history"])
+    analytics = _json(state["analytics"])
+    return b"".join((
+        SNAPSHOT_MAGIC,
+        _SNAPSHOT_HEADER.pack(generation, len(stats), len(leaderboard), len(history), len(analytics)),
+        stats, leaderboard, history, analytics,
+    ))
+
+
+def _decode_leaderboard(data) -> Leaderboard:
+    (count,) = _COUNT.unpack_from(data)
+    winnings = array.array("d")
+    end = _COUNT.size + count * winnings.itemsize
+    winnings.frombytes(data[_COUNT.size:end])
+    players = bytes(data[end:]).decode().split("\0") if count else []
+    if len(players) != count:
+        raise ValueError("Truncated leaderboard snapshot")
+    return Leaderboard.from_items(zip(players, winnings))
+
+
+def _decode_snapshot(data: memoryview) -> Snapshot:
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError("Not a state snapshot")
+    generation, *lengths = _SNAPSHOT_HEADER.unpack_from(data, len(SNAPSHOT_MAGIC))
+    offset = len(SNAPSHOT_MAGIC) + _SNAPSHOT_HEADER.size
+    sections = []
+    for length in lengths:
+        sections.append(data[offset:offset + length])
+        offset += length
+    stats, leaderboard, history, analytics = sections
+    history = json.loads(bytes(history))
+    return Snapshot(
+        generation, PlayerStatsStore.from_bytes(stats), _decode_leaderboard(leaderboard),
+        RoundHistory.from_entries(history["capacity"], history["pushed"], history["entries"]),
+        RoundAnalytics.from_dict(json.loads(bytes(analytics))),
+    )
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Reads a snapshot through a memory map, so sections are parsed straight
+    from the page cache. The map is released with the last view of it."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _decode_snapshot(memoryview(mapped))
+
+
+def save_snapshot(directory: str, snapshot: bytes):
+    write_snapshot(os.path.join(directory, SNAPSHOT_NAME), snapshot)
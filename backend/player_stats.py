@@ -0,0 +1,117 @@
+"""
+player_stats.py
+
+Compact per-player statistics: an id -> slot index over parallel numeric
+arrays, instead of one dict per player. A player costs an index entry and
+24 bytes of array storage, and a first bet allocates no per-player objects
+beyond the index entry.
+
+The store can be saved to and restored from a snapshot file:
+
+  8-byte magic, player count (uint64), then the wins (int64), total_bet
+  and total_won (float64) arrays, then the player ids joined by NUL bytes.
+"""
+import array
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional
+
+MAGIC = b"TVSTATS1"
+_COUNT = struct.Struct("<Q")
+
+
+class PlayerStatsStore:
+    """Wins, total bet and total won per player, in slot order of first appearance."""
+    def __init__(self):
+        self._slots: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._wins = array.array("q")
+        self._total_bet = array.array("d")
+        self._total_won = array.array("d")
+
+    def _slot(self, player_id: str) -> int:
+        slot = self._slots.get(player_id)
+        if slot is None:
+            slot = len(self._ids)
+            self._wins.append(0)
+            self._total_bet.append(0.0)
+            self._total_won.append(0.0)
+            self._ids.append(player_id)
+            self._slots[player_id] = slot
+        return slot
+
+    def add_bet(self, player_id: str, amount: float):
+        self._total_bet[self._slot(player_id)] += amount
+
+    def add_win(self, player_id: str, payout: float, wins: int = 1):
+        slot = self._slot(player_id)
+        self._wins[slot] += wins
+        self._total_won[slot] += payout
+
+    def get(self, player_id: str) -> Optional[Dict[str, Any]]:
+        """The player's stats as a new dict, or None if they never played."""
+        slot = self._slots.get(player_id)
+        if slot is None:
+            return None
+        return {'wins': self._wins[slot], 'total_bet': self._total_bet[slot], 'total_won': self._total_won[slot]}
+
+    def __getitem__(self, player_id: str) -> Dict[str, Any]:
+        stats = self.get(player_id)
+        if stats is None:
+            raise KeyError(player_id)
+        return stats
+
+    def __contains__(self, player_id: str) -> bool:
+        return player_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    # --- Snapshots ---
+
+    def to_bytes(self) -> bytes:
+        """A consistent snapshot of the whole store."""
+        return b"".join((
+            MAGIC, _COUNT.pack(len(self._ids)), self._wins.tobytes(), self._total_bet.tobytes(),
+            self._total_won.tobytes(), "\0".join(self._ids).encode(),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data) -> "PlayerStatsStore":
+        """Loads a snapshot from bytes or any buffer, e.g. a memory map."""
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a player stats snapshot")
+        (count,) = _COUNT.unpack_from(data, len(MAGIC))
+        store = cls()
+        offset = len(MAGIC) + _COUNT.size
+        for column in (store._wins, store._total_bet, store._total_won):
+            end = offset + count * column.itemsize
+            column.frombytes(data[offset:end])
+            offset = end
+        store._ids = bytes(data[offset:]).decode().split("\0") if count else []
+        if len(store._ids) != count:
+            raise ValueError("Truncated player stats snapshot")
+        store._slots = {player_id: slot for slot, player_id in enumerate(store._ids)}
+        return store
+
+    def save(self, path: str):
+        """Writes a snapshot atomically: a crash leaves the previous one intact."""
+        write_snapshot(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> "PlayerStatsStore":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+
+def write_snapshot(path: str, data: bytes):
+    """Atomically replaces `path` with `data` (write, fsync, rename)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
@@ -0,0 +1,238 @@
+"""
+provably_fair.py
+
+Provably fair outcome derivation, server seed chains and audit verification.
+
+Outcomes: each round's result is derived from
+
+    final_hash = HMAC-SHA256(key=server_seed, msg=f"{client_seed}:{nonce}")
+
+whose first three 52-bit slices give uniform floats u0, u1, u2 in [0, 1):
+u0 decides a Quick Burst (u0 < quick_burst_chance), u1 picks the unlock
+second (1-8 for a Quick Burst, otherwise min_seconds-max_seconds) and u2 the
+Quick Burst multiplier (50-150x).
+
+Server seeds: seeds come from pre-generated SHA-256 chains. A chain is built
+backwards from a random terminal seed, so seed n hashes to seed n-1 and the
+first seed hashes to the chain's public `chain_anchor`. The server seed hash
+published while a round is open is therefore the previous round's seed, and
+revealing a seed proves it was fixed when the chain was generated.
+
+Verification re-derives every audited round and checks the HMAC, the
+commitment, the outcome and the chain linkage:
+
+    python -m backend.provably_fair verify provably_fair_audit.log [--format columnar]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from backend.audit import segment_paths
+from backend.audit_store import ColumnarAuditReader
+
+QUICK_BURST_SECONDS = (1, 8)
+QUICK_BURST_MULTIPLIER_RANGE = (50.0, 150.0)
+_FLOAT_HEX_DIGITS = 13  # 52 bits, the precision of a double's mantissa
+_FLOAT_SCALE = float(1 << 52)
+
+
+class FairOutcome(NamedTuple):
+    """Everything a round's result depends on, derived from its seeds."""
+    final_hash: str
+    quick_burst: bool
+    unlock_second: int
+    quick_burst_multiplier: float
+
+
+def round_hash(server_seed: str, client_seed: str, nonce: int) -> str:
+    return hmac.new(server_seed.encode(), f"{client_seed}:{nonce}".encode(), hashlib.sha256).hexdigest()
+
+
+def hash_seed(seed: str) -> str:
+    return hashlib.sha256(seed.encode()).hexdigest()
+
+
+def derive_outcome(server_seed: str, client_seed: str, nonce: int, quick_burst_chance: float,
+                   min_seconds: int, max_seconds: int) -> FairOutcome:
+    final_hash = round_hash(server_seed, client_seed, nonce)
+    u0, u1, u2 = (
+        int(final_hash[i * _FLOAT_HEX_DIGITS:(i + 1) * _FLOAT_HEX_DIGITS], 16) / _FLOAT_SCALE for i in range(3)
+    )
+    quick_burst = u0 < quick_burst_chance
+    low, high = QUICK_BURST_SECONDS if quick_burst else (min_seconds, max_seconds)
+    low_multiplier, high_multiplier = QUICK_BURST_MULTIPLIER_RANGE
+    return FairOutcome(
+        final_hash=final_hash,
+        quick_burst=quick_burst,
+        unlock_second=low + int(u1 * (high - low + 1)),
+        quick_burst_multiplier=low_multiplier + u2 * (high_multiplier - low_multiplier),
+    )
+
+
+# --- Server seed chains ---
+
+def generate_chain(length: int) -> Tuple[str, List[str]]:
+    """A new chain: (anchor, seeds in the order they are used)."""
+    seeds = [secrets.token_hex(32)]
+    for _ in range(length - 1):
+        seeds.append(hash_seed(seeds[-1]))
+    seeds.reverse()
+    return hash_seed(seeds[0]), seeds
+
+
+class ServerSeed(NamedTuple):
+    seed: str
+    chain_anchor: str
+    nonce: int  # 1-based position in the chain
+
+
+class SeedPool:
+    """
+    Hands out server seeds from pre-generated chains. The next chain is built
+    on a background thread once the current one is `refill_at` used up, so
+    taking a seed never waits for hashing.
+    """
+    def __init__(self, chain_length: int = 10_000, refill_at: float = 0.5):
+        self.chain_length = chain_length
+        self._refill_below = max(1, int(chain_length * (1 - refill_at)))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="seed-chain")
+        self._lock = threading.Lock()
+        self._anchor = ""
+        self._seeds: deque = deque()
+        self._used = 0
+        self._next: Optional[Future] = None
+
+    def next_seed(self) -> ServerSeed:
+        with self._lock:
+            if not self._seeds:
+                future = self._next or self._executor.submit(generate_chain, self.chain_length)
+                self._next = None
+                self._anchor, seeds = future.result()
+                self._seeds = deque(seeds)
+                self._used = 0
+            if self._next is None and len(self._seeds) <= self._refill_below:
+                self._next = self._executor.submit(generate_chain, self.chain_length)
+            self._used += 1
+            return ServerSeed(self._seeds.popleft(), self._anchor, self._used)
+
+
+# --- Verification ---
+
+def verify_record(record: Dict[str, Any]) -> List[str]:
+    """Problems with one audited round (empty if it verifies). Checks the HMAC,
+    the server seed commitment and the derived unlock second and event."""
+    result = record.get("result") or {}
+    fair = result.get("provably_fair_data") or {}
+    try:
+        server_seed, client_seed, nonce = fair["server_seed"], fair["client_seed"], fair["nonce"]
+    except KeyError:
+        return ["missing provably fair data"]
+    config = record.get("config") or {}
+    outcome = derive_outcome(
+        server_seed, client_seed, nonce, config.get("quick_burst_chance", 0.05),
+        config.get("min_seconds", 10), config.get("max_seconds", 180),
+    )
+    problems = []
+    if not hmac.compare_digest(outcome.final_hash, fair.get("final_hash", "")):
+        problems.append("final_hash does not match HMAC(server_seed, client_seed:nonce)")
+    if fair.get("server_seed_hash") != hash_seed(server_seed):
+        problems.append("server_seed does not match the committed server_seed_hash")
+    if result.get("unlock_second") != outcome.unlock_second:
+        problems.append(f"unlock_second {result.get('unlock_second')} != derived {outcome.unlock_second}")
+    if (result.get("special_event_triggered") == "Quick Burst") != outcome.quick_burst:
+        problems.append("Quick Burst trigger does not match the derived outcome")
+    return problems
+
+
+class VerificationReport(NamedTuple):
+    rounds: int
+    failures: List[Tuple[str, List[str]]]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+
+def verify_rounds(records: Iterable[Dict[str, Any]]) -> VerificationReport:
+    """Verifies rounds in the order they were played, including that each
+    server seed hashes to the previous seed of its chain (or the anchor)."""
+    started = time.perf_counter()
+    last_in_chain: Dict[str, Tuple[int, str]] = {}
+    failures = []
+    count = 0
+    for record in records:
+        if record.get("voided"):
+            # Interrupted by a restart before settlement: no outcome to verify
+            continue
+        count += 1
+        problems = verify_record(record)
+        fair = (record.get("result") or {}).get("provably_fair_data") or {}
+        anchor, nonce, seed = fair.get("chain_anchor"), fair.get("nonce"), fair.get("server_seed")
+        if anchor and seed and isinstance(nonce, int):
+            if nonce == 1 and hash_seed(seed) != anchor:
+                problems.append("first server seed does not hash to the chain anchor")
+            previous = last_in_chain.get(anchor)
+            if previous is not None and previous[0] == nonce - 1 and hash_seed(seed) != previous[1]:
+                problems.append("server seed does not hash to the previous seed in its chain")
+            last_in_chain[anchor] = (nonce, seed)
+        if problems:
+            failures.append((record.get("round_id", "?"), problems))
+    return VerificationReport(count, failures, time.perf_counter() - started)
+
+
+def iter_audit_log(path: str, format: str = "jsonl") -> Iterator[Dict[str, Any]]:
+    """Every round in an audit log and its rotated segments, oldest first.
+    Columnar stores skip decompressing the bet columns."""
+    for segment in reversed(segment_paths(path)):
+        if not os.path.exists(segment):
+            continue
+        if format == "columnar":
+            reader = ColumnarAuditReader(segment)
+            try:
+                yield from reader.iter_metadata()
+            finally:
+                reader.close()
+        else:
+            with open(segment, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify the provably fair audit log")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    verify = subcommands.add_parser("verify", help="re-derive and check every audited round")
+    verify.add_argument("path", help="active audit log segment (rotated segments are included)")
+    verify.add_argument("--format", choices=("jsonl", "columnar"), default="jsonl")
+    args = parser.parse_args(argv)
+
+    # A mistyped path must not pass as an empty, and so clean, log
+    directory = os.path.dirname(os.path.abspath(args.path))
+    if not os.path.isdir(directory) or not any(os.path.exists(segment) for segment in segment_paths(args.path)):
+        print(f"No audit log found at {args.path}")
+        return 2
+    report = verify_rounds(iter_audit_log(args.path, args.format))
+    if report.rounds == 0:
+        print(f"No settled rounds to verify in {args.path}")
+        return 2
+    for round_id, problems in report.failures:
+        print(f"FAIL {round_id}: {'; '.join(problems)}")
+    rate = report.rounds / report.seconds if report.seconds else 0.0
+    print(f"Verified {report.rounds} rounds in {report.seconds:.2f}s ({rate:,.0f} rounds/s), "
+          f"{len(report.failures)} failed.")
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
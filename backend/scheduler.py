@@ -0,0 +1,53 @@
+"""
+scheduler.py
+
+Monotonic-clock timing for the round scheduler. Round deadlines are absolute
+points on `time.monotonic()` (the event loop's clock), so a busy loop or a
+wall-clock adjustment cannot stretch a betting window: a late wake-up only
+shows up as lateness in /metrics, while bets are refused from the deadline on.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+from backend.metrics import Histogram
+
+
+def now() -> float:
+    """The scheduler clock. On Linux it is shared by all processes on the host."""
+    return time.monotonic()
+
+
+async def sleep_until(deadline: float, lateness_histogram: Histogram) -> float:
+    """Sleeps until `deadline` on the scheduler clock and returns how late the
+    wake-up was, which is also recorded in `lateness_histogram`."""
+    loop = asyncio.get_running_loop()
+    # Timers may fire up to the clock resolution early; never return before the deadline
+    while (remaining := deadline - loop.time()) > 0:
+        await asyncio.sleep(remaining)
+    lateness = loop.time() - deadline
+    lateness_histogram.observe(lateness)
+    return lateness
+
+
+class Timers:
+    """Coroutines scheduled to run once at a deadline, cancellable as a group
+    (e.g. a round's timed events once the round closes)."""
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+
+    def at(self, deadline: float, lateness_histogram: Histogram, callback: Callable[[], Awaitable[None]]):
+        async def fire():
+            await sleep_until(deadline, lateness_histogram)
+            await callback()
+        task = asyncio.create_task(fire())
+        self._tasks.append(task)
+        return task
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def __len__(self) -> int:
+        return sum(not task.done() for task in self._tasks)
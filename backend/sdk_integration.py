@@ -5,12 +5,20 @@ This module provides a mock integration for the StakeEngine Math SDK.
 This version is refined for clarity and handles dynamic payout calculations
 based on various game events and power-ups.
 """
-import random
+import secrets
+import time
 import uuid
-from typing import List, Dict, Any, NamedTuple
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple
+
+from backend.provably_fair import FairOutcome, derive_outcome, hash_seed
 
 # --- Mock SDK Data Structures ---
 
+# The power-ups a bet may use
+POWER_UPS = ("multiplier_boost",)
+# Bets may target seconds 1..MAX_BET_SECOND, far beyond any round's max_seconds
+MAX_BET_SECOND = 3600
+
 class Bet(NamedTuple):
     """Represents a single player bet, now with an optional power-up field."""
     player_id: str
@@ -18,96 +26,216 @@ class Bet(NamedTuple):
     amount: float
     power_up: str | None = None
 
+class BetBook:
+    """
+    An indexed collection of bets for a single round.
+
+    Bets are bucketed by the second they target and running totals (pot,
+    per-second stake, boosted vs. plain stake) are maintained as bets arrive,
+    so settlement only has to read the winning bucket. The book still behaves
+    like the plain list of bets it replaces (iteration, len, indexing).
+    """
+    def __init__(self, bets: Iterable[Bet] = ()):
+        self._bets: List[Bet] = []
+        self._by_second: Dict[int, List[Bet]] = {}
+        self._stake_by_second: Dict[int, float] = {}
+        self._boosted_stake_by_second: Dict[int, float] = {}
+        # power_up -> [stake, bet count]; bets without a power-up are under None
+        self._by_power_up: Dict[str | None, List[float]] = {}
+        self.total_pot = 0.0
+        self.extend(bets)
+
+    def append(self, bet: Bet):
+        """Adds a single bet and updates the running totals."""
+        self._bets.append(bet)
+        second = bet.second
+        bucket = self._by_second.get(second)
+        if bucket is None:
+            bucket = self._by_second[second] = []
+            self._stake_by_second[second] = 0.0
+            self._boosted_stake_by_second[second] = 0.0
+        bucket.append(bet)
+        self._stake_by_second[second] += bet.amount
+        if bet.power_up == 'multiplier_boost':
+            self._boosted_stake_by_second[second] += bet.amount
+        power_up = self._by_power_up.get(bet.power_up)
+        if power_up is None:
+            power_up = self._by_power_up[bet.power_up] = [0.0, 0]
+        power_up[0] += bet.amount
+        power_up[1] += 1
+        self.total_pot += bet.amount
+
+    def extend(self, bets: Iterable[Bet]):
+        for bet in bets:
+            self.append(bet)
+
+    def bets_at(self, second: int) -> List[Bet]:
+        """Returns the bets placed on a given second, in arrival order."""
+        return self._by_second.get(second, [])
+
+    def stake_at(self, second: int) -> float:
+        """Total amount staked on a given second."""
+        return self._stake_by_second.get(second, 0.0)
+
+    def boosted_stake_at(self, second: int) -> float:
+        """Amount staked on a given second with the 'multiplier_boost' power-up."""
+        return self._boosted_stake_by_second.get(second, 0.0)
+
+    def plain_stake_at(self, second: int) -> float:
+        """Amount staked on a given second without a multiplier power-up."""
+        return self.stake_at(second) - self.boosted_stake_at(second)
+
+    def stake_by_second(self) -> Dict[int, float]:
+        """A copy of the per-second stake totals."""
+        return dict(self._stake_by_second)
+
+    def bets_by_second(self) -> Dict[int, int]:
+        """The number of bets on each second."""
+        return {second: len(bucket) for second, bucket in self._by_second.items()}
+
+    def stake_by_power_up(self) -> Dict[str | None, tuple]:
+        """(stake, bet count) per power-up, with None for bets without one."""
+        return {power_up: tuple(totals) for power_up, totals in self._by_power_up.items()}
+
+    def __len__(self):
+        return len(self._bets)
+
+    def __iter__(self) -> Iterator[Bet]:
+        return iter(self._bets)
+
+    def __getitem__(self, index):
+        return self._bets[index]
+
+    def __bool__(self):
+        return bool(self._bets)
+
 class GameRoundResult(NamedTuple):
     """Represents the detailed outcome of a simulated round."""
     unlock_second: int
     winners: List[Dict[str, Any]]
     payouts: Dict[str, float]
-    provably_fair_data: Dict[str, str]
+    provably_fair_data: Dict[str, Any]
     special_event_triggered: str | None
 
 class GameRound:
-    """Configures and manages a round's parameters, including event effects."""
-    def __init__(self, config: Dict[str, Any]):
+    """Configures and manages a round's parameters, including event effects.
+
+    The outcome is derived from the server seed, client seed and nonce (see
+    `backend.provably_fair`). Without a server seed from a seed chain, a
+    one-off random seed is used.
+    """
+    def __init__(self, config: Dict[str, Any], server_seed: str | None = None, client_seed: str | None = None,
+                 nonce: int = 0, chain_anchor: str | None = None):
         self.config = config
         self.min_seconds = config.get("min_seconds", 10)
         self.max_seconds = config.get("max_seconds", 180)
         self.house_edge = config.get("house_edge", 0.02)
-        self.bets: List[Bet] = []
-        self.server_seed = uuid.uuid4().hex
-        self.client_seed = uuid.uuid4().hex # In a real game, this comes from the player
+        self.bets = BetBook()
+        self.server_seed = server_seed or secrets.token_hex(32)
+        self.client_seed = client_seed or uuid.uuid4().hex # In a real game, this comes from the player
+        self.nonce = nonce
+        self.chain_anchor = chain_anchor
         # Event-driven effects
         self.global_multiplier_boost = config.get("multiplierBoost", 1.0)
         self.quick_burst_chance = config.get("quick_burst_chance", 0.05)
+        self._outcome: FairOutcome | None = None
+
+    @property
+    def server_seed_hash(self) -> str:
+        """The commitment to the server seed, safe to publish before settlement."""
+        return hash_seed(self.server_seed)
 
     def place_bets(self, bets: List[Bet]):
         """Adds a list of bets to the current round."""
         self.bets.extend(bets)
 
-    def _generate_unlock_second(self, is_quick_burst=False) -> int:
-        """Generates a provably fair unlock second."""
-        if is_quick_burst:
-            # Quick Burst rounds have a smaller, more volatile range.
-            return random.randint(1, 8)
-        return random.randint(self.min_seconds, self.max_seconds)
+    def fair_outcome(self) -> FairOutcome:
+        if self._outcome is None:
+            self._outcome = derive_outcome(self.server_seed, self.client_seed, self.nonce,
+                                           self.quick_burst_chance, self.min_seconds, self.max_seconds)
+        return self._outcome
+
+    def provably_fair_data(self) -> Dict[str, Any]:
+        """What a player or auditor needs to re-derive the outcome."""
+        return {
+            "server_seed": self.server_seed, "server_seed_hash": self.server_seed_hash,
+            "client_seed": self.client_seed, "nonce": self.nonce, "chain_anchor": self.chain_anchor,
+            "final_hash": self.fair_outcome().final_hash,
+        }
+
+def _winner_entries(bets: List[Bet], quick_burst_multiplier: float | None, payout_pool: float,
+                    total_winner_stake: float, global_multiplier_boost: float) -> List[Dict[str, Any]]:
+    """Payout entries for winning bets, in order. With a Quick Burst multiplier
+    each bet is paid at that multiplier; otherwise the pool is shared pro rata."""
+    entries = []
+    for bet in bets:
+        personal_multiplier = 1.5 if bet.power_up == 'multiplier_boost' else 1.0
+        if quick_burst_multiplier is not None:
+            final_multiplier = quick_burst_multiplier * global_multiplier_boost * personal_multiplier
+            payout_amount = bet.amount * final_multiplier
+        else:
+            proportion = bet.amount / total_winner_stake if total_winner_stake > 0 else 0
+            base_payout = payout_pool * proportion
+            payout_amount = base_payout * global_multiplier_boost * personal_multiplier
+            final_multiplier = payout_amount / bet.amount if bet.amount > 0 else 0
+        entries.append({
+            "player_id": bet.player_id, "amount": bet.amount, "payout": payout_amount,
+            "multiplier": final_multiplier
+        })
+    return entries
 
-def simulate_round(round_instance: GameRound) -> GameRoundResult:
+def simulate_round(round_instance: GameRound, chunk_size: int | None = None) -> GameRoundResult:
     """
     Simulates a round, calculating winners and payouts based on its configuration,
     bets, and any active special events.
+
+    With `chunk_size`, a winning bucket larger than that is paid in chunks of
+    that size and the thread releases the GIL between chunks, so settling a
+    huge round on a worker thread does not keep the event loop waiting for
+    the whole computation. Nothing runs in parallel. The result is identical
+    either way.
     """
-    total_pot = sum(bet.amount for bet in round_instance.bets)
+    book = round_instance.bets
+    total_pot = book.total_pot
     payouts = {}
     winners_data = []
     special_event = None
+    quick_burst_multiplier = None
+    payout_pool = 0.0
+    total_winner_stake = 0.0
 
     # 1. Determine if a "Quick Burst" event triggers
-    if random.random() < round_instance.quick_burst_chance:
+    # The provably fair unlock second; Quick Burst rounds draw from a smaller range
+    outcome = round_instance.fair_outcome()
+    unlock_second = outcome.unlock_second
+    if outcome.quick_burst:
         special_event = "Quick Burst"
-        unlock_second = round_instance._generate_unlock_second(is_quick_burst=True)
-        winning_bets = [bet for bet in round_instance.bets if bet.second == unlock_second]
-
+        winning_bets = book.bets_at(unlock_second)
         if winning_bets:
-            quick_burst_multiplier = random.uniform(50, 150)
-            for bet in winning_bets:
-                personal_multiplier = 1.5 if bet.power_up == 'multiplier_boost' else 1.0
-                final_multiplier = quick_burst_multiplier * round_instance.global_multiplier_boost * personal_multiplier
-                payout_amount = bet.amount * final_multiplier
-                payouts[bet.player_id] = payouts.get(bet.player_id, 0) + payout_amount
-                winners_data.append({
-                    "player_id": bet.player_id, "amount": bet.amount, "payout": payout_amount,
-                    "multiplier": final_multiplier
-                })
+            quick_burst_multiplier = outcome.quick_burst_multiplier
     else:
         # 2. Standard Round Logic
-        special_event = None
-        unlock_second = round_instance._generate_unlock_second()
-        winning_bets = [bet for bet in round_instance.bets if bet.second == unlock_second]
-        
+        winning_bets = book.bets_at(unlock_second)
         if winning_bets:
-            total_winner_stake = sum(bet.amount for bet in winning_bets)
+            total_winner_stake = book.stake_at(unlock_second)
             payout_pool = total_pot * (1 - round_instance.house_edge)
-            
-            for bet in winning_bets:
-                proportion = bet.amount / total_winner_stake if total_winner_stake > 0 else 0
-                base_payout = payout_pool * proportion
-                
-                personal_multiplier = 1.5 if bet.power_up == 'multiplier_boost' else 1.0
-                final_payout = base_payout * round_instance.global_multiplier_boost * personal_multiplier
-                
-                payouts[bet.player_id] = payouts.get(bet.player_id, 0) + final_payout
-                winners_data.append({
-                    "player_id": bet.player_id, "amount": bet.amount, "payout": final_payout,
-                    "multiplier": (final_payout / bet.amount if bet.amount > 0 else 0)
-                })
+
+    if winning_bets:
+        settle_args = (quick_burst_multiplier, payout_pool, total_winner_stake,
+                       round_instance.global_multiplier_boost)
+        if chunk_size and len(winning_bets) > chunk_size:
+            for start in range(0, len(winning_bets), chunk_size):
+                winners_data.extend(_winner_entries(winning_bets[start:start + chunk_size], *settle_args))
+                time.sleep(0)
+        else:
+            winners_data = _winner_entries(winning_bets, *settle_args)
+        for winner in winners_data:
+            payouts[winner["player_id"]] = payouts.get(winner["player_id"], 0) + winner["payout"]
 
     return GameRoundResult(
         unlock_second=unlock_second,
         winners=winners_data,
         payouts=payouts,
-        provably_fair_data={
-            "server_seed": round_instance.server_seed, "client_seed": round_instance.client_seed,
-            "final_hash": uuid.uuid4().hex # Placeholder for the combined hash
-        },
+        provably_fair_data=round_instance.provably_fair_data(),
         special_event_triggered=special_event
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,9 @@
+"""
+simulation
+
+Scenario-driven balancing simulations: crowds of bettors with pluggable
+strategies (`strategies`) play many rounds of the real SDK under chosen
+event effects, with results streamed to disk in chunks (`scenario`).
+
+    python -m backend.simulation docs/scenarios/event_sweep.yaml --output sim-results
+"""
@@ -0,0 +1,39 @@
+"""
+Runs a scenario file and writes each variant's results under --output.
+
+    python -m backend.simulation SCENARIO.yaml [--output DIR] [--rounds N] [--variant NAME ...]
+"""
+import argparse
+import sys
+
+from backend.simulation.scenario import load_scenario, run_variant
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time Vault scenario simulations")
+    parser.add_argument("scenario", help="scenario YAML file")
+    parser.add_argument("--output", default="simulation-results", help="directory for the results")
+    parser.add_argument("--rounds", type=int, help="override the scenario's round count")
+    parser.add_argument("--variant", action="append", help="run only these variants (repeatable)")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    if args.rounds:
+        scenario = scenario._replace(rounds=args.rounds)
+    variants = [variant for variant in scenario.variants if not args.variant or variant.name in args.variant]
+    if not variants:
+        print(f"No variant named {', '.join(args.variant)} in {args.scenario}")
+        return 1
+
+    for variant in variants:
+        summary = run_variant(scenario, variant, args.output)
+        analytics = summary["analytics"]
+        edge = analytics["house_edge"]
+        print(f"{variant.name:<20} rounds={analytics['rounds']:<8} staked={analytics['staked']:>14.2f} "
+              f"paid={analytics['paid']:>14.2f} edge={edge if edge is None else f'{edge:.4f}'} "
+              f"({summary['elapsed_seconds']:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+scenario.py
+
+Loads scenario files and runs them, streaming results to disk.
+
+A scenario is a YAML file naming a crowd of bettor groups (see
+`strategies`), a base round config and the events to apply, plus optional
+variants for sweeps. Each variant's events are applied with
+`events.apply_event_effects`, the same function `GameRoundManager` applies
+the live schedule with, and rounds are settled by the real SDK
+(`GameRound` / `simulate_round`).
+
+Results are written chunk by chunk to `<output>/<variant>/`:
+
+  - rounds.csv:   one row per round,
+  - chunks.jsonl: one line per `chunk_rounds` rounds with the analytics
+                  report and per-group totals for those rounds,
+  - summary.json: the same for the whole run, written at the end.
+
+Only the current chunk is held in memory, so long sweeps run in flat memory.
+"""
+import csv
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, NamedTuple
+
+import yaml
+
+from backend.analytics import RoundAnalytics, round_contribution
+from backend.events import apply_event_effects
+from backend.sdk_integration import GameRound, simulate_round
+from backend.simulation.strategies import BettorGroup, group_of
+
+# The config `game_logic.prepare_round` gives every live round
+DEFAULT_ROUND_CONFIG = {
+    "min_seconds": 10, "max_seconds": 180,
+    "quick_burst_chance": 0.05, "bonus_vault_chance": 0.03,
+    "house_edge": 0.02, "bettingWindow": {"end": 5}
+}
+DEFAULT_CHUNK_ROUNDS = 1000
+ROUND_COLUMNS = ("round", "unlock_second", "special_event", "bets", "staked", "paid", "winners")
+
+
+class Variant(NamedTuple):
+    name: str
+    config: Dict[str, Any]
+    events: List[Dict[str, Any]]
+
+
+class Scenario(NamedTuple):
+    name: str
+    rounds: int
+    seed: int
+    chunk_rounds: int
+    crowd: List[Dict[str, Any]]
+    variants: List[Variant]
+
+
+def _load_events(path: str) -> Dict[str, Dict[str, Any]]:
+    with open(path, 'r') as f:
+        return {event["name"]: event for event in (yaml.safe_load(f) or {}).get("events", []) or []}
+
+
+def _resolve_events(entries: List[Any], catalogue_path: str, catalogue: Dict[str, Dict[str, Any]]):
+    """Events by name from the event config, or inline `{name, effects}` entries.
+    Named events are applied whether or not they are enabled or scheduled."""
+    events = []
+    for entry in entries or []:
+        if isinstance(entry, dict):
+            events.append(entry)
+        elif entry in catalogue:
+            events.append(catalogue[entry])
+        else:
+            raise ValueError(f"Unknown event '{entry}' (not in {catalogue_path})")
+    return events
+
+
+def load_scenario(path: str) -> Scenario:
+    """Parses and validates a scenario file. Paths inside it are relative to the working directory."""
+    with open(path, 'r') as f:
+        spec = yaml.safe_load(f) or {}
+    if not spec.get("crowd"):
+        raise ValueError(f"{path}: a scenario needs at least one bettor group under 'crowd'")
+    for group in spec["crowd"]:
+        BettorGroup.from_spec(group)  # Fail on bad models before any round runs
+
+    catalogue_path = spec.get("event_config", "docs/EVENT_config.yaml")
+    catalogue = _load_events(catalogue_path) if os.path.exists(catalogue_path) else {}
+    base_config = dict(DEFAULT_ROUND_CONFIG, **spec.get("config", {}))
+    base_events = spec.get("events", [])
+    variants = []
+    for entry in spec.get("variants") or [{"name": "baseline"}]:
+        config = dict(base_config, **entry.get("config", {}))
+        events = _resolve_events(entry.get("events", base_events), catalogue_path, catalogue)
+        variants.append(Variant(entry["name"], config, events))
+    if len({variant.name for variant in variants}) != len(variants):
+        raise ValueError(f"{path}: variant names must be unique")
+
+    return Scenario(
+        name=spec.get("name", os.path.splitext(os.path.basename(path))[0]),
+        rounds=int(spec.get("rounds", 10000)),
+        seed=int(spec.get("seed", 0)),
+        chunk_rounds=int(spec.get("chunk_rounds", DEFAULT_CHUNK_ROUNDS)),
+        crowd=spec["crowd"],
+        variants=variants,
+    )
+
+
+class _GroupTotals:
+    """Stake and payouts per bettor group."""
+    def __init__(self, names: List[str]):
+        self.totals = {name: [0.0, 0, 0.0] for name in names}  # name -> [staked, bets, paid]
+
+    def add(self, other: "_GroupTotals"):
+        for name, (staked, bets, paid) in other.totals.items():
+            totals = self.totals[name]
+            totals[0] += staked
+            totals[1] += bets
+            totals[2] += paid
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            name: {"staked": staked, "bets": bets, "paid": paid,
+                   "return_to_player": paid / staked if staked else None}
+            for name, (staked, bets, paid) in self.totals.items()
+        }
+
+
+def run_variant(scenario: Scenario, variant: Variant, output_dir: str) -> Dict[str, Any]:
+    """Runs one variant's rounds and writes its files. Returns the summary.
+
+    Every variant of a scenario is seeded alike, so variants whose events do
+    not change the bettors' choices or the outcome see the same bets and
+    unlock seconds and differ only in payouts."""
+    directory = os.path.join(output_dir, variant.name)
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(scenario.seed)
+    client_seed = f"{scenario.name}-{scenario.seed}"
+    groups = [BettorGroup.from_spec(spec) for spec in scenario.crowd]
+    group_names = [group.name for group in groups]
+    # Shared by every round: effects never change between rounds of a variant
+    config = apply_event_effects(dict(variant.config), variant.events)
+
+    overall = RoundAnalytics(window=1)
+    overall_groups = _GroupTotals(group_names)
+    chunk, chunk_groups, rows = RoundAnalytics(window=1), _GroupTotals(group_names), []
+    started = time.perf_counter()
+
+    with open(os.path.join(directory, "rounds.csv"), 'w', newline='') as rounds_file, \
+            open(os.path.join(directory, "chunks.jsonl"), 'w') as chunks_file:
+        writer = csv.writer(rounds_file)
+        writer.writerow(ROUND_COLUMNS)
+        chunk_start = 1
+        for number in range(1, scenario.rounds + 1):
+            round_instance = GameRound(config, server_seed=f"{rng.getrandbits(256):064x}",
+                                       client_seed=client_seed, nonce=number)
+            book = round_instance.bets
+            for group in groups:
+                pot, count = book.total_pot, len(book)
+                book.extend(group.bets(rng, config))
+                totals = chunk_groups.totals[group.name]
+                totals[0] += book.total_pot - pot
+                totals[1] += len(book) - count
+            result = simulate_round(round_instance)
+            for winner in result.winners:
+                chunk_groups.totals[group_of(winner["player_id"])][2] += winner["payout"]
+
+            contribution = round_contribution(book, result)
+            chunk.add(contribution)
+            overall.add(contribution)
+            rows.append((number, result.unlock_second, result.special_event_triggered or "",
+                         contribution["bets"], round(contribution["staked"], 2),
+                         round(contribution["paid"], 2), len(result.winners)))
+
+            if number - chunk_start + 1 == scenario.chunk_rounds or number == scenario.rounds:
+                writer.writerows(rows)
+                rounds_file.flush()
+                chunks_file.write(json.dumps({
+                    "first_round": chunk_start, "last_round": number,
+                    "analytics": chunk.report("all"), "groups": chunk_groups.report(),
+                }) + "\n")
+                chunks_file.flush()
+                overall_groups.add(chunk_groups)
+                chunk, chunk_groups, rows = RoundAnalytics(window=1), _GroupTotals(group_names), []
+                chunk_start = number + 1
+
+    summary = {
+        "scenario": scenario.name, "variant": variant.name, "rounds": scenario.rounds, "seed": scenario.seed,
+        "events": [event.get("name", "inline") for event in variant.events], "config": config,
+        "elapsed_seconds": time.perf_counter() - started,
+        "analytics": overall.report("all"), "groups": overall_groups.report(),
+    }
+    with open(os.path.join(directory, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def run_scenario(scenario: Scenario, output_dir: str) -> List[Dict[str, Any]]:
+    """Runs every variant in turn. Returns their summaries."""
+    return [run_variant(scenario, variant, output_dir) for variant in scenario.variants]
@@ -0,0 +1,174 @@
+"""
+strategies.py
+
+Bettor models for simulated crowds. A crowd is a list of `BettorGroup`s;
+each group is a number of players sharing a strategy made of three
+pluggable parts:
+
+  - a seconds model: which second a bet targets
+    ("uniform", "clustered" around favourite seconds),
+  - a stakes model: how much is staked
+    ("choice" from fixed amounts, "lognormal" for heavy-tailed whales,
+    "tiered" for a mix of whales and minnows),
+  - `power_up_chance`: how often a bet uses the 'multiplier_boost' power-up.
+
+New models are added with `register_seconds_model` / `register_stakes_model`
+and referenced by name from scenario files.
+"""
+import random
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, Sequence
+
+from backend.sdk_integration import Bet
+
+SECONDS_MODELS: Dict[str, Callable[..., "SecondsModel"]] = {}
+STAKES_MODELS: Dict[str, Callable[..., "StakesModel"]] = {}
+
+
+def register_seconds_model(name: str):
+    def register(cls):
+        SECONDS_MODELS[name] = cls
+        return cls
+    return register
+
+
+def register_stakes_model(name: str):
+    def register(cls):
+        STAKES_MODELS[name] = cls
+        return cls
+    return register
+
+
+class SecondsModel(ABC):
+    @abstractmethod
+    def draw(self, rng: random.Random, config: Dict[str, Any]) -> int:
+        """The second a bet targets, within the round `config`'s range."""
+
+
+class StakesModel(ABC):
+    @abstractmethod
+    def draw(self, rng: random.Random) -> float:
+        """The amount a bet stakes."""
+
+
+@register_seconds_model("uniform")
+class UniformSeconds(SecondsModel):
+    """Any second in [low, high]; defaults to the round's min_seconds-max_seconds."""
+    def __init__(self, low: int | None = None, high: int | None = None):
+        self.low = low
+        self.high = high
+
+    def draw(self, rng, config):
+        low = self.low if self.low is not None else config.get("min_seconds", 10)
+        high = self.high if self.high is not None else config.get("max_seconds", 180)
+        return rng.randint(low, high)
+
+
+@register_seconds_model("clustered")
+class ClusteredSeconds(SecondsModel):
+    """Seconds near favourite `centers` (normal with `spread`), picked by
+    `weights`, clamped to the round's range."""
+    def __init__(self, centers: Sequence[int] = (30, 60, 90, 120), spread: float = 3.0,
+                 weights: Sequence[float] | None = None):
+        self.centers = list(centers)
+        self.spread = spread
+        self.weights = list(weights) if weights is not None else None
+
+    def draw(self, rng, config):
+        center = rng.choices(self.centers, self.weights)[0]
+        second = round(rng.gauss(center, self.spread))
+        return max(config.get("min_seconds", 10), min(config.get("max_seconds", 180), second))
+
+
+@register_stakes_model("choice")
+class ChoiceStakes(StakesModel):
+    """One of `amounts`, uniformly (the classic simulation's bettors)."""
+    def __init__(self, amounts: Sequence[float] = (1, 5, 10, 25, 50, 100)):
+        self.amounts = [float(amount) for amount in amounts]
+
+    def draw(self, rng):
+        return rng.choice(self.amounts)
+
+
+@register_stakes_model("lognormal")
+class LognormalStakes(StakesModel):
+    """Heavy-tailed stakes around `median`, rounded to cents, at least `minimum`."""
+    def __init__(self, median: float = 10.0, sigma: float = 1.0, minimum: float = 0.01):
+        self.median = median
+        self.sigma = sigma
+        self.minimum = minimum
+
+    def draw(self, rng):
+        return max(self.minimum, round(self.median * rng.lognormvariate(0.0, self.sigma), 2))
+
+
+@register_stakes_model("tiered")
+class TieredStakes(StakesModel):
+    """Whales and minnows: with probability `whale_share` a stake comes from
+    `whale` (a stakes model spec), otherwise from `minnow`."""
+    def __init__(self, whale_share: float = 0.02, whale: Dict[str, Any] | None = None,
+                 minnow: Dict[str, Any] | None = None):
+        self.whale_share = whale_share
+        self.whale = build_stakes_model(whale or {"model": "lognormal", "median": 1000.0, "sigma": 0.7})
+        self.minnow = build_stakes_model(minnow or {"model": "choice", "amounts": [1, 2, 5, 10]})
+
+    def draw(self, rng):
+        return (self.whale if rng.random() < self.whale_share else self.minnow).draw(rng)
+
+
+def _build(registry: Dict[str, Callable[..., Any]], spec: Dict[str, Any] | None, default: str):
+    spec = dict(spec or {})
+    name = spec.pop("model", default)
+    if name not in registry:
+        raise ValueError(f"Unknown model '{name}', expected one of {', '.join(sorted(registry))}")
+    return registry[name](**spec)
+
+
+def build_seconds_model(spec: Dict[str, Any] | None) -> SecondsModel:
+    return _build(SECONDS_MODELS, spec, "uniform")
+
+
+def build_stakes_model(spec: Dict[str, Any] | None) -> StakesModel:
+    return _build(STAKES_MODELS, spec, "choice")
+
+
+class BettorGroup:
+    """
+    `players` players named `<name>_<n>`. Each round every player joins with
+    probability `participation` and then places between `bets_per_player`
+    bets (inclusive range).
+    """
+    def __init__(self, name: str, players: int, participation: float = 1.0,
+                 bets_per_player: Sequence[int] = (1, 1), seconds: SecondsModel | None = None,
+                 stakes: StakesModel | None = None, power_up_chance: float = 0.0):
+        self.name = name
+        self.player_ids = [f"{name}_{n}" for n in range(players)]
+        self.participation = participation
+        self.bets_per_player = tuple(bets_per_player)
+        self.seconds = seconds or UniformSeconds()
+        self.stakes = stakes or ChoiceStakes()
+        self.power_up_chance = power_up_chance
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "BettorGroup":
+        """Builds a group from its scenario file entry."""
+        return cls(
+            name=spec["name"], players=spec["players"], participation=spec.get("participation", 1.0),
+            bets_per_player=spec.get("bets_per_player", (1, 1)),
+            seconds=build_seconds_model(spec.get("seconds")), stakes=build_stakes_model(spec.get("stakes")),
+            power_up_chance=spec.get("power_up_chance", 0.0),
+        )
+
+    def bets(self, rng: random.Random, config: Dict[str, Any]) -> Iterator[Bet]:
+        low, high = self.bets_per_player
+        for player_id in self.player_ids:
+            if rng.random() >= self.participation:
+                continue
+            for _ in range(rng.randint(low, high)):
+                power_up = "multiplier_boost" if self.power_up_chance and rng.random() < self.power_up_chance else None
+                yield Bet(player_id, self.seconds.draw(rng, config), self.stakes.draw(rng), power_up)
+
+
+def group_of(player_id: str) -> str:
+    """The name of the group a simulated player belongs to."""
+    return player_id.rpartition("_")[0]
@@ -0,0 +1,535 @@
+"""
+state_backend.py
+
+Pluggable storage for the state shared by every backend worker: the open
+round's bet book, player stats, the leaderboard, round history, broadcast
+fan-out and round-scheduler leadership.
+
+`StateCore` holds the state and defines the semantics. It is used either
+in-process (`InMemoryStateBackend`, the default, for a single worker) or
+hosted by a local state server that several worker processes connect to
+over a socket (`SharedStateBackend`, a stand-in for Redis or similar):
+
+    STATE_BACKEND_AUTHKEY=... python -m backend.state_backend serve --address 127.0.0.1:50055
+    STATE_BACKEND=shared STATE_BACKEND_ADDRESS=127.0.0.1:50055 STATE_BACKEND_AUTHKEY=... \\
+        uvicorn backend.app:app --workers 4
+
+Exactly one worker holds the leadership lease and runs the game loop; any
+worker accepts bets for the open round, and broadcasts published by one
+worker are relayed by every worker to its own clients.
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from multiprocessing.managers import BaseManager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from backend.analytics import RoundAnalytics
+from backend.history import RoundHistory
+from backend.leaderboard import Leaderboard
+from backend.persistence import (
+    BET, OPEN_ROUND, SETTLEMENT, SNAPSHOT_NAME, VOID, WINNINGS, WriteAheadLog, encode_snapshot, load_snapshot,
+    read_wal, save_snapshot, wal_generations,
+)
+from backend.player_stats import PlayerStatsStore
+from backend.sdk_integration import Bet, BetBook
+
+EVENT_BUFFER_SIZE = 4096
+
+
+def new_store() -> Dict[str, Any]:
+    """An empty store with every entry `StateCore` needs."""
+    return {"leaderboard": Leaderboard(), "player_stats": PlayerStatsStore(),
+            "round_history": RoundHistory(), "analytics": RoundAnalytics()}
+
+
+class StateCore:
+    """
+    Shared game state with synchronous, thread-safe methods.
+
+    `store` must provide "leaderboard", "player_stats" (a `PlayerStatsStore`),
+    "round_history" (a `RoundHistory`) and "analytics" (a `RoundAnalytics`);
+    entries are looked up on every call, so the in-process core follows
+    `GAME_STATE` even when its entries are replaced.
+    """
+    def __init__(self, store: Dict[str, Any]):
+        self.store = store
+        self._lock = threading.Lock()
+        self._round_id: Optional[str] = None
+        self._round_state: Optional[Dict[str, Any]] = None
+        self._book: Optional[BetBook] = None
+        # A closed round's book, until its settlement is applied
+        self._settling: Optional[BetBook] = None
+        self._bet_deadline: Optional[float] = None
+        self._events: deque = deque(maxlen=EVENT_BUFFER_SIZE)
+        self._event_seq = 0
+        self._leader: Optional[str] = None
+        self._lease_until = 0.0
+        self._wal: Optional[WriteAheadLog] = None
+        self._round_generation = 0
+        self._checkpoint_lock = threading.Lock()
+
+    # --- Rounds ---
+
+    def open_round(self, round_id: str, round_state: Dict[str, Any], book: Optional[BetBook] = None,
+                   bet_deadline: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Opens a round for betting. In-process callers pass their own book.
+        Bets are refused from `bet_deadline` (on `time.monotonic()`) on, even
+        if the scheduler has not closed the round yet.
+
+        A previous round that was never settled (its scheduler died or lost
+        the lease) is voided first and returned like `recover` returns an
+        interrupted round, so the caller can record it in the audit log."""
+        with self._lock:
+            unsettled = self._book if self._book is not None else self._settling
+            voided = self._void_round(unsettled) if unsettled is not None and round_id != self._round_id else None
+            self._round_id = round_id
+            self._round_state = dict(round_state)
+            self._book = book if book is not None else BetBook()
+            self._bet_deadline = bet_deadline
+            if self._wal is not None:
+                self._wal.log_open_round(round_id, round_state)
+                self._round_generation = self._wal.generation
+            return voided
+
+    def _void_round(self, book: BetBook) -> Dict[str, Any]:
+        """Voids the current, unsettled round: its stake is taken back out of
+        the players' total bet and the void is logged for replay."""
+        player_stats = self.store["player_stats"]
+        for bet in book:
+            player_stats.add_bet(bet.player_id, -bet.amount)
+        if self._wal is not None:
+            self._wal.log_void(self._round_id)
+        voided = {"round_id": self._round_id, "round_state": self._round_state, "bets": [tuple(bet) for bet in book]}
+        self._book = self._settling = None
+        return voided
+
+    def add_bet(self, player_id: str, second: int, amount: float, power_up: str | None) -> Optional[str]:
+        """Adds a bet to the open round. Returns its round_id, or None if betting is closed."""
+        with self._lock:
+            if self._book is None or (self._bet_deadline is not None and time.monotonic() >= self._bet_deadline):
+                return None
+            # Logged first: a bet the WAL cannot encode must not be half applied
+            if self._wal is not None:
+                self._wal.log_bet(player_id, second, amount, power_up)
+            self._book.append(Bet(player_id=player_id, second=second, amount=amount, power_up=power_up))
+            self.store["player_stats"].add_bet(player_id, amount)
+            return self._round_id
+
+    def sample_bet(self, round_id: str) -> Optional[Bet]:
+        """A uniformly random bet from the open round, if any."""
+        with self._lock:
+            if round_id != self._round_id or not self._book:
+                return None
+            return random.choice(self._book)
+
+    def close_round(self, round_id: str) -> BetBook:
+        """Closes betting and hands the round's bets to the settling worker."""
+        with self._lock:
+            if round_id != self._round_id or self._book is None:
+                return BetBook()
+            book, self._book = self._book, None
+            self._settling = book
+            return book
+
+    def get_round_state(self) -> Optional[Dict[str, Any]]:
+        """The last published round state, with live bet totals while betting is open."""
+        with self._lock:
+            if self._round_state is None:
+                return None
+            state = dict(self._round_state)
+            if self._book is not None:
+                state["bets_placed"] = len(self._book)
+                state["stake_by_second"] = self._book.stake_by_second()
+            return state
+
+    # --- Player stats, leaderboard and history ---
+
+    def get_player_stats(self, player_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.store["player_stats"].get(player_id)
+
+    def add_winnings(self, winnings: List[Tuple[str, float]]):
+        with self._lock:
+            self._add_winnings(winnings)
+            if self._wal is not None:
+                self._wal.log_winnings(winnings)
+
+    def _add_winnings(self, winnings: List[Tuple[str, float]]):
+        leaderboard = self.store["leaderboard"]
+        for player_id, amount in winnings:
+            leaderboard.add(player_id, amount)
+
+    def apply_settlement(self, round_id: str, round_state: Dict[str, Any], payouts: Dict[str, float],
+                         wins: Dict[str, int], summary: Dict[str, Any], contribution: Dict[str, Any]):
+        """Applies a settled round in one critical section: leaderboard winnings,
+        win counts and amounts won per player, the history summary, the round's
+        analytics contribution and the final round state. Everything is
+        pre-aggregated by the caller."""
+        with self._lock:
+            self._apply_settlement(round_id, round_state, payouts, wins, summary, contribution)
+            if self._wal is not None:
+                self._wal.log_settlement(round_id, round_state, payouts, wins, summary, contribution)
+
+    def _apply_settlement(self, round_id, round_state, payouts, wins, summary, contribution):
+        leaderboard = self.store["leaderboard"]
+        player_stats = self.store["player_stats"]
+        for player_id, amount in payouts.items():
+            leaderboard.add(player_id, amount)
+            player_stats.add_win(player_id, amount, wins[player_id])
+        self.store["round_history"].push(summary)
+        self.store["analytics"].add(contribution)
+        if round_id == self._round_id:
+            self._round_state = dict(round_state)
+            self._settling = None
+
+    # --- Persistence ---
+
+    def recover(self, directory: str, fsync_interval: float = 0.05) -> Optional[Dict[str, Any]]:
+        """
+        Restores the state from the latest snapshot in `directory` and the WAL
+        generations written since, then logs every further change there.
+        Only the first call has an effect, so every worker may call it.
+
+        Returns the round that was still open when the state was last logged
+        (`round_id`, `round_state` and its `bets` as (player_id, second,
+        amount, power_up) tuples), or None. It cannot be resumed, so it is
+        voided: its stake is taken back and the void logged.
+        """
+        with self._lock:
+            if self._wal is not None:
+                return None
+            os.makedirs(directory, exist_ok=True)
+            snapshot_generation = 0
+            if os.path.exists(os.path.join(directory, SNAPSHOT_NAME)):
+                snapshot = load_snapshot(os.path.join(directory, SNAPSHOT_NAME))
+                snapshot_generation = snapshot.generation
+                self.store["player_stats"] = snapshot.player_stats
+                self.store["leaderboard"] = snapshot.leaderboard
+                self.store["round_history"] = snapshot.round_history
+                self.store["analytics"] = snapshot.analytics
+            unsettled = None
+            generations = wal_generations(directory)
+            for generation in generations:
+                # Older generations are only kept for the bets of a round open at the snapshot
+                replay = generation >= snapshot_generation
+                for kind, record in read_wal(directory, generation):
+                    if kind == BET:
+                        if unsettled is not None:
+                            unsettled["bets"].append(record)
+                        if replay:
+                            self.store["player_stats"].add_bet(record[0], record[2])
+                    elif kind == OPEN_ROUND:
+                        unsettled = dict(record, bets=[])
+                    elif kind == SETTLEMENT:
+                        if unsettled is not None and unsettled["round_id"] == record["round_id"]:
+                            unsettled = None
+                        if replay:
+                            self._apply_settlement(
+                                record["round_id"], record["round_state"], record["payouts"], record["wins"],
+                                record["summary"], record["contribution"],
+                            )
+                    elif kind == VOID:
+                        if unsettled is not None and unsettled["round_id"] == record["round_id"]:
+                            if replay:
+                                for player_id, _, amount, _ in unsettled["bets"]:
+                                    self.store["player_stats"].add_bet(player_id, -amount)
+                            unsettled = None
+                    elif kind == WINNINGS and replay:
+                        self._add_winnings(record)
+            self._wal = WriteAheadLog(directory, max(generations + [snapshot_generation]) + 1, fsync_interval)
+            if unsettled is not None:
+                # Its stake is counted, by the snapshot or by the replayed bets
+                for player_id, _, amount, _ in unsettled["bets"]:
+                    self.store["player_stats"].add_bet(player_id, -amount)
+                self._wal.log_void(unsettled["round_id"])
+            return unsettled
+
+    def checkpoint(self) -> bool:
+        """
+        Writes a snapshot and drops the WAL generations it makes redundant.
+        The state is copied and the WAL rotated under the lock; encoding and
+        writing the snapshot happen outside it. False if persistence is off.
+        """
+        with self._checkpoint_lock:
+            with self._lock:
+                if self._wal is None:
+                    return False
+                generation = self._wal.rotate()
+                state = {
+                    "player_stats": self.store["player_stats"].to_bytes(),
+                    "leaderboard": self.store["leaderboard"].scores(),
+                    "round_history": self.store["round_history"].snapshot(),
+                    "analytics": self.store["analytics"].to_dict(),
+                }
+                unsettled = self._book is not None or self._settling is not None
+                keep_from = self._round_generation if unsettled else generation
+            self._wal.sync_retired()
+            save_snapshot(self._wal.directory, encode_snapshot(generation, state))
+            self._wal.discard_before(keep_from)
+            return True
+
+    def close_persistence(self):
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    def leaderboard_top(self) -> Dict[str, float]:
+        with self._lock:
+            return self.store["leaderboard"].top_payload()
+
+    def leaderboard_rank(self, player_id: str) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            leaderboard = self.store["leaderboard"]
+            rank = leaderboard.rank(player_id)
+            return (rank, leaderboard[player_id]) if rank is not None else None
+
+    def round_history(self, cursor: Optional[int] = None, limit: Optional[int] = None) -> Dict[str, Any]:
+        """A page of round summaries, newest first (see `RoundHistory.page`)."""
+        with self._lock:
+            return self.store["round_history"].page(cursor, limit)
+
+    def round_summary(self, round_id: str) -> Optional[Dict[str, Any]]:
+        """The summary of a round still in the history ring (see `RoundHistory.find`)."""
+        with self._lock:
+            return self.store["round_history"].find(round_id)
+
+    def analytics_report(self, scope: str = "all") -> Dict[str, Any]:
+        """Precomputed aggregates over settled rounds (see `RoundAnalytics.report`)."""
+        with self._lock:
+            return self.store["analytics"].report(scope)
+
+    def history_version(self) -> int:
+        """Changes whenever a round is added to the history."""
+        return self.store["round_history"].version
+
+    # --- Broadcast fan-out ---
+
+    def publish(self, event: str, payload: Any, room: Optional[str] = None) -> int:
+        with self._lock:
+            self._event_seq += 1
+            self._events.append((self._event_seq, event, payload, room))
+            return self._event_seq
+
+    def events_since(self, cursor: Optional[int]) -> Tuple[int, List[Tuple[str, Any, Optional[str]]]]:
+        """(event, payload, room) published after `cursor`. A None cursor starts from now."""
+        with self._lock:
+            if cursor is None:
+                return self._event_seq, []
+            return self._event_seq, [entry[1:] for entry in self._events if entry[0] > cursor]
+
+    # --- Leadership ---
+
+    def try_acquire_leadership(self, worker_id: str, ttl: float) -> bool:
+        """Takes or renews the scheduler lease. Only one worker holds it at a time."""
+        with self._lock:
+            now = time.monotonic()
+            if self._leader in (None, worker_id) or now >= self._lease_until:
+                self._leader = worker_id
+                self._lease_until = now + ttl
+                return True
+            return False
+
+
+class InMemoryStateBackend:
+    """
+    The default backend: a `StateCore` over `GAME_STATE` in this process.
+    Its coroutines never suspend, so each call is atomic on the event loop.
+    """
+    shared = False
+
+    def __init__(self, store: Dict[str, Any]):
+        self.core = StateCore(store)
+
+    async def open_round(self, round_id, round_state, book=None, bet_deadline=None):
+        return self.core.open_round(round_id, round_state, book, bet_deadline)
+
+    async def add_bet(self, player_id, second, amount, power_up):
+        return self.core.add_bet(player_id, second, amount, power_up)
+
+    async def sample_bet(self, round_id):
+        return self.core.sample_bet(round_id)
+
+    async def close_round(self, round_id):
+        return self.core.close_round(round_id)
+
+    async def get_round_state(self):
+        return self.core.get_round_state()
+
+    async def get_player_stats(self, player_id):
+        return self.core.get_player_stats(player_id)
+
+    async def recover(self, directory, fsync_interval=0.05):
+        return await asyncio.to_thread(self.core.recover, directory, fsync_interval)
+
+    async def checkpoint(self):
+        # Only the state copy holds the lock; encoding and the write run on a thread
+        return await asyncio.to_thread(self.core.checkpoint)
+
+    async def close_persistence(self):
+        await asyncio.to_thread(self.core.close_persistence)
+
+    async def add_winnings(self, winnings):
+        self.core.add_winnings(winnings)
+
+    async def apply_settlement(self, round_id, round_state, payouts, wins, summary, contribution):
+        self.core.apply_settlement(round_id, round_state, payouts, wins, summary, contribution)
+
+    async def leaderboard_top(self):
+        return self.core.leaderboard_top()
+
+    async def leaderboard_rank(self, player_id):
+        return self.core.leaderboard_rank(player_id)
+
+    async def round_history(self, cursor=None, limit=None):
+        return self.core.round_history(cursor, limit)
+
+    async def history_version(self):
+        return self.core.history_version()
+
+    async def round_summary(self, round_id):
+        return self.core.round_summary(round_id)
+
+    async def analytics_report(self, scope="all"):
+        return self.core.analytics_report(scope)
+
+    async def publish(self, event, payload, room=None):
+        return self.core.publish(event, payload, room)
+
+    async def events_since(self, cursor):
+        return self.core.events_since(cursor)
+
+    async def try_acquire_leadership(self, worker_id, ttl):
+        return self.core.try_acquire_leadership(worker_id, ttl)
+
+    def fanout(self, sio_server):
+        """Broadcasts go straight to this process's Socket.IO server."""
+        return sio_server
+
+
+class _StateManager(BaseManager):
+    pass
+
+
+_SERVER_CORE: Optional[StateCore] = None
+
+
+def _get_server_core() -> StateCore:
+    global _SERVER_CORE
+    if _SERVER_CORE is None:
+        _SERVER_CORE = StateCore(new_store())
+    return _SERVER_CORE
+
+
+_StateManager.register("state", callable=_get_server_core)
+
+
+def start_local_server(authkey: bytes, address=("127.0.0.1", 0)) -> _StateManager:
+    """Starts a state server in a child process; its `.address` is where workers connect."""
+    manager = _StateManager(address=address, authkey=authkey)
+    manager.start()
+    return manager
+
+
+def serve(address, authkey: bytes):
+    """Runs a state server in the current process until interrupted."""
+    server = _StateManager(address=address, authkey=authkey).get_server()
+    print(f"Time Vault state server listening on {server.address[0]}:{server.address[1]}")
+    server.serve_forever()
+
+
+class BackendFanout:
+    """Emit target for shared mode: emits to a single client stay local, while
+    broadcasts (optionally to a room) are published so every worker's relay
+    delivers them to its own clients."""
+    def __init__(self, backend: "SharedStateBackend", sio_server):
+        self.backend = backend
+        self.sio = sio_server
+
+    async def emit(self, event, data=None, to=None, room=None, **kwargs):
+        if to is not None:
+            await self.sio.emit(event, data, to=to, **kwargs)
+        else:
+            await self.backend.publish(event, data, room)
+
+
+class SharedStateBackend:
+    """
+    Connects to a state server shared by several worker processes. Calls are
+    proxied over a local socket from a worker thread, so they never block
+    the event loop.
+    """
+    shared = True
+
+    def __init__(self, address, authkey: bytes, relay_interval: float = 0.02):
+        self.relay_interval = relay_interval
+        manager = _StateManager(address=address, authkey=authkey)
+        manager.connect()
+        self._proxy = manager.state()
+
+    def __getattr__(self, name):
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(getattr(self._proxy, name), *args, **kwargs)
+        return call
+
+    async def open_round(self, round_id: str, round_state: Dict[str, Any], book: Optional[BetBook] = None,
+                         bet_deadline: Optional[float] = None):
+        # The book lives on the state server; a local one cannot be shared.
+        # Workers and the state server share the host's monotonic clock.
+        return await asyncio.to_thread(self._proxy.open_round, round_id, round_state, None, bet_deadline)
+
+    def fanout(self, sio_server):
+        return BackendFanout(self, sio_server)
+
+    async def relay(self, sio_server, handlers: Optional[Dict[str, Callable[[Any, Optional[str]], Awaitable[Any]]]] = None):
+        """Delivers broadcasts published by any worker to this worker's clients.
+        Events listed in `handlers` are passed to their handler instead of emitted."""
+        handlers = handlers or {}
+        cursor, _ = await self.events_since(None)
+        while True:
+            await asyncio.sleep(self.relay_interval)
+            try:
+                cursor, events = await self.events_since(cursor)
+                for event, payload, room in events:
+                    handler = handlers.get(event)
+                    if handler is not None:
+                        await handler(payload, room)
+                    else:
+                        await sio_server.emit(event, payload, room=room)
+            except Exception as e:
+                print(f"Error relaying shared broadcasts: {e}")
+
+
+def _parse_address(value: str):
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _authkey_from_env() -> bytes:
+    """The state server's shared secret, from STATE_BACKEND_AUTHKEY. There is no default."""
+    authkey = os.environ.get("STATE_BACKEND_AUTHKEY", "")
+    if not authkey:
+        raise RuntimeError("STATE_BACKEND_AUTHKEY must be set to the state server's shared secret")
+    return authkey.encode()
+
+
+def create_state_backend(store: Dict[str, Any]):
+    """Builds the backend selected by STATE_BACKEND ("memory" by default, or "shared")."""
+    if os.environ.get("STATE_BACKEND", "memory") == "shared":
+        return SharedStateBackend(
+            _parse_address(os.environ.get("STATE_BACKEND_ADDRESS", "127.0.0.1:50055")), authkey=_authkey_from_env(),
+        )
+    return InMemoryStateBackend(store)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "serve":
+        print("Usage: python -m backend.state_backend serve [--address HOST:PORT]")
+        sys.exit(2)
+    address = sys.argv[sys.argv.index("--address") + 1] if "--address" in sys.argv else "127.0.0.1:50055"
+    serve(_parse_address(address), authkey=_authkey_from_env())
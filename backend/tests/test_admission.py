@@ -0,0 +1,36 @@
+"""
+test_admission.py
+
+Unit tests for per-player rate limiting and overload admission control.
+"""
+from backend import metrics
+from backend.admission import AdmissionController, RateLimiter
+
+def test_token_bucket_allows_burst_then_refills():
+    """Tests that a player gets `burst` bets at once, then `rate` per second."""
+    limiter = RateLimiter(rate=2.0, burst=3.0)
+    assert [limiter.acquire("p1", now=0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("p1", now=0.0) == 0.5
+    assert limiter.acquire("p2", now=0.0) == 0.0
+    assert limiter.acquire("p1", now=0.5) == 0.0
+    limiter.forget("p1")
+    assert len(limiter) == 1
+
+def test_admission_sheds_under_load_with_structured_errors():
+    """Tests shedding on in-flight depth and loop lag, and the rate-limit rejection."""
+    controller = AdmissionController(rate=1.0, burst=1.0, max_loop_lag=0.1, max_in_flight=1)
+    assert controller.admit("p1") is None
+    rejected = controller.admit("p1")
+    assert rejected["code"] == "rate_limited" and rejected["retry_after"] > 0
+
+    controller.begin()
+    shed = controller.admit("p2")
+    assert shed["status"] == "error" and shed["code"] == "overloaded"
+    controller.end()
+
+    metrics.LOOP_LAG.set(0.5)
+    try:
+        assert controller.admit("p2")["code"] == "overloaded"
+    finally:
+        metrics.LOOP_LAG.set(0.0)
+    assert controller.admit("p2") is None
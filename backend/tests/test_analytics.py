@@ -0,0 +1,49 @@
+"""
+test_analytics.py
+
+Unit tests for the per-round analytics contributions and the rolling aggregates.
+"""
+from unittest.mock import patch
+from backend.analytics import RoundAnalytics, round_contribution
+from backend.provably_fair import FairOutcome
+from backend.sdk_integration import Bet, GameRound, simulate_round
+
+def settle(bets, unlock_second):
+    round_instance = GameRound({"quick_burst_chance": 0.0, "house_edge": 0.1})
+    round_instance.place_bets(bets)
+    with patch.object(round_instance, "fair_outcome", return_value=FairOutcome("", False, unlock_second, 0.0)):
+        result = simulate_round(round_instance)
+    return round_contribution(round_instance.bets, result)
+
+def test_contribution_splits_stake_and_payouts_by_power_up():
+    """Tests the per-second and per-power-up breakdown of one settled round."""
+    contribution = settle([
+        Bet("p1", 50, 30.0), Bet("p2", 50, 10.0, "multiplier_boost"), Bet("p3", 60, 60.0),
+    ], unlock_second=50)
+    assert contribution["staked"] == 100.0 and contribution["bets"] == 3
+    assert sorted(contribution["seconds"]) == [[50, 40.0, 2], [60, 60.0, 1]]
+    power_ups = {entry[0]: entry[1:] for entry in contribution["power_ups"]}
+    assert power_ups["none"][:2] == [90.0, 2] and power_ups["none"][3] == 1
+    assert power_ups["multiplier_boost"][:2] == [10.0, 1] and power_ups["multiplier_boost"][3] == 1
+    assert power_ups["none"][2] + power_ups["multiplier_boost"][2] == contribution["paid"]
+
+def test_rolling_window_drops_old_rounds_and_survives_a_round_trip():
+    """Tests all-time vs rolling totals, cached reports and serialization."""
+    analytics = RoundAnalytics(window=2)
+    analytics.add(settle([Bet("p1", 10, 5.0)], unlock_second=10))
+    analytics.add(settle([Bet("p1", 20, 5.0)], unlock_second=30))
+    analytics.add(settle([Bet("p2", 30, 5.0, "multiplier_boost")], unlock_second=30))
+
+    everything = analytics.report("all")
+    assert everything["rounds"] == 3 and everything["winning_seconds"] == {10: 1, 30: 2}
+    assert everything["edge_by_event"]["none"]["rounds"] == 3
+    assert analytics.report("all") is everything
+
+    rolling = analytics.report("rolling")
+    assert rolling["rounds"] == 2 and rolling["staked"] == 10.0
+    assert set(rolling["stake_heatmap"]) == {20, 30}
+    assert abs(rolling["house_edge"] - 0.325) < 1e-9  # 6.75 paid on 10.0 staked
+
+    restored = RoundAnalytics.from_dict(analytics.to_dict())
+    assert restored.report("all") == everything
+    assert restored.report("rolling") == rolling
@@ -0,0 +1,51 @@
+"""
+test_app.py
+
+Unit tests for bet validation in the Socket.IO handlers and for the
+round scheduler's leadership loop.
+"""
+import asyncio
+from unittest.mock import patch
+
+from backend import app
+
+def test_place_bet_rejects_unknown_power_ups():
+    """Tests that a power-up that is not a known name gets a structured error
+    and never reaches the bet book."""
+    for power_up in ({}, ["multiplier_boost"], "free_money"):
+        response = asyncio.run(app._place_bet("p1", {"second": 30, "amount": 5.0, "power_up": power_up}))
+        assert response["status"] == "error" and response["code"] == "invalid_bet"
+
+def test_place_bet_rejects_amounts_that_are_not_positive_finite_numbers():
+    """Tests that NaN, infinite, non-positive and boolean stakes are rejected
+    before they can reach the pot and the leaderboard."""
+    for amount in (float("nan"), float("inf"), 0, -5.0, True, 10 ** 400, "5"):
+        response = asyncio.run(app._place_bet("p1", {"second": 30, "amount": amount}))
+        assert response["code"] == "invalid_bet", amount
+
+def test_leadership_loop_restarts_a_game_loop_that_died():
+    """Tests that a game loop that raised is restarted instead of leaving the
+    worker holding the lease with no rounds running."""
+    started = []
+
+    async def failing_then_running():
+        started.append(len(started))
+        if len(started) == 1:
+            raise RuntimeError("settlement failed")
+        await asyncio.Event().wait()
+
+    async def run():
+        leader = asyncio.create_task(app.leadership_loop())
+        await asyncio.sleep(0.1)
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+
+    with patch.object(app, "game_loop", failing_then_running), patch.object(app, "LEADER_LEASE_SECONDS", 0.03):
+        asyncio.run(run())
+    assert started == [0, 1]
+
+def test_place_bet_rejects_seconds_out_of_range():
+    """Tests that seconds no round can unlock at, or too large to store, are rejected."""
+    for second in (0, -3, app.MAX_BET_SECOND + 1, 2 ** 40, True):
+        response = asyncio.run(app._place_bet("p1", {"second": second, "amount": 5.0}))
+        assert response["code"] == "invalid_bet", second
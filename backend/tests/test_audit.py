@@ -0,0 +1,121 @@
+"""
+test_audit.py
+
+Unit tests for the buffered provably fair audit log writer.
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from backend import metrics
+from backend.audit import AuditLogWriter, JsonLinesSegment
+from backend.audit_store import ColumnarAuditReader, ColumnarAuditWriter, encode_block
+from backend.sdk_integration import Bet
+
+def _record(round_id):
+    return {"round_id": round_id, "config": {}, "bets": (Bet("p1", 42, 5.0),), "result": None}
+
+def test_records_are_written_on_close(tmp_path):
+    """Tests that queued records are serialized as JSON lines and flushed on shutdown."""
+    path = tmp_path / "audit.log"
+    writer = AuditLogWriter(str(path), fsync_policy="never")
+    writer.submit(_record("round_a"))
+    writer.submit(_record("round_b"))
+    writer.close()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["round_id"] for line in lines] == ["round_a", "round_b"]
+    assert lines[0]["bets"] == [{"player_id": "p1", "second": 42, "amount": 5.0, "power_up": None}]
+
+def test_segments_rotate_past_max_bytes(tmp_path):
+    """Tests that full segments are renamed with increasing suffixes."""
+    path = tmp_path / "audit.log"
+    writer = AuditLogWriter(str(path), fsync_policy="always", max_bytes=1)
+    for round_id in ("round_a", "round_b"):
+        writer.submit(_record(round_id))
+        writer.flush()
+    writer.close()
+    assert json.loads((tmp_path / "audit.log.1").read_text())["round_id"] == "round_a"
+    assert json.loads((tmp_path / "audit.log.2").read_text())["round_id"] == "round_b"
+
+def test_columnar_store_round_trip(tmp_path):
+    """Tests the columnar format: lookup by id, time ranges and per-player scans."""
+    from backend.audit_store import ColumnarAuditReader, convert_json_log
+    log_path = tmp_path / "audit.log"
+    writer = AuditLogWriter(str(log_path), fsync_policy="never")
+    for i, round_id in enumerate(("round_a", "round_b", "round_c")):
+        record = _record(round_id)
+        record["finished_at"] = 100.0 + i
+        if round_id == "round_b":
+            record["bets"] = (Bet("p2", 10, 1.5, "multiplier_boost"),)
+        writer.submit(record)
+    writer.close()
+
+    store_path = tmp_path / "audit.tva"
+    assert convert_json_log(str(log_path), str(store_path)) == 3
+    reader = ColumnarAuditReader(str(store_path))
+    assert len(reader) == 3
+    assert reader.get_round("round_b")["bets"] == [
+        {"player_id": "p2", "second": 10, "amount": 1.5, "power_up": "multiplier_boost"}
+    ]
+    assert reader.get_round("round_x") is None
+    assert [r["round_id"] for r in reader.iter_range(101.0, 103.0)] == ["round_b", "round_c"]
+    assert [r["round_id"] for r in reader.iter_rounds_for_player("p1")] == ["round_a", "round_c"]
+    reader.close()
+
+def test_a_bad_record_does_not_lose_the_rest_of_its_batch(tmp_path):
+    """Tests that a record that cannot be encoded is counted and skipped, in
+    both formats, while the records queued around it are written."""
+    for format in ("jsonl", "columnar"):
+        path = tmp_path / f"audit.{format}"
+        writer = AuditLogWriter(str(path), fsync_policy="never", format=format)
+        dropped = metrics.AUDIT_RECORDS_DROPPED.value
+        bad = dict(_record("round_b"), config={"unencodable": object()})
+        for record in (_record("round_a"), bad, _record("round_c")):
+            writer.submit(record)
+        writer.close()
+        assert metrics.AUDIT_RECORDS_DROPPED.value == dropped + 1
+        assert writer.read_round("round_a") is not None and writer.read_round("round_c") is not None
+        assert writer.read_round("round_b") is None
+        if format == "columnar":
+            reader = ColumnarAuditReader(str(path))
+            assert len(reader) == 2
+            reader.close()
+
+def test_failed_write_is_undone_and_retried(tmp_path):
+    """Tests that a batch whose write fails leaves nothing behind and is
+    written, once and in order, with the next batch."""
+    path = tmp_path / "audit.log"
+    writer = AuditLogWriter(str(path), fsync_policy="never")
+    real_write = JsonLinesSegment.write
+    calls = []
+
+    def flaky_write(segment, lines):
+        calls.append(len(lines))
+        real_write(segment, lines)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    with patch.object(JsonLinesSegment, "write", flaky_write):
+        writer.submit(_record("round_a"))
+        writer.flush()
+        assert path.read_text() == ""
+        writer.submit(_record("round_b"))
+        writer.close()
+    assert calls == [1, 2]
+    assert [json.loads(line)["round_id"] for line in path.read_text().splitlines()] == ["round_a", "round_b"]
+
+def test_columnar_store_holds_large_seconds_and_many_power_ups(tmp_path):
+    """Tests seconds past 32 bits and more than 255 power-ups in one round,
+    and the explicit error for a second no column can hold."""
+    path = str(tmp_path / "audit.tva")
+    bets = [Bet("p1", 2 ** 40, 1.0)] + [Bet("p1", 5, 1.0, f"power_{i}") for i in range(300)]
+    writer = ColumnarAuditWriter(path)
+    writer.append(dict(_record("round_a"), bets=bets))
+    writer.close()
+    reader = ColumnarAuditReader(path)
+    stored = reader.get_round("round_a")["bets"]
+    reader.close()
+    assert stored[0]["second"] == 2 ** 40 and stored[-1]["power_up"] == "power_299"
+    with pytest.raises(ValueError):
+        encode_block(dict(_record("round_b"), bets=[Bet("p1", 2 ** 70, 1.0)]))
@@ -0,0 +1,35 @@
+"""
+test_broadcast.py
+
+Unit tests for the coalescing bet broadcaster.
+"""
+import asyncio
+from backend.broadcast import BetBroadcaster, LEGACY_NEW_BET_ROOM
+
+class FakeSio:
+    def __init__(self):
+        self.emitted = []
+
+    async def emit(self, event, data, **kwargs):
+        self.emitted.append((event, data, kwargs))
+
+def test_bets_are_coalesced_into_one_batch():
+    """Tests that a tick's bets become one per-second stake delta."""
+    sio = FakeSio()
+    broadcaster = BetBroadcaster(sio, legacy_events=False)
+    broadcaster.add("round_1", 55, 10.0)
+    broadcaster.add("round_1", 55, 5.0)
+    broadcaster.add("round_1", 72, 1.0)
+    asyncio.run(broadcaster.flush())
+    asyncio.run(broadcaster.flush())  # Nothing new: no emit
+    assert sio.emitted == [
+        ("bets_batch", {"round_id": "round_1", "seq": 1, "bets": 3, "stakes": {55: 15.0, 72: 1.0}}, {}),
+    ]
+
+def test_legacy_new_bet_events_go_to_subscribers_room():
+    """Tests the compatibility path for `new_bet` consumers."""
+    sio = FakeSio()
+    broadcaster = BetBroadcaster(sio, legacy_events=True)
+    broadcaster.add("round_1", 30, 2.0)
+    asyncio.run(broadcaster.flush())
+    assert sio.emitted[1] == ("new_bet", {"second": 30, "amount": 2.0}, {"room": LEGACY_NEW_BET_ROOM})
@@ -0,0 +1,89 @@
+"""
+test_chat.py
+
+Unit tests for chat batching, game-event priority and slow-client backpressure.
+"""
+import asyncio
+
+from backend.chat import ChatHub, chat_room, valid_channel
+
+class FakeQueue:
+    def __init__(self, size=0):
+        self.size = size
+
+    def qsize(self):
+        return self.size
+
+class FakeSocket:
+    def __init__(self, backlog=0):
+        self.queue = FakeQueue(backlog)
+
+class FakeEngineIO:
+    def __init__(self):
+        self.sockets = {}
+
+class FakeManager:
+    def __init__(self):
+        self.rooms = {}
+
+    def get_participants(self, namespace, room):
+        return iter(self.rooms.get(room, []))
+
+class FakeSio:
+    def __init__(self):
+        self.manager = FakeManager()
+        self.eio = FakeEngineIO()
+        self.emitted = []
+
+    def join(self, sid, room, backlog=0):
+        eio_sid = f"eio_{sid}"
+        self.manager.rooms.setdefault(room, []).append((sid, eio_sid))
+        self.eio.sockets[eio_sid] = FakeSocket(backlog)
+
+    async def emit(self, event, data=None, to=None, room=None, skip_sid=None):
+        self.emitted.append((event, data, to or room, skip_sid))
+
+def test_messages_are_batched_per_channel_and_held_for_game_events():
+    """Tests one emit per channel per tick, and that hold() defers the batch."""
+    sio = FakeSio()
+    hub = ChatHub(sio, max_batch=2)
+
+    async def scenario():
+        hub.post("global", "a", "hi")
+        hub.post("global", "b", "hello")
+        hub.post("global", "c", "hey")
+        hub.post("vip", "d", "gl")
+        async with hub.hold():
+            await hub.flush()
+            assert sio.emitted == []
+        await hub.flush()
+
+    asyncio.run(scenario())
+    assert [(event, room) for event, _, room, _ in sio.emitted] == [
+        ("chat_batch", chat_room("global")), ("chat_batch", chat_room("vip")),
+    ]
+    # The oldest message was dropped to keep the batch bounded
+    assert [m["text"] for m in sio.emitted[0][1]["messages"]] == ["hello", "hey"]
+    assert valid_channel("high-rollers") and not valid_channel("Bad Channel!")
+
+def test_slow_clients_are_skipped_and_told_what_they_missed():
+    """Tests that backed-up clients are skipped and receive a chat_gap once they recover."""
+    sio = FakeSio()
+    room = chat_room("global")
+    sio.join("fast", room)
+    sio.join("slow", room, backlog=50)
+    hub = ChatHub(sio, max_backlog=10)
+
+    async def scenario():
+        hub.post("global", "a", "one")
+        hub.post("global", "a", "two")
+        await hub.flush()
+        sio.eio.sockets["eio_slow"].queue.size = 0
+        hub.post("global", "a", "three")
+        await hub.flush()
+
+    asyncio.run(scenario())
+    batches = [entry for entry in sio.emitted if entry[0] == "chat_batch"]
+    assert batches[0][3] == ["slow"]
+    assert batches[1][3] is None
+    assert ("chat_gap", {"channel": "global", "missed": 2}, "slow", None) in sio.emitted
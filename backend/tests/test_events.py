@@ -0,0 +1,51 @@
+"""
+test_events.py
+
+Unit tests for the cached global event schedule.
+"""
+import os
+from backend.events import EventConfigCache
+
+CONFIG = """
+events:
+  - name: Early
+    enabled: true
+    start_time: "2025-01-01T00:00:00Z"
+    end_time: "2025-01-01T02:00:00Z"
+  - name: Late
+    enabled: true
+    start_time: "2025-01-01T01:00:00Z"
+    end_time: "2025-01-01T03:00:00Z"
+  - name: Recurring
+    enabled: true
+    frequency: weekly
+  - name: Broken
+    enabled: true
+    start_time: "not a date"
+    end_time: "2025-01-01T03:00:00Z"
+"""
+T0 = 1735689600.0  # 2025-01-01T00:00:00Z
+
+def test_schedule_lookups(tmp_path):
+    """Tests active-event and next-transition lookups over overlapping windows."""
+    path = tmp_path / "events.yaml"
+    path.write_text(CONFIG)
+    cache = EventConfigCache(str(path))
+    assert cache.active_events(T0 - 1) == []
+    assert [e["name"] for e in cache.active_events(T0 + 5400)] == ["Early", "Late"]
+    assert [e["name"] for e in cache.active_events(T0 + 7200)] == ["Late"]
+    assert cache.active_events(T0 + 10800) == []
+    assert cache.next_transition(T0 + 5400) == T0 + 7200
+    assert cache.next_transition(T0 + 10800) is None
+
+def test_reloads_only_when_file_changes(tmp_path):
+    """Tests that the file is re-parsed only after its mtime changes."""
+    path = tmp_path / "events.yaml"
+    path.write_text(CONFIG)
+    cache = EventConfigCache(str(path))
+    assert cache.reload_if_changed() is True
+    assert cache.reload_if_changed() is False
+    path.write_text("events: []\n")
+    os.utime(path, ns=(0, 1))
+    assert cache.reload_if_changed() is True
+    assert cache.active_events(T0 + 5400) == []
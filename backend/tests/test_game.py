@@ -6,13 +6,17 @@ Unit tests for the backend game logic using Pytest.
 import pytest
 from unittest.mock import patch
 from backend.game_logic import GameRoundManager, start_new_round, GAME_STATE
+from backend.analytics import RoundAnalytics
+from backend.history import RoundHistory
+from backend.leaderboard import Leaderboard
 
 @pytest.fixture(autouse=True)
 def reset_game_state():
     """Fixture to reset the global game state before each test."""
     GAME_STATE["current_round"] = None
-    GAME_STATE["round_history"] = []
-    GAME_STATE["leaderboard"] = {}
+    GAME_STATE["round_history"] = RoundHistory()
+    GAME_STATE["leaderboard"] = Leaderboard()
+    GAME_STATE["analytics"] = RoundAnalytics()
 
 def test_game_round_manager_initialization():
     """Tests if a GameRoundManager initializes correctly."""
@@ -78,3 +82,29 @@ def test_start_new_round_updates_global_state():
     new_round = start_new_round()
     assert GAME_STATE["current_round"] is new_round
     assert new_round.status == "betting"
+
+class FakeSio:
+    async def emit(self, *args, **kwargs):
+        pass
+
+def test_settlement_closes_betting_and_publishes_snapshots():
+    """Tests the lock-free bet path against settlement and the compact history summary."""
+    import asyncio
+    from backend.locks import LOCKS
+
+    async def scenario():
+        round_manager = await start_new_round(FakeSio())
+        assert await round_manager.place_bet("player1", 45, 10.0, None) is True
+        settlement = asyncio.create_task(round_manager.end_round())
+        await asyncio.sleep(0)
+        assert await round_manager.place_bet("player2", 72, 50.0, None) is False
+        await settlement
+        return round_manager
+
+    round_manager = asyncio.run(scenario())
+    assert round_manager.status == "finished"
+    assert len(round_manager.bets) == 1
+    summary = GAME_STATE["round_history"][0]
+    assert summary["round_id"] == round_manager.round_id
+    assert summary["bets_placed"] == 1 and "bets" not in summary
+    assert LOCKS["round"].stats()["acquisitions"] >= 2
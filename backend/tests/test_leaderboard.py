@@ -0,0 +1,31 @@
+"""
+test_leaderboard.py
+
+Unit tests for the incrementally ranked leaderboard.
+"""
+from backend.leaderboard import Leaderboard
+
+def test_updates_keep_players_ranked():
+    """Tests score accumulation, ordering and rank queries."""
+    board = Leaderboard(top_size=2)
+    board.add("alice", 10)
+    board.add("bob", 30)
+    board.add("carol", 20)
+    board.add("alice", 25)
+    assert list(board.items()) == [("alice", 35), ("bob", 30), ("carol", 20)]
+    assert board.rank("alice") == 1
+    assert board.rank("carol") == 3
+    assert board.rank("dave") is None
+    assert board["bob"] == 30
+
+def test_top_payload_is_cached_until_top_changes():
+    """Tests that only updates touching the top entries rebuild the payload."""
+    board = Leaderboard(top_size=2)
+    for player, score in [("a", 50), ("b", 40), ("c", 10), ("d", 5)]:
+        board.add(player, score)
+    payload = board.top_payload()
+    assert payload == {"a": 50, "b": 40}
+    board.add("d", 1)
+    assert board.top_payload() is payload
+    board.add("c", 35)
+    assert board.top_payload() == {"a": 50, "c": 45}
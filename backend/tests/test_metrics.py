@@ -0,0 +1,58 @@
+"""
+test_metrics.py
+
+Unit tests for the hot-path metrics and their Prometheus rendering.
+"""
+import asyncio
+
+from backend import metrics
+from backend.locks import InstrumentedLock
+
+def test_histogram_renders_cumulative_buckets():
+    """Tests bucket placement, cumulative counts and the sum/count samples."""
+    histogram = metrics.Histogram("test_latency_seconds", "Test histogram.", buckets=(0.1, 1.0),
+                                  labels={"path": "bet"})
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    text = metrics.render()
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{path="bet",le="0.1"} 2' in text
+    assert 'test_latency_seconds_bucket{path="bet",le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{path="bet",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_count{path="bet"} 4' in text
+
+def test_lock_wait_and_hold_are_recorded():
+    """Tests that a contended lock records a wait and both holds in its histograms."""
+    lock = InstrumentedLock("test_metrics")
+
+    async def hold():
+        async with lock:
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(hold(), hold())
+    asyncio.run(run())
+    text = metrics.render()
+    assert 'time_vault_lock_hold_seconds_count{lock="test_metrics"} 2' in text
+    assert 'time_vault_lock_wait_seconds_count{lock="test_metrics"} 2' in text
+    assert lock._wait_histogram.sum >= 0.005
+
+def test_threadsafe_metrics_count_every_update_from_threads():
+    """Tests that metrics recorded from several threads lose no updates and render consistently."""
+    import threading
+    counter = metrics.Counter("test_thread_records_total", "Test counter.", threadsafe=True)
+    histogram = metrics.Histogram("test_thread_seconds", "Test histogram.", buckets=(0.5,), threadsafe=True)
+
+    def record():
+        for _ in range(20_000):
+            counter.inc()
+            histogram.observe(0.25)
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 80_000
+    assert 'test_thread_seconds_bucket{le="+Inf"} 80000' in metrics.render()
+    assert histogram.count == 80_000 and histogram.sum == 20_000.0
@@ -0,0 +1,126 @@
+"""
+test_persistence.py
+
+Tests for the state write-ahead log, checkpoints and warm restart.
+"""
+import os
+import struct
+
+import pytest
+from backend.persistence import read_wal, wal_generations
+from backend.state_backend import StateCore, new_store
+
+def new_core():
+    return StateCore(new_store())
+
+def play_round(core, round_id, bets, payouts):
+    core.open_round(round_id, {"round_id": round_id, "status": "betting"})
+    for player_id, amount in bets:
+        core.add_bet(player_id, 7, amount, None)
+    core.close_round(round_id)
+    pot = sum(amount for _, amount in bets)
+    summary = {"round_id": round_id, "unlock_second": 7, "pot": pot}
+    contribution = {"event": "none", "unlock_second": 7, "staked": pot, "paid": sum(payouts.values()),
+                    "bets": len(bets), "seconds": [[7, pot, len(bets)]], "power_ups": [["none", pot, len(bets), 0.0, 0]]}
+    core.apply_settlement(round_id, {"round_id": round_id, "status": "finished"}, payouts,
+                          {player_id: 1 for player_id in payouts}, summary, contribution)
+
+def test_restart_restores_checkpoint_plus_wal_tail(tmp_path):
+    """Tests that a restart sees checkpointed and logged-only changes, and voids the open round."""
+    directory = str(tmp_path)
+    core = new_core()
+    assert core.recover(directory) is None
+    play_round(core, "round_1", [("p1", 10.0), ("p2", 5.0)], {"p1": 20.0})
+    assert core.checkpoint() is True
+    play_round(core, "round_2", [("p2", 4.0)], {"p2": 8.0})
+    core.add_winnings([("p3", 50.0)])
+    core.open_round("round_3", {"round_id": "round_3", "status": "betting"})
+    core.add_bet("p1", 9, 1.5, "multiplier_boost")
+    core.close_persistence()
+
+    restarted = new_core()
+    unsettled = restarted.recover(directory)
+    assert unsettled["round_id"] == "round_3"
+    assert unsettled["bets"] == [("p1", 9, 1.5, "multiplier_boost")]
+    assert restarted.leaderboard_top() == {"p3": 50.0, "p1": 20.0, "p2": 8.0}
+    assert restarted.get_player_stats("p1") == {"wins": 1, "total_bet": 10.0, "total_won": 20.0}
+    assert restarted.get_player_stats("p2") == {"wins": 1, "total_bet": 9.0, "total_won": 8.0}
+    page = restarted.round_history()
+    assert [entry["round_id"] for entry in page["history"]] == ["round_2", "round_1"]
+    assert page["version"] == 2
+    assert restarted.analytics_report()["rounds"] == 2
+    # Only the first recovery applies, so workers joining later cannot replay twice
+    assert restarted.recover(directory) is None
+    restarted.close_persistence()
+
+def test_checkpoint_keeps_open_round_and_ignores_torn_tail(tmp_path):
+    """Tests that checkpoints keep the open round's log, drop older logs, and
+    that a torn final record is ignored."""
+    directory = str(tmp_path)
+    core = new_core()
+    core.recover(directory)
+    play_round(core, "round_1", [("p1", 10.0)], {})
+    core.open_round("round_2", {"round_id": "round_2", "status": "betting"})
+    core.add_bet("p1", 3, 2.0, None)
+    core.checkpoint()
+    core.add_bet("p2", 3, 1.0, None)
+    core.close_persistence()
+    assert wal_generations(directory) == [1, 2]
+
+    newest = os.path.join(directory, "state.wal.2")
+    with open(newest, "ab") as f:
+        f.write(b"B\x10\x00")
+    assert len(list(read_wal(directory, 2))) == 1
+
+    restarted = new_core()
+    unsettled = restarted.recover(directory)
+    assert [bet[0] for bet in unsettled["bets"]] == ["p1", "p2"]
+    assert restarted.get_player_stats("p1")["total_bet"] == 10.0
+    assert restarted.get_player_stats("p2")["total_bet"] == 0.0
+    restarted.checkpoint()
+    assert wal_generations(directory) == [4]
+    restarted.close_persistence()
+
+def test_replay_takes_back_the_stake_of_a_voided_round(tmp_path):
+    """Tests that rounds voided by the next open, or by recovery itself, are
+    replayed without their stake, however often the state is recovered."""
+    directory = str(tmp_path)
+    core = new_core()
+    core.recover(directory)
+    core.open_round("round_1", {"round_id": "round_1", "status": "betting"})
+    core.add_bet("p1", 3, 6.0, None)
+    core.checkpoint()
+    core.add_bet("p2", 3, 1.0, None)
+    assert core.open_round("round_2", {"round_id": "round_2", "status": "betting"})["round_id"] == "round_1"
+    core.add_bet("p2", 4, 2.0, None)
+    core.close_persistence()
+
+    restarted = new_core()
+    unsettled = restarted.recover(directory)
+    assert unsettled["round_id"] == "round_2"
+    assert restarted.get_player_stats("p1")["total_bet"] == 0.0
+    assert restarted.get_player_stats("p2")["total_bet"] == 0.0
+    restarted.close_persistence()
+
+    again = new_core()
+    assert again.recover(directory) is None
+    assert again.get_player_stats("p1")["total_bet"] == 0.0
+    assert again.get_player_stats("p2")["total_bet"] == 0.0
+    again.close_persistence()
+
+def test_bet_the_wal_cannot_encode_changes_nothing(tmp_path):
+    """Tests that large seconds are logged, and that a bet whose WAL record
+    fails is neither in the book nor in the player's stats."""
+    directory = str(tmp_path)
+    core = new_core()
+    core.recover(directory)
+    core.open_round("round_1", {"round_id": "round_1", "status": "betting"})
+    core.add_bet("p1", 2 ** 40, 1.0, None)
+    with pytest.raises(struct.error):
+        core.add_bet("p2", 2 ** 70, 3.0, None)
+    assert core.get_player_stats("p2") is None
+    core.close_persistence()
+
+    restarted = new_core()
+    assert restarted.recover(directory)["bets"] == [("p1", 2 ** 40, 1.0, None)]
+    restarted.close_persistence()
@@ -0,0 +1,36 @@
+"""
+test_player_stats.py
+
+Unit tests for the array-backed player stats store and its snapshots.
+"""
+import os
+import pytest
+from backend.player_stats import PlayerStatsStore
+
+def test_stats_accumulate_per_player():
+    """Tests bets and wins accumulating into the same per-player output as before."""
+    stats = PlayerStatsStore()
+    stats.add_bet("p1", 10)
+    stats.add_bet("p2", 5.5)
+    stats.add_bet("p1", 2.5)
+    stats.add_win("p1", 30.0)
+    stats.add_win("p1", 12.0, wins=2)
+    assert stats.get("p1") == {"wins": 3, "total_bet": 12.5, "total_won": 42.0}
+    assert stats["p2"] == {"wins": 0, "total_bet": 5.5, "total_won": 0.0}
+    assert stats.get("p3") is None
+    assert len(stats) == 2 and "p2" in stats
+
+def test_snapshot_round_trip(tmp_path):
+    """Tests saving and loading a snapshot, and rejecting a corrupt one."""
+    stats = PlayerStatsStore()
+    for i in range(100):
+        stats.add_bet(f"player_{i}", float(i))
+    stats.add_win("player_7", 70.0)
+    path = os.path.join(tmp_path, "stats.snapshot")
+    stats.save(path)
+    restored = PlayerStatsStore.load(path)
+    assert len(restored) == 100
+    assert restored["player_7"] == {"wins": 1, "total_bet": 7.0, "total_won": 70.0}
+    with pytest.raises(ValueError):
+        PlayerStatsStore.from_bytes(b"garbage")
+
@@ -0,0 +1,58 @@
+"""
+test_provably_fair.py
+
+Tests for the HMAC outcome derivation, server seed chains and the verifier.
+"""
+import json
+
+from backend.provably_fair import SeedPool, derive_outcome, hash_seed, main, verify_rounds
+from backend.sdk_integration import Bet, GameRound, simulate_round
+
+def _audited_rounds(pool, count):
+    records = []
+    for i in range(count):
+        seed = pool.next_seed()
+        config = {"quick_burst_chance": 0.2}
+        round_instance = GameRound(config, server_seed=seed.seed, nonce=seed.nonce, chain_anchor=seed.chain_anchor)
+        round_instance.place_bets([Bet("p1", second, 1.0) for second in range(1, 181)])
+        result = simulate_round(round_instance)
+        records.append({"round_id": f"round_{i}", "config": config, "result": result._asdict()})
+    return records
+
+def test_outcome_is_deterministic_and_in_range():
+    """Tests that the same seeds always give the same outcome, within the configured range."""
+    first = derive_outcome("server", "client", 7, 0.0, 10, 180)
+    assert derive_outcome("server", "client", 7, 0.0, 10, 180) == first
+    assert derive_outcome("server", "client", 8, 0.0, 10, 180) != first
+    seconds = {derive_outcome("server", "client", nonce, 0.0, 10, 12).unlock_second for nonce in range(200)}
+    assert seconds == {10, 11, 12}
+
+def test_seed_chain_links_and_rolls_over():
+    """Tests that consecutive seeds hash to their predecessor and a new chain starts when one runs out."""
+    pool = SeedPool(chain_length=4)
+    seeds = [pool.next_seed() for _ in range(6)]
+    assert hash_seed(seeds[0].seed) == seeds[0].chain_anchor
+    assert all(hash_seed(seeds[i].seed) == seeds[i - 1].seed for i in range(1, 4))
+    assert seeds[4].chain_anchor != seeds[0].chain_anchor and seeds[4].nonce == 1
+
+def test_verifier_accepts_real_rounds_and_flags_tampering():
+    """Tests the verifier over simulated rounds, then with a forged result and a swapped seed."""
+    records = _audited_rounds(SeedPool(chain_length=50), 30)
+    report = verify_rounds(records)
+    assert report.rounds == 30 and report.ok
+
+    records[3]["result"]["unlock_second"] += 1
+    records[7]["result"]["provably_fair_data"]["server_seed"] = "f" * 64
+    failed = [round_id for round_id, _ in verify_rounds(records).failures]
+    assert "round_3" in failed and "round_7" in failed
+
+def test_verify_command_fails_on_a_missing_or_empty_log(tmp_path):
+    """Tests that a mistyped path or a log without rounds exits non-zero
+    instead of reporting zero failures."""
+    assert main(["verify", str(tmp_path / "missing_dir" / "audit.log")]) == 2
+    assert main(["verify", str(tmp_path / "audit.log")]) == 2
+    path = tmp_path / "audit.log"
+    path.write_text("")
+    assert main(["verify", str(path)]) == 2
+    path.write_text("".join(json.dumps(record) + "\n" for record in _audited_rounds(SeedPool(chain_length=5), 3)))
+    assert main(["verify", str(path)]) == 0
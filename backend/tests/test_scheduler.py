@@ -0,0 +1,57 @@
+"""
+test_scheduler.py
+
+Tests for monotonic round deadlines, their enforcement on bets, and
+pre-scheduled round timers.
+"""
+import asyncio
+from backend.metrics import Histogram
+from backend.scheduler import Timers, now, sleep_until
+from backend.state_backend import InMemoryStateBackend, new_store
+
+def test_sleep_until_never_wakes_early_and_records_lateness():
+    """Tests that the scheduler wakes at or after the deadline and records how late it was."""
+    lateness = Histogram("test_scheduler_lateness_seconds", "Test lateness.")
+
+    async def scenario():
+        deadline = now() + 0.02
+        late = await sleep_until(deadline, lateness)
+        assert now() >= deadline and late >= 0.0
+
+    asyncio.run(scenario())
+    assert lateness.count == 1
+
+def test_bets_are_refused_after_the_deadline_before_the_round_closes():
+    """Tests that a late bet is refused even while the round is still open."""
+    async def scenario():
+        backend = InMemoryStateBackend(new_store())
+        await backend.open_round("round_1", {"round_id": "round_1"}, bet_deadline=now() + 0.01)
+        assert await backend.add_bet("p1", 12, 3.0, None) == "round_1"
+        await asyncio.sleep(0.02)
+        assert await backend.add_bet("p1", 12, 3.0, None) is None
+        assert len(await backend.close_round("round_1")) == 1
+
+    asyncio.run(scenario())
+
+def test_timers_fire_at_their_deadline_and_cancel_as_a_group():
+    """Tests that scheduled timers run once at their deadline and can be cancelled together."""
+    lateness = Histogram("test_timer_lateness_seconds", "Test lateness.")
+    fired = []
+
+    async def scenario():
+        timers = Timers()
+
+        async def record():
+            fired.append(now())
+
+        start = now()
+        timers.at(start + 0.01, lateness, record)
+        timers.at(start + 10, lateness, record)
+        await asyncio.sleep(0.03)
+        assert len(fired) == 1 and fired[0] >= start + 0.01
+        assert len(timers) == 1
+        timers.cancel()
+        await asyncio.sleep(0)
+        assert len(timers) == 0
+
+    asyncio.run(scenario())
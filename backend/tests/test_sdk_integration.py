@@ -0,0 +1,70 @@
+"""
+test_sdk_integration.py
+
+Unit tests for the mock SDK's bet book and round settlement.
+"""
+from unittest.mock import patch
+from backend.provably_fair import FairOutcome
+from backend.sdk_integration import Bet, BetBook, GameRound, simulate_round
+
+def test_bet_book_running_totals():
+    """Tests that the book keeps pot and per-second totals as bets arrive."""
+    book = BetBook([Bet("p1", 20, 10.0), Bet("p2", 20, 5.0, "multiplier_boost")])
+    book.append(Bet("p3", 30, 2.5))
+    assert len(book) == 3
+    assert book.total_pot == 17.5
+    assert book.stake_at(20) == 15.0
+    assert book.boosted_stake_at(20) == 5.0
+    assert book.plain_stake_at(20) == 10.0
+    assert [bet.player_id for bet in book.bets_at(20)] == ["p1", "p2"]
+    assert book.bets_at(99) == []
+    assert book[2].player_id == "p3"
+
+def test_simulate_round_pays_winning_bucket_only():
+    """Tests the proportional pool split against the indexed winning bucket."""
+    round_instance = GameRound({"quick_burst_chance": 0.0, "house_edge": 0.1})
+    round_instance.place_bets([
+        Bet("p1", 50, 30.0), Bet("p2", 50, 10.0, "multiplier_boost"), Bet("p3", 60, 60.0),
+    ])
+    with patch.object(round_instance, "fair_outcome", return_value=FairOutcome("", False, 50, 0.0)):
+        result = simulate_round(round_instance)
+    assert result.unlock_second == 50
+    assert result.payouts["p1"] == 100 * 0.9 * 0.75
+    assert result.payouts["p2"] == 100 * 0.9 * 0.25 * 1.5
+    assert "p3" not in result.payouts
+
+def test_chunked_settlement_matches_single_pass():
+    """Tests that paying winners in chunks gives the same winners and payouts."""
+    round_instance = GameRound({"quick_burst_chance": 0.0})
+    round_instance.place_bets([
+        Bet(f"p{i % 7}", 50, float(i % 5 + 1), "multiplier_boost" if i % 3 == 0 else None) for i in range(100)
+    ])
+    with patch.object(round_instance, "fair_outcome", return_value=FairOutcome("", False, 50, 0.0)):
+        single = simulate_round(round_instance)
+        chunked = simulate_round(round_instance, chunk_size=16)
+    assert chunked.winners == single.winners
+    assert chunked.payouts == single.payouts
+
+def test_round_above_the_chunk_size_settles_like_a_single_pass():
+    """Tests that a round whose winning bucket and book exceed the chunk size
+    settles, and is encoded for the audit log, exactly as without chunking."""
+    from backend import game_logic
+    from backend.audit import encode_round_record
+
+    class NullSio:
+        async def emit(self, *args, **kwargs):
+            pass
+
+    manager = game_logic.GameRoundManager({"quick_burst_chance": 0.0, "bonus_vault_chance": 0.0}, NullSio())
+    manager.bets.extend(
+        Bet(f"p{i % 13}", 50 if i % 4 else 60, float(i % 5 + 1), "multiplier_boost" if i % 3 == 0 else None)
+        for i in range(500)
+    )
+    settled = {}
+    with patch.object(manager.sdk_round, "fair_outcome", return_value=FairOutcome("", False, 50, 0.0)):
+        for chunk_size in (None, 16):
+            with patch.object(game_logic, "SETTLEMENT_CHUNK_SIZE", chunk_size):
+                wins, audit_record, contribution = manager._settle()
+            settled[chunk_size] = (wins, manager.result, contribution, encode_round_record(audit_record, chunk_size))
+    assert len(manager.result.winners) == 375
+    assert settled[16] == settled[None]
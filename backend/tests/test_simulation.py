@@ -0,0 +1,68 @@
+"""
+test_simulation.py
+
+Tests for the scenario simulator: bettor strategy models, event effects
+applied through the live code path, and chunked output.
+"""
+import csv
+import json
+import random
+from backend.simulation.scenario import load_scenario, run_scenario
+from backend.simulation.strategies import BettorGroup
+
+SCENARIO = """
+name: test_sweep
+rounds: 25
+seed: 3
+chunk_rounds: 10
+crowd:
+  - name: minnow
+    players: 30
+    seconds: {model: clustered, centers: [40], spread: 0}
+    stakes: {model: choice, amounts: [1, 2]}
+  - name: whale
+    players: 3
+    bets_per_player: [2, 2]
+    seconds: {model: uniform, low: 10, high: 60}
+    stakes: {model: lognormal, median: 500}
+    power_up_chance: 1.0
+variants:
+  - name: baseline
+  - name: boosted
+    events: [{name: Boost, effects: {multiplierBoost: 1.2}}]
+"""
+
+def test_groups_draw_from_their_models():
+    """Tests that a group's bets follow its seconds, stakes and power-up models."""
+    group = BettorGroup.from_spec({
+        "name": "whale", "players": 5, "bets_per_player": [3, 3],
+        "seconds": {"model": "clustered", "centers": [200], "spread": 50},
+        "stakes": {"model": "tiered", "whale_share": 0.0, "minnow": {"model": "choice", "amounts": [7]}},
+        "power_up_chance": 1.0,
+    })
+    bets = list(group.bets(random.Random(1), {"min_seconds": 10, "max_seconds": 180}))
+    assert len(bets) == 15 and {bet.player_id for bet in bets} == {f"whale_{n}" for n in range(5)}
+    assert all(10 <= bet.second <= 180 for bet in bets)
+    assert {bet.amount for bet in bets} == {7.0}
+    assert {bet.power_up for bet in bets} == {"multiplier_boost"}
+
+def test_variants_share_bets_and_stream_chunks(tmp_path):
+    """Tests that an event variant only changes payouts and that results are written per chunk."""
+    path = tmp_path / "scenario.yaml"
+    path.write_text(SCENARIO)
+    baseline, boosted = run_scenario(load_scenario(str(path)), str(tmp_path / "out"))
+
+    assert baseline["analytics"]["staked"] == boosted["analytics"]["staked"]
+    assert baseline["analytics"]["paid"] > 0
+    assert abs(boosted["analytics"]["paid"] - 1.2 * baseline["analytics"]["paid"]) < 1e-6
+    assert boosted["config"]["multiplierBoost"] == 1.2 and boosted["events"] == ["Boost"]
+    groups = baseline["groups"]
+    for total in ("staked", "paid"):
+        assert abs(groups["minnow"][total] + groups["whale"][total] - baseline["analytics"][total]) < 1e-6
+
+    with open(tmp_path / "out" / "baseline" / "chunks.jsonl") as f:
+        chunks = [json.loads(line) for line in f]
+    assert [(chunk["first_round"], chunk["last_round"]) for chunk in chunks] == [(1, 10), (11, 20), (21, 25)]
+    assert abs(sum(chunk["analytics"]["staked"] for chunk in chunks) - baseline["analytics"]["staked"]) < 1e-6
+    with open(tmp_path / "out" / "baseline" / "rounds.csv") as f:
+        assert len(list(csv.DictReader(f))) == 25
@@ -0,0 +1,75 @@
+"""
+test_simulation_template.py
+
+Tests that the vectorized batch simulation in docs/simulation_template.py
+settles rounds exactly like the SDK.
+"""
+from unittest.mock import patch
+import pytest
+from backend.provably_fair import FairOutcome
+from backend.sdk_integration import Bet, GameRound, simulate_round
+
+np = pytest.importorskip("numpy")
+from docs import simulation_template  # noqa: E402
+
+CONFIG = {"min_seconds": 10, "max_seconds": 40, "quick_burst_chance": 0.2, "house_edge": 0.05,
+          "multiplierBoost": 1.1}
+
+def sdk_payouts(draws):
+    """Settles every drawn round with the real SDK, forcing its drawn outcome."""
+    payouts = []
+    for number in range(draws["rounds"]):
+        round_instance = GameRound(CONFIG)
+        in_round = np.flatnonzero(draws["round_idx"] == number)
+        round_instance.place_bets([
+            Bet(f"p{index}", int(draws["seconds"][index]), float(draws["amounts"][index]),
+                "multiplier_boost" if draws["boosted"][index] else None)
+            for index in in_round
+        ])
+        outcome = FairOutcome("", bool(draws["quick_burst"][number]), int(draws["unlock"][number]),
+                              float(draws["burst_multiplier"][number]))
+        with patch.object(round_instance, "fair_outcome", return_value=outcome):
+            result = simulate_round(round_instance)
+        payouts.append(sum(result.payouts.values()))
+    return np.array(payouts)
+
+def test_batch_settlement_matches_simulate_round():
+    """Tests that batch payouts equal the SDK's, round by round, for the same draws."""
+    draws = simulation_template.draw_batch(np.random.default_rng(7), 300, CONFIG,
+                                           bets_per_round=(20, 60), boost_chance=0.3)
+    batch = simulation_template.settle_batch(draws, CONFIG)
+    expected = sdk_payouts(draws)
+    assert (expected > 0).sum() > 50 and batch["quick_bursts"] > 0
+    assert np.allclose(batch["payout"], expected)
+    assert np.allclose(batch["pot"], np.bincount(draws["round_idx"], weights=draws["amounts"], minlength=300))
+
+def test_accumulator_merge_matches_direct_moments():
+    """Tests that merged shard accumulators give the mean and variance of all rounds at once."""
+    rng = np.random.default_rng(11)
+    config = simulation_template.load_sdk_config()
+    batches = [simulation_template.simulate_batch(rng, rounds, config) for rounds in (1, 40, 250)]
+    merged = simulation_template.SimulationAccumulator(config)
+    for batch in batches:
+        shard = simulation_template.SimulationAccumulator(config)
+        shard.update(batch)
+        merged.merge(shard)
+
+    pot = np.concatenate([batch["pot"] for batch in batches])
+    rtp = np.concatenate([batch["payout"] for batch in batches]) / pot
+    report = merged.report()
+    assert report["rounds"] == 291
+    assert np.isclose(report["round_rtp_mean"], rtp.mean())
+    assert np.isclose(report["round_rtp_std"], rtp.std(ddof=1))
+    assert np.isclose(report["total_bets_value"], pot.sum())
+
+def test_same_seed_gives_the_same_report_for_any_worker_count():
+    """Tests that sharding across a process pool does not change a seeded run's report."""
+    single = simulation_template.run_batch_simulation(5000, seed=42, workers=1, chunk_size=1000)
+    pooled = simulation_template.run_batch_simulation(5000, seed=42, workers=3, chunk_size=1000)
+    assert pooled == single
+    assert single["rounds"] == 5000
+
+def test_zero_rounds_gives_an_empty_report():
+    """Tests that an empty batch run reports no rounds, as the classic mode does."""
+    report = simulation_template.run_batch_simulation(0, seed=1, workers=3)
+    assert report["rounds"] == 0 and report["actual_house_edge"] is None
@@ -0,0 +1,78 @@
+"""
+test_state_backend.py
+
+Tests for the pluggable state backends, including the multi-process
+shared backend running against a local state server.
+"""
+import asyncio
+import pytest
+from backend.state_backend import InMemoryStateBackend, SharedStateBackend, new_store, start_local_server
+
+AUTHKEY = b"test-authkey"
+
+@pytest.fixture
+def state_server():
+    manager = start_local_server(AUTHKEY)
+    yield manager
+    manager.shutdown()
+
+def test_workers_share_one_round(state_server):
+    """Tests that bets from two workers land in one book and only one worker leads."""
+    async def scenario():
+        worker_a = SharedStateBackend(state_server.address, AUTHKEY)
+        worker_b = SharedStateBackend(state_server.address, AUTHKEY)
+        assert await worker_a.try_acquire_leadership("a", 10) is True
+        assert await worker_b.try_acquire_leadership("b", 10) is False
+
+        await worker_a.open_round("round_1", {"round_id": "round_1", "status": "betting"})
+        assert await worker_a.add_bet("p1", 42, 10.0, None) == "round_1"
+        assert await worker_b.add_bet("p2", 42, 5.0, "multiplier_boost") == "round_1"
+        assert (await worker_b.get_round_state())["bets_placed"] == 2
+
+        book = await worker_a.close_round("round_1")
+        assert book.stake_at(42) == 15.0
+        assert await worker_b.add_bet("p3", 42, 1.0, None) is None
+
+        await worker_a.add_winnings([("p2", 30.0)])
+        assert await worker_b.leaderboard_rank("p2") == (1, 30.0)
+        assert (await worker_b.get_player_stats("p2"))["total_bet"] == 5.0
+
+        cursor, _ = await worker_b.events_since(None)
+        await worker_a.publish("round_result", {"unlock_second": 42})
+        assert (await worker_b.events_since(cursor))[1] == [("round_result", {"unlock_second": 42}, None)]
+
+    asyncio.run(scenario())
+
+def test_in_memory_backend_settles_callers_book():
+    """Tests that the default backend works directly on the in-process book and store."""
+    from backend.sdk_integration import BetBook
+
+    async def scenario():
+        store = new_store()
+        backend = InMemoryStateBackend(store)
+        book = BetBook()
+        await backend.open_round("round_1", {"round_id": "round_1"}, book)
+        await backend.add_bet("p1", 12, 3.0, None)
+        assert await backend.close_round("round_1") is book
+        assert store["player_stats"]["p1"]["total_bet"] == 3.0
+
+    asyncio.run(scenario())
+
+def test_new_leader_voids_the_round_its_predecessor_left_open(state_server):
+    """Tests that opening over an unsettled round voids it and takes its stake back."""
+    async def scenario():
+        old_leader = SharedStateBackend(state_server.address, AUTHKEY)
+        new_leader = SharedStateBackend(state_server.address, AUTHKEY)
+        assert await old_leader.open_round("round_1", {"round_id": "round_1", "status": "betting"}) is None
+        await old_leader.add_bet("p1", 42, 10.0, None)
+        await new_leader.add_bet("p2", 7, 4.0, None)
+        # The old leader closed the round but died before settling it
+        await old_leader.close_round("round_1")
+
+        voided = await new_leader.open_round("round_2", {"round_id": "round_2", "status": "betting"})
+        assert voided["round_id"] == "round_1"
+        assert voided["bets"] == [("p1", 42, 10.0, None), ("p2", 7, 4.0, None)]
+        assert (await new_leader.get_player_stats("p1"))["total_bet"] == 0.0
+        assert await new_leader.add_bet("p1", 42, 1.0, None) == "round_2"
+
+    asyncio.run(scenario())
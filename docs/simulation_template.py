@@ -5,25 +5,50 @@ An extendable Python script to simulate multiple rounds of Time Vault
 using the mock StakeEngine Math SDK. This is useful for balancing the game,
 testing payout distributions, and analyzing the house edge over a large
 number of rounds.
+
+Two modes are available: the classic mode drives the real SDK objects one
+round at a time, while the batch mode (requires NumPy, imported only when
+it is used) draws unlock seconds,
+Quick Burst flags, bets and payouts for many rounds at once as arrays and can
+shard the work across a process pool from a single master seed.
 """
 import json
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from random import randint, choice
+
+try:
+    import numpy as np
+except ImportError:  # Only the batch mode needs NumPy
+    np = None
+
 from backend.sdk_integration import GameRound, Bet, simulate_round
 
-def setup_round_from_config(config_path="backend/config/round_schema.json"):
-    """Loads round configuration from a JSON file and creates a GameRound."""
+BET_AMOUNTS = (1, 5, 10, 25, 50, 100)
+QUICK_BURST_SECONDS = (1, 8)
+QUICK_BURST_MULTIPLIER_RANGE = (50, 150)
+POWER_UP_MULTIPLIER = 1.5
+
+@lru_cache(maxsize=None)
+def _load_schema(config_path: str) -> str:
     with open(config_path, 'r') as f:
-        config = json.load(f)
-    
-    # Adapt the JSON schema to the SDK's expected config format
-    sdk_config = {
+        return f.read()
+
+def load_sdk_config(config_path="backend/config/round_schema.json") -> dict:
+    """Loads the round schema once and adapts it to the SDK's config format."""
+    config = json.loads(_load_schema(config_path))
+    return {
         "min_seconds": config["vaultTimer"]["minSeconds"],
         "max_seconds": config["vaultTimer"]["maxSeconds"],
         "quick_burst_chance": config["specialEvents"]["quickBurst"]["chance"],
         "bonus_vault_chance": config["specialEvents"]["bonusVault"]["chance"],
         "house_edge": config["houseEdge"]
     }
-    return GameRound(sdk_config)
+
+def setup_round_from_config(config_path="backend/config/round_schema.json"):
+    """Creates a GameRound from the (cached) JSON round configuration."""
+    return GameRound(load_sdk_config(config_path))
 
 def generate_random_bets(num_bets: int, player_pool_size: int, min_sec: int, max_sec: int) -> list[Bet]:
     """Generates a list of random bets for simulation."""
@@ -31,62 +56,297 @@ def generate_random_bets(num_bets: int, player_pool_size: int, min_sec: int, max
     for _ in range(num_bets):
         player_id = f"sim_player_{randint(1, player_pool_size)}"
         second = randint(min_sec, max_sec)
-        amount = choice([1, 5, 10, 25, 50, 100])
+        amount = choice(BET_AMOUNTS)
         bets.append(Bet(player_id=player_id, second=second, amount=float(amount)))
     return bets
 
-def run_simulation(num_rounds: int):
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("The batch simulation mode requires NumPy (pip install numpy)")
+
+def _empty_report(sdk_config: dict) -> dict:
+    return {
+        "rounds": 0,
+        "quick_bursts": 0,
+        "total_bets_value": 0.0,
+        "total_payouts_value": 0.0,
+        "target_house_edge": sdk_config.get("house_edge", 0.02),
+        "winning_seconds": defaultdict(int),
+    }
+
+def _finalize_report(report: dict) -> dict:
+    total_bets = report["total_bets_value"]
+    report["actual_house_edge"] = (
+        (total_bets - report["total_payouts_value"]) / total_bets if total_bets > 0 else None
+    )
+    report["winning_seconds"] = dict(report["winning_seconds"])
+    return report
+
+class SimulationAccumulator:
+    """
+    Streaming totals for batch simulations: sums, the winning-second
+    histogram and the running mean/variance of each round's return to player
+    (payout / pot). Accumulators from independent shards can be merged, so
+    results never need to be held in memory as per-round arrays.
+    """
+    def __init__(self, sdk_config: dict):
+        _require_numpy()
+        self.sdk_config = sdk_config
+        self.rounds = 0
+        self.quick_bursts = 0
+        self.total_bets_value = 0.0
+        self.total_payouts_value = 0.0
+        self.winning_seconds = np.zeros(sdk_config.get("max_seconds", 180) + 1, dtype=np.int64)
+        # Welford/Chan state for the per-round return to player
+        self.rtp_mean = 0.0
+        self.rtp_m2 = 0.0
+
+    def _merge_moments(self, count: int, mean: float, m2: float):
+        total = self.rounds + count
+        delta = mean - self.rtp_mean
+        self.rtp_mean += delta * count / total
+        self.rtp_m2 += m2 + delta * delta * self.rounds * count / total
+
+    def update(self, batch: dict):
+        """Folds in one `simulate_batch` result."""
+        rounds = batch["rounds"]
+        if rounds == 0:
+            return
+        rtp = np.divide(batch["payout"], batch["pot"], out=np.zeros_like(batch["payout"]), where=batch["pot"] > 0)
+        batch_mean = float(rtp.mean())
+        self._merge_moments(rounds, batch_mean, float(((rtp - batch_mean) ** 2).sum()))
+        self.rounds += rounds
+        self.quick_bursts += batch["quick_bursts"]
+        self.total_bets_value += float(batch["pot"].sum())
+        self.total_payouts_value += float(batch["payout"].sum())
+        histogram = batch["winning_seconds"]
+        if histogram.size > self.winning_seconds.size:
+            self.winning_seconds = np.pad(self.winning_seconds, (0, histogram.size - self.winning_seconds.size))
+        self.winning_seconds[:histogram.size] += histogram
+
+    def merge(self, other: "SimulationAccumulator"):
+        """Folds in another accumulator, e.g. the result of a worker shard."""
+        if other.rounds == 0:
+            return
+        self._merge_moments(other.rounds, other.rtp_mean, other.rtp_m2)
+        self.rounds += other.rounds
+        self.quick_bursts += other.quick_bursts
+        self.total_bets_value += other.total_bets_value
+        self.total_payouts_value += other.total_payouts_value
+        size = max(self.winning_seconds.size, other.winning_seconds.size)
+        merged = np.zeros(size, dtype=np.int64)
+        merged[:self.winning_seconds.size] += self.winning_seconds
+        merged[:other.winning_seconds.size] += other.winning_seconds
+        self.winning_seconds = merged
+
+    def report(self) -> dict:
+        """Returns the same report as `run_simulation`, plus RTP dispersion."""
+        report = _empty_report(self.sdk_config)
+        report["rounds"] = self.rounds
+        report["quick_bursts"] = self.quick_bursts
+        report["total_bets_value"] = self.total_bets_value
+        report["total_payouts_value"] = self.total_payouts_value
+        for second in np.flatnonzero(self.winning_seconds):
+            report["winning_seconds"][int(second)] = int(self.winning_seconds[second])
+        variance = self.rtp_m2 / (self.rounds - 1) if self.rounds > 1 else 0.0
+        report["round_rtp_mean"] = self.rtp_mean
+        report["round_rtp_std"] = float(np.sqrt(variance))
+        return _finalize_report(report)
+
+def draw_batch(rng: "np.random.Generator", num_rounds: int, sdk_config: dict,
+               bets_per_round=(50, 200), boost_chance: float = 0.0) -> dict:
     """
-    Runs a full simulation for a specified number of rounds and prints a report.
+    Draws everything `num_rounds` rounds depend on as arrays: per round the
+    Quick Burst flag, unlock second and Quick Burst multiplier, and per bet
+    (flattened across rounds, with `round_idx` giving each bet's round) the
+    second, amount and whether it uses the 'multiplier_boost' power-up.
+    """
+    min_sec, max_sec = sdk_config.get("min_seconds", 10), sdk_config.get("max_seconds", 180)
+
+    # Per-round draws
+    quick_burst = rng.random(num_rounds) < sdk_config.get("quick_burst_chance", 0.05)
+    unlock = np.where(
+        quick_burst,
+        rng.integers(QUICK_BURST_SECONDS[0], QUICK_BURST_SECONDS[1] + 1, num_rounds),
+        rng.integers(min_sec, max_sec + 1, num_rounds),
+    )
+    burst_multiplier = rng.uniform(*QUICK_BURST_MULTIPLIER_RANGE, num_rounds)
+    bet_counts = rng.integers(bets_per_round[0], bets_per_round[1] + 1, num_rounds)
+
+    # Per-bet draws, flattened across rounds
+    round_idx = np.repeat(np.arange(num_rounds), bet_counts)
+    num_bets = round_idx.size
+    seconds = rng.integers(min_sec, max_sec + 1, num_bets)
+    amounts = rng.choice(np.asarray(BET_AMOUNTS, dtype=np.float64), num_bets)
+    boosted = rng.random(num_bets) < boost_chance if boost_chance > 0 else np.zeros(num_bets, dtype=bool)
+
+    return {
+        "rounds": num_rounds, "quick_burst": quick_burst, "unlock": unlock,
+        "burst_multiplier": burst_multiplier, "round_idx": round_idx,
+        "seconds": seconds, "amounts": amounts, "boosted": boosted,
+    }
+
+def settle_batch(draws: dict, sdk_config: dict) -> dict:
+    """
+    Settles drawn rounds as arrays, following `simulate_round` semantics:
+    Quick Burst rounds pay stake x their multiplier, standard rounds split the
+    pot (minus house edge) proportionally between the winning bets, and both
+    apply the global `multiplierBoost` and the 1.5x 'multiplier_boost' power-up.
+    Returns per-round `pot` and `payout` arrays plus batch totals.
+    """
+    num_rounds = draws["rounds"]
+    quick_burst, unlock, round_idx = draws["quick_burst"], draws["unlock"], draws["round_idx"]
+    amounts = draws["amounts"]
+    max_sec = sdk_config.get("max_seconds", 180)
+    house_edge = sdk_config.get("house_edge", 0.02)
+    global_boost = sdk_config.get("multiplierBoost", 1.0)
+
+    pot = np.bincount(round_idx, weights=amounts, minlength=num_rounds)
+
+    # Only the winning bets matter for payouts
+    won = draws["seconds"] == unlock[round_idx]
+    win_round = round_idx[won]
+    win_amount = amounts[won]
+    win_multiplier = global_boost * np.where(draws["boosted"][won], POWER_UP_MULTIPLIER, 1.0)
+    winner_stake = np.bincount(win_round, weights=win_amount, minlength=num_rounds)
+
+    pool = pot * (1 - house_edge)
+    proportion = np.divide(win_amount, winner_stake[win_round],
+                           out=np.zeros_like(win_amount), where=winner_stake[win_round] > 0)
+    payouts = np.where(
+        quick_burst[win_round],
+        win_amount * draws["burst_multiplier"][win_round] * win_multiplier,
+        pool[win_round] * proportion * win_multiplier,
+    )
+
+    return {
+        "rounds": num_rounds,
+        "quick_bursts": int(quick_burst.sum()),
+        "pot": pot,
+        "payout": np.bincount(win_round, weights=payouts, minlength=num_rounds),
+        "winning_seconds": np.bincount(unlock, minlength=max_sec + 1),
+    }
+
+def simulate_batch(rng: "np.random.Generator", num_rounds: int, sdk_config: dict,
+                   bets_per_round=(50, 200), boost_chance: float = 0.0) -> dict:
+    """Draws and settles `num_rounds` rounds; see `draw_batch` and `settle_batch`."""
+    return settle_batch(draw_batch(rng, num_rounds, sdk_config, bets_per_round, boost_chance), sdk_config)
+
+def _run_blocks(blocks: list, sdk_config: dict, boost_chance: float) -> list:
+    """Simulates consecutive blocks of rounds, each with its own derived RNG,
+    and returns one accumulator per block. Runs inside pool workers."""
+    accumulators = []
+    for seed_sequence, num_rounds in blocks:
+        accumulator = SimulationAccumulator(sdk_config)
+        accumulator.update(simulate_batch(np.random.default_rng(seed_sequence), num_rounds, sdk_config,
+                                          boost_chance=boost_chance))
+        accumulators.append(accumulator)
+    return accumulators
+
+def run_batch_simulation(num_rounds: int, seed=None, workers: int = 1, chunk_size: int = 20_000,
+                         boost_chance: float = 0.0, config_path="backend/config/round_schema.json") -> dict:
+    """
+    Runs a vectorized simulation and returns the same report as `run_simulation`.
+
+    Rounds are drawn in blocks of `chunk_size`, each with a seed spawned from
+    the master `seed`. The blocks are split into `workers` shards of about
+    `num_rounds / workers` rounds, and the per-block accumulators are merged
+    in block order. Only the block layout affects the draws and the order of
+    the sums, so a given seed reproduces the same report for any `workers`.
+    """
+    _require_numpy()
+    sdk_config = load_sdk_config(config_path)
+    block_rounds = [chunk_size] * (num_rounds // chunk_size)
+    if num_rounds % chunk_size:
+        block_rounds.append(num_rounds % chunk_size)
+    blocks = list(zip(np.random.SeedSequence(seed).spawn(len(block_rounds)), block_rounds))
+    accumulator = SimulationAccumulator(sdk_config)
+    if not blocks:
+        return accumulator.report()
+    blocks_per_shard = -(-len(blocks) // max(1, workers))
+    shards = [blocks[start:start + blocks_per_shard] for start in range(0, len(blocks), blocks_per_shard)]
+
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard in pool.map(_run_blocks, shards, [sdk_config] * len(shards), [boost_chance] * len(shards)):
+                for block in shard:
+                    accumulator.merge(block)
+    else:
+        for shard in shards:
+            for block in _run_blocks(shard, sdk_config, boost_chance):
+                accumulator.merge(block)
+
+    return accumulator.report()
+
+def print_report(report: dict):
+    """Prints a simulation report produced by either simulation mode."""
+    print("\n--- Simulation Report ---")
+    print(f"Rounds Simulated: {report['rounds']} ({report['quick_bursts']} Quick Bursts)")
+    print(f"Total Value of Bets: ${report['total_bets_value']:.2f}")
+    print(f"Total Value of Payouts: ${report['total_payouts_value']:.2f}")
+
+    if report["actual_house_edge"] is not None:
+        print(f"Actual House Edge: {report['actual_house_edge']:.4%} (Target: {report['target_house_edge']:.2%})")
+    if "round_rtp_std" in report:
+        print(f"Per-Round RTP: mean {report['round_rtp_mean']:.4f}, std {report['round_rtp_std']:.4f}")
+
+    print("\nTop 10 Winning Seconds:")
+    sorted_winning_seconds = sorted(report["winning_seconds"].items(), key=lambda item: item[1], reverse=True)
+    for second, count in sorted_winning_seconds[:10]:
+        print(f"  - Second {second}: won {count} times")
+
+def run_simulation(num_rounds: int, batch: bool = False, seed=None, workers: int = 1,
+                   verbose: bool = True) -> dict:
+    """
+    Runs a full simulation for a specified number of rounds, prints a report
+    and returns it. With `batch=True` the vectorized engine is used instead of
+    driving the SDK round by round; `workers > 1` shards it across processes.
     """
     print(f"--- Starting Time Vault Simulation for {num_rounds} rounds ---")
-    
-    total_bets_value = 0
-    total_payouts_value = 0
-    winning_seconds_distribution = defaultdict(int)
+
+    if batch or workers > 1:
+        report = run_batch_simulation(num_rounds, seed=seed, workers=workers)
+        print_report(report)
+        return report
+
+    report = _empty_report(load_sdk_config())
 
     for i in range(num_rounds):
         round_instance = setup_round_from_config()
-        
+
         # Generate some random bets for this round
         # In a more advanced simulation, bet generation could be based on strategies
         bets = generate_random_bets(
-            num_bets=randint(50, 200), 
+            num_bets=randint(50, 200),
             player_pool_size=50,
             min_sec=round_instance.min_seconds,
             max_sec=round_instance.max_seconds
         )
         round_instance.place_bets(bets)
-        
+
         # Calculate total value of bets for this round
-        round_bets_value = sum(bet.amount for bet in bets)
-        total_bets_value += round_bets_value
+        round_bets_value = round_instance.bets.total_pot
+        report["total_bets_value"] += round_bets_value
 
         # Simulate the round
         result = simulate_round(round_instance)
-        
+
         # Tally results
         round_payouts_value = sum(result.payouts.values())
-        total_payouts_value += round_payouts_value
-        winning_seconds_distribution[result.unlock_second] += 1
-        
-        print(f"Round {i+1}: Unlocked at {result.unlock_second}s. Pot: ${round_bets_value:.2f}, Payout: ${round_payouts_value:.2f}")
+        report["total_payouts_value"] += round_payouts_value
+        report["winning_seconds"][result.unlock_second] += 1
+        report["rounds"] += 1
+        if result.special_event_triggered == "Quick Burst":
+            report["quick_bursts"] += 1
 
-    print("\n--- Simulation Report ---")
-    print(f"Total Value of Bets: ${total_bets_value:.2f}")
-    print(f"Total Value of Payouts: ${total_payouts_value:.2f}")
-    
-    if total_bets_value > 0:
-        actual_house_edge = (total_bets_value - total_payouts_value) / total_bets_value
-        print(f"Actual House Edge: {actual_house_edge:.4%} (Target: {round_instance.house_edge:.2%})")
-    
-    print("\nTop 10 Winning Seconds:")
-    sorted_winning_seconds = sorted(winning_seconds_distribution.items(), key=lambda item: item[1], reverse=True)
-    for second, count in sorted_winning_seconds[:10]:
-        print(f"  - Second {second}: won {count} times")
+        if verbose:
+            print(f"Round {i+1}: Unlocked at {result.unlock_second}s. Pot: ${round_bets_value:.2f}, Payout: ${round_payouts_value:.2f}")
+
+    report = _finalize_report(report)
+    print_report(report)
+    return report
 
 
 if __name__ == "__main__":
-    from random import randint, choice
     # You can change the number of rounds to simulate
-    run_simulation(num_rounds=100)
\ No newline at end of file
+    run_simulation(num_rounds=100)
@@ -33,20 +33,26 @@ const App: React.FC = () => {
     const onGameUpdate = (data: any) => {
       setGameState(data);
       setRoundResult(null);
-      setLiveBets({});
+      setLiveBets(data?.stake_by_second || {});
     };
     const onRoundResult = (data: any) => {
       setRoundResult(data);
       setGameState((prev: any) => ({ ...prev, status: 'finished' }));
     };
-    const onNewBet = (data: any) => {
-      setLiveBets((prev: any) => ({
-        ...prev,
-        [data.second]: (prev[data.second] || 0) + data.amount,
-      }));
+    const onBetsBatch = (data: any) => {
+      setLiveBets((prev: any) => {
+        const next = { ...prev };
+        Object.entries(data.stakes as { [second: string]: number }).forEach(([second, amount]) => {
+          next[second] = (next[second] || 0) + amount;
+        });
+        return next;
+      });
     };
-    const onChatMessage = (data: any) => {
-      setChatMessages((prev) => [...prev.slice(-100), data]); // Keep chat history from growing indefinitely
+    const onChatBatch = (data: any) => {
+      setChatMessages((prev) => [...prev, ...data.messages].slice(-100)); // Keep chat history from growing indefinitely
+    };
+    const onChatGap = (data: any) => {
+      setChatMessages((prev) => [...prev, { sender: 'system', text: `${data.missed} messages skipped` }].slice(-100));
     };
     const onBonusVaultWin = (data: any) => {
       setBonusWin(data);
@@ -59,8 +65,9 @@ const App: React.FC = () => {
     socket.on('round_result', onRoundResult);
     socket.on('leaderboard_update', setLeaderboard);
     socket.on('player_stats_update', handlePlayerStatsUpdate);
-    socket.on('new_bet', onNewBet);
-    socket.on('chat_message', onChatMessage);
+    socket.on('bets_batch', onBetsBatch);
+    socket.on('chat_batch', onChatBatch);
+    socket.on('chat_gap', onChatGap);
     socket.on('bonus_vault_win', onBonusVaultWin);
 
     // Clean up listeners on component unmount
@@ -70,8 +77,9 @@ const App: React.FC = () => {
       socket.off('round_result', onRoundResult);
       socket.off('leaderboard_update', setLeaderboard);
       socket.off('player_stats_update', handlePlayerStatsUpdate);
-      socket.off('new_bet', onNewBet);
-      socket.off('chat_message', onChatMessage);
+      socket.off('bets_batch', onBetsBatch);
+      socket.off('chat_batch', onChatBatch);
+      socket.off('chat_gap', onChatGap);
       socket.off('bonus_vault_win', onBonusVaultWin);
     };
   }, [handlePlayerStatsUpdate]);